@@ -0,0 +1,151 @@
+# ssom_a7_family_sweep.py
+# Test A.7 over a whole (eps_scale x h) family in one batched pass.
+# Writes the horizon curve h*(eps_scale) as CSV and the posture grid as a compact heatmap file.
+import argparse
+import contextlib
+import csv
+import json
+import math
+import os
+from array import array
+
+import ssom_batch_posture as batch
+from ssom_batch_posture import np
+import ssom_fast_engine as engine
+
+MAP_MAGIC = b"SSOMMAP1\n"
+
+def eps_grid(eps_min: float, eps_max: float, count: int):
+    if count == 1:
+        return [eps_min]
+    lo = math.log10(eps_min)
+    hi = math.log10(eps_max)
+    return [10 ** (lo + (hi - lo) * (i / (count - 1))) for i in range(count)]
+
+def slope_rows(eps_block, hs, use_numpy=True, vector_exp=False):
+    # m[e, k] = f_eps(h_k, eps_e) / h_k, same expression as the reference script.
+    # Near h/eps ~ 1e-16 the slope is pure round-off, so the horizon there depends on the
+    # exact exp() rounding: libm (default) reproduces the single-run script, NumPy's
+    # vectorized exp is faster but may move those horizons.
+    if np is not None and use_numpy:
+        if vector_exp:
+            e = np.asarray(eps_block, dtype=float)[:, None]
+            h = np.asarray(hs, dtype=float)[None, :]
+            return e * (1.0 - np.exp(-h / e)) / h
+        f_eps = engine.f_eps
+        return np.array([[f_eps(h, eps) / h for h in hs] for eps in eps_block])
+    return [array("d", (engine.f_eps(h, eps) / h for h in hs)) for eps in eps_block]
+
+def write_map_header(f, eps_values, hs, dtype):
+    meta = {
+        "rows": len(eps_values),
+        "cols": len(hs),
+        "dtype": dtype,
+        "row_axis": "eps_scale",
+        "col_axis": "h",
+        "row_values": list(eps_values),
+        "col_values": list(hs),
+        "status_names": list(batch.STATUS_NAMES),
+    }
+    f.write(MAP_MAGIC)
+    f.write(json.dumps(meta).encode("utf-8") + b"\n")
+
+def read_map(path):
+    # returns (meta, values); values is row-major bytes ("u1") or array('f') ("<f4")
+    with open(path, "rb") as f:
+        if f.read(len(MAP_MAGIC)) != MAP_MAGIC:
+            raise ValueError("not an SSOM heatmap file")
+        meta = json.loads(f.readline().decode("utf-8"))
+        n = meta["rows"] * meta["cols"]
+        if meta["dtype"] == "u1":
+            return meta, f.read(n)
+        values = array("f")
+        values.frombytes(f.read(4 * n))
+    return meta, values
+
+def _block_bytes(res):
+    if isinstance(res.status, list):
+        status = b"".join(row.tobytes() for row in res.status)
+        strain = b"".join(array("f", row).tobytes() for row in res.s)
+        return status, strain
+    return res.status.astype(np.uint8).tobytes(), res.s.astype("<f4").tobytes()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out_dir", default="out_ssom_a7_family")
+    ap.add_argument("--eps_min", type=float, default=1e-9)
+    ap.add_argument("--eps_max", type=float, default=1e-1)
+    ap.add_argument("--eps_count", type=int, default=1000)
+    ap.add_argument("--steps", type=int, default=240)
+    ap.add_argument("--h_max", type=float, default=1e-1)
+    ap.add_argument("--h_min", type=float, default=1e-18)
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--block", type=int, default=1024, help="eps_scale rows per batch")
+    ap.add_argument("--with_strain", action="store_true", help="also write a float32 strain heatmap")
+    ap.add_argument("--vector_exp", action="store_true", help="evaluate f_eps with NumPy exp instead of libm")
+    ap.add_argument("--no_numpy", action="store_true")
+    args = ap.parse_args()
+
+    if args.h_max <= 0.0 or args.h_min <= 0.0 or args.h_min >= args.h_max:
+        raise ValueError("Require 0 < h_min < h_max")
+    if args.steps < 5:
+        raise ValueError("Require --steps >= 5")
+    if args.eps_min <= 0.0 or args.eps_max < args.eps_min or args.eps_count < 1:
+        raise ValueError("Require 0 < eps_min <= eps_max and --eps_count >= 1")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    hs = engine.log_ladder(args.h_max, args.h_min, args.steps)
+    eps_values = eps_grid(args.eps_min, args.eps_max, args.eps_count)
+
+    out_curve = os.path.join(args.out_dir, "horizon_ssom_a7_family.csv")
+    out_map = os.path.join(args.out_dir, "heatmap_ssom_a7_family.ssomm")
+    out_strain = os.path.join(args.out_dir, "heatmap_ssom_a7_family_strain.ssomm")
+    use_numpy = np is not None and not args.no_numpy
+
+    denied = 0
+    with contextlib.ExitStack() as stack:
+        fc = stack.enter_context(open(out_curve, "w", newline="", encoding="utf-8"))
+        fm = stack.enter_context(open(out_map, "wb"))
+        write_map_header(fm, eps_values, hs, "u1")
+        fs = None
+        if args.with_strain:
+            fs = stack.enter_context(open(out_strain, "wb"))
+            write_map_header(fs, eps_values, hs, "<f4")
+        w = csv.writer(fc)
+        w.writerow(["eps_scale", "stop_k", "stop_status", "first_deny_h", "last_allow_h", "s_at_stop"])
+
+        for start in range(0, len(eps_values), args.block):
+            eps_block = eps_values[start:start + args.block]
+            res = batch.batch_posture(slope_rows(eps_block, hs, use_numpy, args.vector_exp), args.a_min, args.s_max, args.r_safe,
+                                      abstain=engine.ABSTAIN_NONFINITE, use_numpy=use_numpy)
+            for i, eps in enumerate(eps_block):
+                k = int(res.stop[i])
+                st = res.stop_status(i)
+                if st == "DENY":
+                    denied += 1
+                w.writerow([
+                    "{:.6e}".format(eps),
+                    k,
+                    st,
+                    "{:.3e}".format(hs[k]) if st == "DENY" else "",
+                    "{:.3e}".format(hs[k - 1] if k > 0 else hs[-1]),
+                    "{:.8f}".format(float(res.s[i][k])),
+                ])
+            status_bytes, strain_bytes = _block_bytes(res)
+            fm.write(status_bytes)
+            if fs is not None:
+                fs.write(strain_bytes)
+
+    print("SSOM A.7 family sweep complete: {} eps_scale values x {} refinement steps".format(len(eps_values), len(hs)))
+    print("Backend:", "numpy" if use_numpy else "stdlib")
+    print("Output (horizon curve):", out_curve)
+    print("Output (heatmap):", out_map)
+    if args.with_strain:
+        print("Output (strain heatmap):", out_strain)
+    print("eps_scale values with a DENY horizon: {} of {}".format(denied, len(eps_values)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# ssom_batch_posture.py
+# Posture over a batch of ladders at once: m has shape (rows, steps), one ladder per row.
+# Uses NumPy when available, otherwise falls back to ssom_fast_engine row by row.
+# Row semantics match ssom_fast_engine.run_posture exactly (same stop rules, same
+# order of strain additions); only exp/log/sin inside user functions may differ by an ulp.
+# `python ssom_batch_posture.py` checks the NumPy path against run_posture (parity_check).
+from array import array
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+import ssom_fast_engine as engine
+from ssom_fast_engine import (
+    ABSTAIN_NEVER, ABSTAIN_NONFINITE, ABSTAIN_NONPOSITIVE,
+    LR_EPS, LR_RATIO_MAX, LR_ZERO_TOL, EPS,
+    STRAIN_CUMULATIVE, STRAIN_DECAY,
+)
+
+NOT_REACHED = 3
+STATUS_NAMES = engine.STATUS_NAMES + ("NOT_REACHED",)
+
+LANE_EPS = 1e-12
+
+class BatchPosture:
+    __slots__ = ("status", "a", "s", "lr", "flip", "stop")
+
+    def __init__(self, status, a, s, lr, flip, stop):
+        # status/a/s/lr/flip: (rows, steps); stop: first DENY/ABSTAIN index per row, -1 if none
+        self.status = status
+        self.a = a
+        self.s = s
+        self.lr = lr
+        self.flip = flip
+        self.stop = stop
+
+    def __len__(self):
+        return len(self.stop)
+
+    def stop_status(self, i):
+        k = int(self.stop[i])
+        return "NONE" if k < 0 else STATUS_NAMES[int(self.status[i][k])]
+
+def _clamp(a):
+    if engine.clamp_lane.__module__ == engine.__name__:
+        return np.maximum(np.minimum(a, 1.0 - LANE_EPS), -1.0 + LANE_EPS)
+    return np.vectorize(engine.clamp_lane, otypes=[float])(a)
+
+def batch_posture(m_rows, a_min, s_max, r_safe, beta_flip=0.0, gamma_flip=0.0,
+                  lr_mode=LR_EPS, zero_tol=0.0, abstain=ABSTAIN_NONFINITE, deny_nonfinite=True,
+                  use_numpy=True, strain=STRAIN_CUMULATIVE, strain_window=0, strain_decay=1.0):
+    sk = {"strain": strain, "strain_window": strain_window, "strain_decay": strain_decay}
+    if np is not None and use_numpy:
+        return _batch_numpy(np.asarray(m_rows, dtype=float), a_min, s_max, r_safe, beta_flip, gamma_flip,
+                            lr_mode, zero_tol, abstain, deny_nonfinite, sk)
+    return _batch_python(m_rows, a_min, s_max, r_safe, beta_flip, gamma_flip,
+                         lr_mode, zero_tol, abstain, deny_nonfinite, sk)
+
+def _strain_numpy(lr, flip, abst, r_safe, gamma_flip, strain, strain_window, strain_decay):
+    # window / decay strain, column by column with the scalar WindowStrain / DecayStrain arithmetic;
+    # ABSTAIN rows leave the strain untouched, as run_posture skips its update there
+    rows, n = lr.shape
+    over = lr > r_safe
+    inc = np.where(over, lr - r_safe, 0.0)
+    inc = np.where(flip, inc + gamma_flip, inc)
+    s = np.zeros((rows, n + 1))
+    acc = np.zeros(rows)
+    if strain == STRAIN_DECAY:
+        engine.make_strain(strain, strain_window, strain_decay)  # same argument checks
+        for k in range(n):
+            acc = np.where(abst[:, k], acc, acc * strain_decay + inc[:, k])
+            s[:, k + 1] = acc
+        return s
+    engine.make_strain(strain, strain_window, strain_decay)
+    ring = np.zeros((rows, strain_window))
+    # ring position per row: rows that ABSTAIN do not advance
+    pos = np.zeros(rows, dtype=np.intp)
+    idx = np.arange(rows)
+    for k in range(n):
+        live = ~abst[:, k]
+        new = (acc + inc[:, k]) - ring[idx, pos]
+        ring[idx[live], pos[live]] = inc[live, k]
+        pos = np.where(live, pos + 1, pos)
+        wrap = pos == strain_window
+        if wrap.any():
+            pos[wrap] = 0
+            total = np.zeros(int(wrap.sum()))
+            for i in range(strain_window):
+                total = total + ring[wrap, i]
+            new[wrap] = total
+        acc = np.where(live, new, acc)
+        s[:, k + 1] = acc
+    return s
+
+def _batch_numpy(m, a_min, s_max, r_safe, beta_flip, gamma_flip, lr_mode, zero_tol, abstain, deny_nonfinite, sk):
+    rows, steps = m.shape
+    prev = m[:, :-1]
+    cur = m[:, 1:]
+    with np.errstate(all="ignore"):
+        if lr_mode == LR_ZERO_TOL:
+            m_eff = np.where(np.abs(m) <= zero_tol, 0.0, m)
+            prev_eff = m_eff[:, :-1]
+            cur_eff = m_eff[:, 1:]
+            pa = np.abs(prev_eff)
+            ca = np.abs(cur_eff)
+            lr = np.where(
+                pa <= EPS,
+                np.where(ca <= EPS, 0.0, np.abs(np.log((ca + EPS) / EPS))),
+                np.where(ca <= EPS, np.abs(np.log(EPS / (pa + EPS))), np.abs(np.log((ca + EPS) / (pa + EPS)))),
+            )
+            flip = (prev_eff * cur_eff) < 0.0
+        elif lr_mode == LR_RATIO_MAX:
+            lr = np.abs(np.log(cur / np.maximum(prev, EPS)))
+            flip = np.zeros(cur.shape, dtype=bool)
+        else:
+            lr = np.abs(np.log((np.abs(cur) + EPS) / (np.abs(prev) + EPS)))
+            flip = (prev * cur) < 0.0
+
+        denom = np.where(flip, 1.0 + lr + beta_flip, 1.0 + lr)
+        a = _clamp(1.0 / denom)
+        if lr_mode == LR_RATIO_MAX:
+            a = np.where(prev <= 0.0, np.nan, a)
+
+        if abstain == ABSTAIN_NEVER:
+            abst = np.zeros(cur.shape, dtype=bool)
+        else:
+            abst = ~np.isfinite(cur)
+            if abstain == ABSTAIN_NONPOSITIVE:
+                abst |= cur <= 0.0
+        a = np.where(abst, np.nan, a)
+        lr = np.where(abst, np.nan, lr)
+        flip &= ~abst
+
+        if sk["strain"] != STRAIN_CUMULATIVE:
+            s = _strain_numpy(lr, flip, abst, r_safe, gamma_flip, **sk)
+        else:
+            # same addition order as the scalar loop: s += (lr - r_safe); then s += gamma_flip
+            over = lr > r_safe
+            inc = np.where(over, lr - r_safe, 0.0)
+            s = np.zeros((rows, steps))
+            acc = np.zeros(rows)
+            for k in range(steps - 1):
+                acc = np.where(over[:, k], acc + inc[:, k], acc)
+                if gamma_flip != 0.0:
+                    acc = np.where(flip[:, k], acc + gamma_flip, acc)
+                s[:, k + 1] = acc
+
+        deny = (a < a_min) | (s[:, 1:] > s_max)
+        if deny_nonfinite:
+            deny |= ~np.isfinite(a)
+        deny &= ~abst
+
+    halt = deny | abst
+    has = halt.any(axis=1)
+    stop = np.where(has, np.argmax(halt, axis=1) + 1, -1)
+
+    status = np.zeros((rows, steps), dtype=np.int8)
+    status[:, 1:] = np.where(abst, engine.ABSTAIN, np.where(deny, engine.DENY, engine.ALLOW))
+    after = np.arange(steps)[None, :] > np.where(has, stop, steps)[:, None]
+    status[after] = NOT_REACHED
+
+    full_a = np.ones((rows, steps))
+    full_a[:, 1:] = a
+    full_lr = np.zeros((rows, steps))
+    full_lr[:, 1:] = lr
+    full_flip = np.zeros((rows, steps), dtype=np.int8)
+    full_flip[:, 1:] = flip
+    full_a[after] = np.nan
+    s[after] = np.nan
+    full_lr[after] = np.nan
+    full_flip[after] = 0
+    return BatchPosture(status, full_a, s, full_lr, full_flip, stop)
+
+def _batch_python(m_rows, a_min, s_max, r_safe, beta_flip, gamma_flip, lr_mode, zero_tol, abstain, deny_nonfinite, sk):
+    status_rows = []
+    a_rows = []
+    s_rows = []
+    lr_rows = []
+    flip_rows = []
+    stop = []
+    for row in m_rows:
+        steps = len(row)
+        cols, _ = engine.run_posture(row.__getitem__, range(steps), a_min, s_max, r_safe, beta_flip, gamma_flip,
+                                     lr_mode, zero_tol, abstain, deny_nonfinite, **sk)
+        n = len(cols)
+        halted = cols.status[n - 1] != engine.ALLOW
+        stop.append(n - 1 if halted else -1)
+        pad = steps - n
+        status_rows.append(cols.status + array("b", [NOT_REACHED]) * pad)
+        a_rows.append(cols.a + array("d", [float("nan")]) * pad)
+        s_rows.append(cols.s + array("d", [float("nan")]) * pad)
+        lr_rows.append(cols.lr + array("d", [float("nan")]) * pad)
+        flip_rows.append(cols.flip + array("b", [0]) * pad)
+    return BatchPosture(status_rows, a_rows, s_rows, lr_rows, flip_rows, stop)
+
+def parity_check(rows=64, steps=120, seed=0, nonfinite=0.05):
+    # NumPy vs run_posture on random ladders with NaN / inf entries, for every strain mode;
+    # returns [(mode, rows whose status, stop or s differ)]
+    import random
+    rng = random.Random(seed)
+    m = []
+    for _ in range(rows):
+        row = []
+        for k in range(steps):
+            # the first entry is the baseline, which run_posture ALLOWs unconditionally
+            if k and rng.random() < nonfinite:
+                row.append(rng.choice((float("nan"), float("inf"), -float("inf"))))
+            else:
+                row.append(rng.choice((-1.0, 1.0)) * rng.lognormvariate(0.0, 0.6))
+        m.append(row)
+    out = []
+    for strain, window, decay in ((STRAIN_CUMULATIVE, 0, 1.0), (engine.STRAIN_WINDOW, 7, 1.0), (STRAIN_DECAY, 0, 0.8)):
+        for abstain in (ABSTAIN_NONFINITE, ABSTAIN_NONPOSITIVE):
+            kw = dict(a_min=0.0, s_max=50.0, r_safe=0.1, beta_flip=0.5, gamma_flip=0.2, abstain=abstain,
+                      deny_nonfinite=False, strain=strain, strain_window=window, strain_decay=decay)
+            fast = batch_posture(m, use_numpy=True, **kw)
+            ref = batch_posture(m, use_numpy=False, **kw)
+            bad = 0
+            for i in range(rows):
+                same = list(fast.status[i]) == list(ref.status[i]) and int(fast.stop[i]) == ref.stop[i]
+                same = same and all(x == y or (x != x and y != y) for x, y in zip(fast.s[i].tolist(), ref.s[i]))
+                bad += not same
+            out.append(("{}/{}".format(strain, "nonpositive" if abstain == ABSTAIN_NONPOSITIVE else "nonfinite"), bad))
+    return out
+
+if __name__ == "__main__":
+    # parity self-check of the NumPy path against the scalar engine
+    if np is None:
+        raise SystemExit("NumPy is not installed; only the scalar path is available")
+    results = parity_check()
+    for mode, bad in results:
+        print("{:<26} {}".format(mode, "OK" if bad == 0 else "{} row(s) differ".format(bad)))
+    raise SystemExit(1 if any(bad for _, bad in results) else 0)
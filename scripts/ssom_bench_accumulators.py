@@ -0,0 +1,117 @@
+# ssom_bench_accumulators.py
+# Throughput cost and accuracy gain of compensated m_accum / strain summation,
+# measured against exact math.fsum baselines over the same increments.
+import argparse
+import csv
+import math
+import time
+
+import ssom_fast_engine as engine
+
+def integrands(steps, blocks, eps):
+    xs = engine.unit_grid(steps)
+    area = sum(engine.f_spiky(xs[i], eps) * (xs[i + 1] - xs[i]) for i in range(len(xs) - 1))
+    return xs, {
+        "smooth": lambda x: 1.0,
+        "spiky": lambda x: engine.f_spiky(x, eps) / area,
+        "cancel": lambda x: engine.f_alt_square(x, blocks),
+    }
+
+def strain_terms(cols, r_safe, gamma_flip):
+    # the strain increments in the order the kernel adds them
+    out = []
+    lr = cols.lr
+    flip = cols.flip
+    for i in range(1, len(cols)):
+        if lr[i] > r_safe:
+            out.append(lr[i] - r_safe)
+        if flip[i]:
+            out.append(gamma_flip)
+    return out
+
+def strain_rows(cols, r_safe, gamma_flip):
+    # number of strain terms added up to and including each row
+    counts = []
+    n = 0
+    for i in range(len(cols)):
+        if i > 0:
+            if cols.lr[i] > r_safe:
+                n += 1
+            if cols.flip[i]:
+                n += 1
+        counts.append(n)
+    return counts
+
+def ulps(value, exact):
+    if value == exact:
+        return 0.0
+    return abs(value - exact) / math.ulp(exact if exact != 0.0 else 1.0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--steps", type=int, default=1000000)
+    ap.add_argument("--blocks", type=int, default=2000)
+    ap.add_argument("--eps", type=float, default=1e-6)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.05)
+    ap.add_argument("--dm_zero_tol", type=float, default=1e-15)
+    ap.add_argument("--chunk", type=int, default=1024)
+    ap.add_argument("--checkpoints", type=int, default=32)
+    ap.add_argument("--cases", default="smooth,spiky,cancel")
+    ap.add_argument("--out_csv", default="")
+    args = ap.parse_args()
+
+    xs, fns = integrands(args.steps, args.blocks, args.eps)
+    # open thresholds: every run walks the full grid
+    knobs = (0.0, math.inf, args.r_safe, args.beta_flip, args.gamma_flip, engine.LR_ZERO_TOL, args.dm_zero_tol)
+    marks = sorted({max(1, (args.steps * c) // args.checkpoints) - 1 for c in range(1, args.checkpoints + 1)})
+
+    rows = []
+    for case in args.cases.split(","):
+        fn = fns[case]
+        baseline = None
+        for mode in engine.ACCUM_MODES:
+            t0 = time.perf_counter()
+            cols, _ = engine.run_posture(fn, xs, *knobs, integral=True, accum=mode, chunk=args.chunk)
+            dt = time.perf_counter() - t0
+
+            if baseline is None:
+                # exact prefix sums at the checkpoints, from the (mode-independent) increments
+                dms = cols.m
+                terms = strain_terms(cols, args.r_safe, args.gamma_flip)
+                counts = strain_rows(cols, args.r_safe, args.gamma_flip)
+                baseline = [(i, math.fsum(dms[:i + 1]), math.fsum(terms[:counts[i]])) for i in marks]
+
+            m_err = max(ulps(cols.m_accum[i], em) for i, em, _ in baseline)
+            s_err = max(ulps(cols.s[i], es) for i, _, es in baseline)
+            last_i, exact_m, exact_s = baseline[-1]
+            rows.append([
+                case,
+                mode,
+                args.steps,
+                "{:.3f}".format(dt),
+                "{:.0f}".format(args.steps / dt),
+                "{:.17g}".format(cols.m_accum[last_i]),
+                "{:.17g}".format(exact_m),
+                "{:.1f}".format(m_err),
+                "{:.17g}".format(cols.s[last_i]),
+                "{:.17g}".format(exact_s),
+                "{:.1f}".format(s_err),
+            ])
+
+    header = ["case", "accum", "steps", "time_s", "steps_per_s", "m_final", "m_exact", "m_max_ulps",
+              "s_final", "s_exact", "s_max_ulps"]
+    print("{:<7} {:<9} {:>9} {:>12} {:>14} {:>14}".format("case", "accum", "time_s", "steps/s", "m_max_ulps", "s_max_ulps"))
+    for r in rows:
+        print("{:<7} {:<9} {:>9} {:>12} {:>14} {:>14}".format(r[0], r[1], r[3], r[4], r[7], r[10]))
+
+    if args.out_csv:
+        with open(args.out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            for r in rows:
+                w.writerow(r)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# ssom_bench_fast_engine.py
+# Wall time and tracemalloc peak: reference scripts vs ssom_fast_engine.
+import argparse
+import contextlib
+import csv
+import importlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ssom_fast_engine
+
+def run_reference(test, argv):
+    mod = importlib.import_module(ssom_fast_engine.REFERENCE_SCRIPTS[test][:-3])
+    saved = sys.argv
+    sys.argv = [mod.__file__] + argv
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            mod.main()
+    finally:
+        sys.argv = saved
+
+def run_fast(test, argv):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ssom_fast_engine.main([test] + argv)
+
+def measure(fn, test, argv, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(test, argv)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(test, argv)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def same_outputs(dir_a, dir_b):
+    names = sorted(os.listdir(dir_a))
+    if names != sorted(os.listdir(dir_b)):
+        return False
+    for name in names:
+        with open(os.path.join(dir_a, name), "rb") as fa, open(os.path.join(dir_b, name), "rb") as fb:
+            if fa.read() != fb.read():
+                return False
+    return True
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tests", default="1a,1b,a3,a4,a5,a6,a7,a9")
+    ap.add_argument("--steps", type=int, default=200000)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--out_csv", default="")
+    args = ap.parse_args()
+
+    # loosen thresholds so every test walks the whole ladder / grid
+    open_args = ["--steps", str(args.steps), "--a_min", "0.0", "--s_max", "1e300"]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for test in args.tests.split(","):
+            ref_dir = os.path.join(tmp, "ref_" + test)
+            fast_dir = os.path.join(tmp, "fast_" + test)
+            t_ref, p_ref = measure(run_reference, test, open_args + ["--out_dir", ref_dir], args.repeats)
+            t_fast, p_fast = measure(run_fast, test, open_args + ["--out_dir", fast_dir], args.repeats)
+            same = same_outputs(ref_dir, fast_dir)
+            rows.append([
+                test,
+                args.steps,
+                "{:.4f}".format(t_ref),
+                "{:.4f}".format(t_fast),
+                "{:.2f}".format(t_ref / t_fast),
+                p_ref,
+                p_fast,
+                "{:.1f}".format(p_ref / max(p_fast, 1)),
+                "IDENTICAL" if same else "MISMATCH",
+            ])
+
+    header = ["test", "steps", "t_ref_s", "t_fast_s", "speedup", "peak_ref_bytes", "peak_fast_bytes", "alloc_ratio", "traces"]
+    print("{:<5} {:>8} {:>9} {:>9} {:>8} {:>14} {:>14} {:>8}  {}".format(*header))
+    for r in rows:
+        print("{:<5} {:>8} {:>9} {:>9} {:>8} {:>14} {:>14} {:>8}  {}".format(*r))
+
+    if args.out_csv:
+        with open(args.out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            for r in rows:
+                w.writerow(r)
+
+if __name__ == "__main__":
+    main()
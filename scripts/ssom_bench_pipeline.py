@@ -0,0 +1,136 @@
+# ssom_bench_pipeline.py
+# Wall time of one test emitted three ways: compute only (rows formatted, then dropped),
+# serial (each chunk compressed and written before the next is computed) and pipelined
+# (ssom_pipeline: a writer thread compresses and writes while the engine computes).
+# A perfect overlap brings the pipelined time down to max(compute, serial - compute).
+import argparse
+import bz2
+import csv
+import gzip
+import lzma
+import os
+import tempfile
+import time
+
+import ssom_pipeline as pipeline
+
+class NullWriter:
+    # formats are still built by the producer; the bytes are dropped
+    def __init__(self, path, compress="none", level=6, queue_size=8):
+        self.path = path
+        self.busy = 0.0
+
+    def put(self, data):
+        pass
+
+    def close(self):
+        pass
+
+class InlineWriter:
+    # compresses and writes in the caller's thread
+    def __init__(self, path, compress="none", level=6, queue_size=8):
+        suffix, opener = pipeline.COMPRESSORS[compress]
+        self.path = path + suffix
+        self._f = opener(self.path, level)
+        self.busy = 0.0
+
+    def put(self, data):
+        t0 = time.perf_counter()
+        self._f.write(data)
+        self.busy += time.perf_counter() - t0
+
+    def close(self):
+        self._f.close()
+
+MODES = (("compute", NullWriter), ("serial", InlineWriter), ("pipelined", pipeline.ChunkWriter))
+
+def measure(argv, writer_cls, opts, repeats):
+    best = float("inf")
+    busy = 0.0
+    for _ in range(repeats):
+        args = pipeline.build_parser().parse_args(argv)
+        t0 = time.perf_counter()
+        _, b = pipeline.run_pipelined(args, writer_cls=writer_cls, **opts)
+        t = time.perf_counter() - t0
+        if t < best:
+            best, busy = t, b
+    return best, busy
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+def same_outputs(dir_a, dir_b):
+    # compares decompressed bytes (gzip headers carry an mtime)
+    names = sorted(os.listdir(dir_a))
+    if names != sorted(os.listdir(dir_b)):
+        return False
+    for name in names:
+        opener = OPENERS.get(os.path.splitext(name)[1], open)
+        with opener(os.path.join(dir_a, name), "rb") as fa, opener(os.path.join(dir_b, name), "rb") as fb:
+            if fa.read() != fb.read():
+                return False
+    return True
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tests", default="a4,a5")
+    ap.add_argument("--steps", type=int, default=1000000)
+    ap.add_argument("--compress", default="gzip,lzma", help="comma-separated: " + ",".join(sorted(pipeline.COMPRESSORS)))
+    ap.add_argument("--level", type=int, default=6)
+    ap.add_argument("--chunk_rows", type=int, default=65536)
+    ap.add_argument("--queue", type=int, default=8)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--out_csv", default="")
+    args = ap.parse_args()
+
+    # loosen thresholds so every test walks the whole ladder / grid
+    open_args = ["--steps", str(args.steps), "--a_min", "0.0", "--s_max", "1e300"]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for test in args.tests.split(","):
+            for compress in args.compress.split(","):
+                opts = dict(compress=compress, level=args.level, chunk_rows=args.chunk_rows, queue_size=args.queue)
+                times = {}
+                for mode, writer_cls in MODES:
+                    argv = [test] + open_args + ["--out_dir", os.path.join(tmp, "{}_{}_{}".format(test, compress, mode))]
+                    times[mode] = measure(argv, writer_cls, opts, args.repeats)
+                t_compute = times["compute"][0]
+                t_serial, io_busy = times["serial"]
+                t_pipe = times["pipelined"][0]
+                ideal = max(t_compute, io_busy)
+                # share of the hideable time (the shorter of compute and I/O) actually hidden;
+                # not reported when there is next to nothing to hide
+                hideable = min(t_compute, io_busy)
+                hidden = "{:.0%}".format((t_serial - t_pipe) / hideable) if hideable > 0.05 * ideal else "-"
+                same = same_outputs(*(os.path.join(tmp, "{}_{}_{}".format(test, compress, m)) for m in ("serial", "pipelined")))
+                rows.append([
+                    test,
+                    args.steps,
+                    compress,
+                    "{:.4f}".format(t_compute),
+                    "{:.4f}".format(io_busy),
+                    "{:.4f}".format(t_serial),
+                    "{:.4f}".format(t_pipe),
+                    "{:.4f}".format(ideal),
+                    "{:.2f}".format(t_serial / t_pipe),
+                    hidden,
+                    "IDENTICAL" if same else "MISMATCH",
+                ])
+
+    header = ["test", "steps", "compress", "t_compute_s", "t_io_s", "t_serial_s", "t_pipe_s", "t_ideal_s",
+              "speedup", "overlap", "traces"]
+    print("CPUs:", os.cpu_count(), "(overlap needs a second core for the writer thread)")
+    fmt = "{:<5} {:>8} {:<8} {:>11} {:>8} {:>10} {:>8} {:>9} {:>7} {:>7}  {}"
+    print(fmt.format(*header))
+    for r in rows:
+        print(fmt.format(*r))
+
+    if args.out_csv:
+        with open(args.out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            for r in rows:
+                w.writerow(r)
+
+if __name__ == "__main__":
+    main()
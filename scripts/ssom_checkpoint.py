@@ -0,0 +1,219 @@
+# ssom_checkpoint.py
+# Checkpointed, resumable engine runs. Each trace part is computed in chunks of --every rows;
+# after every chunk its rows are appended to a record file and the PostureState (s, m_accum,
+# previous magnitude, accumulator / strain internals) is snapshotted next to the ladder
+# definition. A later run reuses the longest prefix whose rows (x, dx) and knobs are unchanged,
+# resumes from the nearest restorable row, and only computes the tail: an interrupted run
+# picks up where it stopped, and --extend continues a ladder / path / grid past its end.
+import hashlib
+import json
+import os
+import tempfile
+import time
+from itertools import islice, repeat
+
+import ssom_fast_engine as engine
+from ssom_run_cache import version_hash
+
+CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_FORMAT = 1
+ROWS_SUFFIX = ".rows"
+RECORD = engine.BIN_RECORD
+# parameters that only shape the ladder / grid: their effect is caught row by row
+LADDER_PARAMS = ("steps", "h_min", "h_max")
+_NOT_PARAMS = ("ckpt", "every", "extend")
+
+def knob_fingerprint(args) -> str:
+    # everything except the ladder definition: a mismatch means nothing can be reused.
+    # a4 keeps --steps, because the spiky integrand is normalized over the whole grid.
+    params = {k: v for k, v in engine.replay_params(args).items() if k not in _NOT_PARAMS}
+    for k in LADDER_PARAMS:
+        if k in params and not (k == "steps" and args.test == "a4"):
+            del params[k]
+    blob = json.dumps({"version": version_hash(args.test, args.func), "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def reconstructible(knobs) -> bool:
+    # with naive sums and cumulative strain, the state after any ALLOW row is in the row itself
+    return (knobs.get("accum", engine.ACCUM_NAIVE) == engine.ACCUM_NAIVE
+            and knobs.get("strain", engine.STRAIN_CUMULATIVE) == engine.STRAIN_CUMULATIVE)
+
+def load_checkpoint(folder):
+    path = os.path.join(folder, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        ck = json.load(f)
+    return ck if ck.get("format") == CHECKPOINT_FORMAT else None
+
+def save_checkpoint(folder, ck):
+    # write-then-rename: a crash leaves either the old or the new checkpoint
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_ckpt_", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(ck, f, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(folder, CHECKPOINT_FILE))
+
+def iter_records(path, count, chunk_rows=4096):
+    with open(path, "rb") as f:
+        left = count
+        while left > 0:
+            n = min(left, chunk_rows)
+            buf = f.read(n * RECORD.size)
+            if len(buf) != n * RECORD.size:
+                raise ValueError("{}: fewer rows than the checkpoint records".format(path))
+            yield from RECORD.iter_unpack(buf)
+            left -= n
+
+def records_to_cols(recs):
+    cols = engine.TraceColumns()
+    for rec in recs:
+        _, _, x, dx, m, m_eff, m_acc, a, s, lr, flip, status = rec
+        cols.x.append(x)
+        cols.dx.append(dx)
+        cols.m.append(m)
+        cols.m_eff.append(m_eff)
+        cols.m_accum.append(m_acc)
+        cols.a.append(a)
+        cols.s.append(s)
+        cols.lr.append(lr)
+        cols.flip.append(flip)
+        cols.status.append(status)
+    return cols
+
+def common_prefix(path, stored, xs, integral):
+    # rows of the stored part whose x (and dx) equal the new ladder's, counted from the start
+    n_new = len(xs) - 1 if integral else len(xs)
+    same = 0
+    for rec in iter_records(path, min(stored, n_new)):
+        if rec[2] != xs[same] or (integral and rec[3] != xs[same + 1] - xs[same]):
+            break
+        same += 1
+    return same
+
+def resume_state(path, part, same, knobs):
+    # (row to restart from, PostureState). Runs halt at their first non-ALLOW row, so every
+    # row before `bound` was committed into the state.
+    bound = min(same, part["rows"] - 1 if part["halted"] else part["rows"])
+    best = None
+    for snap in part["snapshots"]:
+        if snap["row"] <= bound and (best is None or snap["row"] > best["row"]):
+            best = snap
+    if reconstructible(knobs) and bound > 0 and (best is None or best["row"] < bound):
+        for rec in iter_records(path, bound):
+            pass
+        state = engine.PostureState()
+        state.s = rec[8]
+        state.m_acc = rec[6]
+        state.prev = rec[4]
+        state.have_prev = True
+        return bound, state
+    if best is None:
+        return 0, engine.PostureState()
+    return best["row"], engine.restore_state(best["state"])
+
+def run_part(folder, ck, part_id, fn, xs, knobs, integral, every):
+    # returns (rows, reused, computed, first_deny, last status name)
+    path = os.path.join(folder, part_id + ROWS_SUFFIX)
+    part = ck["parts"].get(part_id)
+    n_total = len(xs) - 1 if integral else len(xs)
+    if part is not None and os.path.isfile(path):
+        same = common_prefix(path, part["rows"], xs, integral)
+        if part["halted"] and same == part["rows"]:
+            # the stored run already stopped inside the shared prefix: the result is the same
+            return part["rows"], part["rows"], 0, part["first_deny"], engine.STATUS_NAMES[part["last_status"]]
+        start, state = resume_state(path, part, same, knobs)
+        part["snapshots"] = [snap for snap in part["snapshots"] if snap["row"] <= start]
+    else:
+        start, state = 0, engine.PostureState()
+        part = {"snapshots": []}
+    # the only DENY of a halting run is its last row, so a resumed prefix holds none
+    part.update(rows=start, halted=False, first_deny=None, last_status=engine.ALLOW)
+    ck["parts"][part_id] = part
+
+    cols = engine.TraceColumns()
+    with open(path, "ab") as f:
+        f.truncate(start * RECORD.size)
+        pos = start
+        while pos < n_total:
+            stop = min(n_total, pos + every)
+            cols.truncate(0)
+            window = xs[pos:stop + 1] if integral else xs[pos:stop]
+            _, deny = engine.run_posture(fn, window, cols=cols, state=state, integral=integral, **knobs)
+            n = len(cols)
+            f.writelines(map(RECORD.pack, repeat(0, n), range(pos, pos + n), cols.x, cols.dx, cols.m, cols.m_eff,
+                             cols.m_accum, cols.a, cols.s, cols.lr, cols.flip, cols.status))
+            f.flush()
+            os.fsync(f.fileno())
+            halted = n < stop - pos or cols.status[n - 1] != engine.ALLOW
+            pos += n
+            part.update(rows=pos, halted=halted, first_deny=deny, last_status=cols.status[n - 1])
+            if not halted:
+                part["snapshots"].append({"row": pos, "state": engine.snapshot_state(state)})
+            save_checkpoint(folder, ck)
+            if halted:
+                break
+    status = engine.STATUS_NAMES[part["last_status"]] if part["rows"] else "NO_TRACE"
+    return part["rows"], start, part["rows"] - start, part["first_deny"], status
+
+def write_trace(folder, path, layout, parts):
+    # streams the stored records of every part through the layout
+    header, fields, fmt, k0 = engine.LAYOUTS[layout]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(header) + "\r\n")
+        for part_id, rows, extra in parts:
+            recs = iter_records(os.path.join(folder, part_id + ROWS_SUFFIX), rows)
+            done = 0
+            while done < rows:
+                chunk = list(islice(recs, 65536))
+                cols = records_to_cols(chunk)
+                f.writelines(engine.iter_rows(cols, fields, fmt, k0 + done, extra))
+                done += len(chunk)
+
+def checkpoint_flags(p):
+    p.add_argument("--ckpt", default="", help="checkpoint folder (default: <out_dir>/.ssom_checkpoint)")
+    p.add_argument("--every", type=int, default=65536, help="rows per chunk between checkpoints")
+    p.add_argument("--extend", type=int, default=0, help="continue the ladder / path / grid by this many points")
+
+def build_parser():
+    return engine.build_parser(checkpoint_flags)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.every < 1 or args.extend < 0:
+        raise ValueError("Require --every >= 1 and --extend >= 0")
+    folder = args.ckpt or os.path.join(args.out_dir, ".ssom_checkpoint")
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    fp = knob_fingerprint(args)
+    ck = load_checkpoint(folder)
+    if ck is None or ck["test"] != args.test or ck["fingerprint"] != fp:
+        ck = {"format": CHECKPOINT_FORMAT, "test": args.test, "fingerprint": fp, "parts": {}}
+    ck["ladder"] = {k: getattr(args, k) for k in LADDER_PARAMS if hasattr(args, k)}
+    ck["ladder"]["extend"] = args.extend
+
+    t0 = time.perf_counter()
+    report = []
+    for name, layout, parts in engine.plan(args, args.extend):
+        stem = os.path.splitext(name)[0]
+        written = []
+        for label, fn, xs, knobs, integral, extra in parts:
+            part_id = "{}.{}".format(stem, label)
+            rows, reused, computed, deny, status = run_part(folder, ck, part_id, fn, xs, knobs, integral, args.every)
+            written.append((part_id, rows, extra))
+            report.append((label, rows, reused, computed, deny, status))
+        write_trace(folder, os.path.join(args.out_dir, name), layout, written)
+    save_checkpoint(folder, ck)
+
+    print("SSOM checkpointed run complete: test {} ({:.2f} s)".format(args.test, time.perf_counter() - t0))
+    print("Checkpoint:", folder)
+    for label, rows, reused, computed, deny, status in report:
+        where = "no DENY" if deny is None else "first DENY at ~= {:.3e}".format(deny)
+        print("  {}: rows={} (reused {}, computed {}), last status={}, {}".format(
+            label, rows, reused, computed, status, where))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# ssom_complex_paths.py
+# Limit posture along approach paths in the complex plane: rays and logarithmic spirals into z0,
+# for functions such as exp(1/z) whose behaviour at an essential singularity depends on the
+# direction. A batch of directions is evaluated in one vectorized pass.
+# The posture reads |f| for the log ratio exactly like run_posture. The sign flip becomes a
+# phase-winding weight w = |arg f_k - arg f_{k-1}| / pi (wrapped, in [0, 1]), charged as
+# beta_flip * w to the lane and gamma_flip * w to the strain. For real values of opposite sign
+# w is exactly 1, so a path on the real axis reproduces the real engine, e.g. a3's paths for
+# z sin(1/z).
+# Outputs: a horizon per path and an angular posture map (status over direction x radius).
+import argparse
+import cmath
+import csv
+import math
+import os
+from array import array
+from types import SimpleNamespace
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+from ssom_functions import ComplexMath
+
+PRESETS = {
+    "zsin1z": ("z * sin(1.0 / z)", "a3's x sin(1/x) off the real axis"),
+    "exp1z": ("exp(1.0 / z)", "essential singularity: every value but 0 near z = 0"),
+    "exp_m1z2": ("exp(-1.0 / (z * z))", "flat along the real axis, unbounded along the imaginary one"),
+    "sinz_z": ("sin(z) / z", "removable singularity, limit 1 from every direction"),
+}
+RADII = ("log", "harmonic")
+# numpy under the names the expression language uses (asin -> arcsin, ...)
+NumpyMath = None if np is None else SimpleNamespace(**{
+    name: getattr(np, src[len("_np."):]) for name, (_, src, _) in functions.FUNCS.items()
+    if name not in functions.NON_ANALYTIC})
+
+class ComplexPosture:
+    __slots__ = ("status", "a", "s", "lr", "w", "stop", "winding")
+
+    def __init__(self, status, a, s, lr, w, stop, winding):
+        # per path (rows, steps): status / a / s / lr / phase weight w; stop: first DENY/ABSTAIN
+        # index or -1; winding: signed turns of f up to the stop (or the end)
+        self.status = status
+        self.a = a
+        self.s = s
+        self.lr = lr
+        self.w = w
+        self.stop = stop
+        self.winding = winding
+
+def radii(args):
+    if args.radii == "log":
+        return engine.log_ladder(args.r_max, args.r_min, args.steps)
+    # a3's sequences: 1 / (n pi + shift)
+    pi = math.pi
+    shift = pi * args.shift
+    return array("d", (1.0 / (n * pi + shift) for n in range(1, args.steps + 1)))
+
+def path_angles(args, rs, thetas):
+    # phase of every point: direction + twist turns per decade of radius
+    if args.twist == 0.0:
+        return [[t] * len(rs) for t in thetas]
+    turn = 2.0 * math.pi * args.twist
+    decades = [math.log10(rs[0] / r) for r in rs]
+    return [[t + turn * d for d in decades] for t in thetas]
+
+def evaluate(f, z0, rs, angles, use_numpy):
+    # f on every point z0 + r e^(i phi); one vector call for the whole batch of paths
+    if use_numpy:
+        r = np.asarray(rs, dtype=float)[None, :]
+        phi = np.asarray(angles, dtype=float)
+        z = (z0.real + r * np.cos(phi)) + 1j * (z0.imag + r * np.sin(phi))
+        with np.errstate(all="ignore"):
+            out = np.asarray(f(z), dtype=complex)
+        return np.broadcast_to(out, z.shape).copy(), z
+    out = []
+    zs = []
+    nan = complex(float("nan"), float("nan"))
+    for row in angles:
+        f_row = []
+        z_row = []
+        for r, phi in zip(rs, row):
+            z = complex(z0.real + r * math.cos(phi), z0.imag + r * math.sin(phi))
+            try:
+                v = complex(f(z))
+            except functions.SCALAR_ERRORS:
+                v = nan
+            f_row.append(v)
+            z_row.append(z)
+        out.append(f_row)
+        zs.append(z_row)
+    return out, zs
+
+def wrap(turn):
+    # phase step into [-pi, pi); phases are taken one value at a time, so tiny |f| cannot underflow
+    return (turn + math.pi) % (2.0 * math.pi) - math.pi
+
+def _posture_numpy(f, a_min, s_max, r_safe, beta_flip, gamma_flip, zero_tol):
+    rows, steps = f.shape
+    EPS = engine.EPS
+    with np.errstate(all="ignore"):
+        mag = np.abs(f)
+        if zero_tol > 0.0:
+            eff = np.where(mag <= zero_tol, 0.0, mag)
+            pa = eff[:, :-1]
+            ca = eff[:, 1:]
+            lr = np.where(
+                pa <= EPS,
+                np.where(ca <= EPS, 0.0, np.abs(np.log((ca + EPS) / EPS))),
+                np.where(ca <= EPS, np.abs(np.log(EPS / (pa + EPS))), np.abs(np.log((ca + EPS) / (pa + EPS)))),
+            )
+        else:
+            eff = mag
+            lr = np.abs(np.log((mag[:, 1:] + EPS) / (mag[:, :-1] + EPS)))
+        phase = np.angle(f)
+        turn = np.mod(phase[:, 1:] - phase[:, :-1] + math.pi, 2.0 * math.pi) - math.pi
+        live = (eff[:, 1:] > 0.0) & (eff[:, :-1] > 0.0) & np.isfinite(turn)
+        turn = np.where(live, turn, 0.0)
+        w = np.abs(turn) / math.pi
+
+        a = batch._clamp(1.0 / np.where(w > 0.0, 1.0 + lr + beta_flip * w, 1.0 + lr))
+        abst = ~np.isfinite(mag[:, 1:])
+        a = np.where(abst, np.nan, a)
+        lr = np.where(abst, np.nan, lr)
+        w = np.where(abst, 0.0, w)
+        turn = np.where(abst, 0.0, turn)
+
+        # same addition order as run_posture: s += (lr - r_safe); then s += gamma_flip * w
+        over = lr > r_safe
+        inc = np.where(over, lr - r_safe, 0.0)
+        s = np.zeros((rows, steps))
+        acc = np.zeros(rows)
+        for k in range(steps - 1):
+            acc = np.where(over[:, k], acc + inc[:, k], acc)
+            if gamma_flip != 0.0:
+                acc = np.where(w[:, k] > 0.0, acc + gamma_flip * w[:, k], acc)
+            s[:, k + 1] = acc
+
+        deny = ((a < a_min) | (s[:, 1:] > s_max) | ~np.isfinite(a)) & ~abst
+    halt = deny | abst
+    has = halt.any(axis=1)
+    stop = np.where(has, np.argmax(halt, axis=1) + 1, -1)
+
+    status = np.zeros((rows, steps), dtype=np.int8)
+    status[:, 1:] = np.where(abst, engine.ABSTAIN, np.where(deny, engine.DENY, engine.ALLOW))
+    after = np.arange(steps)[None, :] > np.where(has, stop, steps)[:, None]
+    status[after] = batch.NOT_REACHED
+    full = []
+    for first, vals in ((1.0, a), (0.0, lr), (0.0, w)):
+        out = np.full((rows, steps), first)
+        out[:, 1:] = vals
+        out[after] = np.nan
+        full.append(out)
+    s[after] = np.nan
+    upto = np.arange(1, steps)[None, :] <= np.where(has, stop, steps)[:, None]
+    winding = np.where(upto, turn, 0.0).sum(axis=1) / (2.0 * math.pi)
+    return ComplexPosture(status, full[0], s, full[1], full[2], stop, winding)
+
+def _posture_python(f, a_min, s_max, r_safe, beta_flip, gamma_flip, zero_tol):
+    # run_posture's loop with |f| for the magnitude and the phase weight for the flip
+    EPS = engine.EPS
+    log = math.log
+    isfinite = math.isfinite
+    nan = float("nan")
+    out = ComplexPosture([], [], [], [], [], [], [])
+    for row in f:
+        steps = len(row)
+        status = array("b", [batch.NOT_REACHED]) * steps
+        a_row = array("d", [nan]) * steps
+        s_row = array("d", [nan]) * steps
+        lr_row = array("d", [nan]) * steps
+        w_row = array("d", [nan]) * steps
+        status[0], a_row[0], s_row[0], lr_row[0], w_row[0] = engine.ALLOW, 1.0, 0.0, 0.0, 0.0
+        s = 0.0
+        turns = 0.0
+        stop = -1
+        for k in range(1, steps):
+            cur, prev = row[k], row[k - 1]
+            m = abs(cur)
+            if not isfinite(m):
+                status[k] = engine.ABSTAIN
+                stop = k
+                break
+            pm = abs(prev)
+            if zero_tol > 0.0:
+                ca = 0.0 if m <= zero_tol else m
+                pa = 0.0 if pm <= zero_tol else pm
+                if pa <= EPS and ca <= EPS:
+                    lr = 0.0
+                elif pa <= EPS:
+                    lr = abs(log((ca + EPS) / EPS))
+                elif ca <= EPS:
+                    lr = abs(log(EPS / (pa + EPS)))
+                else:
+                    lr = abs(log((ca + EPS) / (pa + EPS)))
+            else:
+                ca, pa = m, pm
+                lr = abs(log((m + EPS) / (pm + EPS)))
+            turn = wrap(cmath.phase(cur) - cmath.phase(prev)) if ca > 0.0 and pa > 0.0 else 0.0
+            if not isfinite(turn):
+                turn = 0.0
+            turns += turn
+            w = abs(turn) / math.pi
+            a = engine.clamp_lane(1.0 / (1.0 + lr + beta_flip * w) if w > 0.0 else 1.0 / (1.0 + lr))
+            if lr > r_safe:
+                s = s + (lr - r_safe)
+            if w > 0.0 and gamma_flip != 0.0:
+                s = s + gamma_flip * w
+            a_row[k], s_row[k], lr_row[k], w_row[k] = a, s, lr, w
+            deny = a < a_min or s > s_max or not isfinite(a)
+            status[k] = engine.DENY if deny else engine.ALLOW
+            if deny:
+                stop = k
+                break
+        out.status.append(status)
+        out.a.append(a_row)
+        out.s.append(s_row)
+        out.lr.append(lr_row)
+        out.w.append(w_row)
+        out.stop.append(stop)
+        out.winding.append(turns / (2.0 * math.pi))
+    return out
+
+def complex_posture(f, a_min, s_max, r_safe, beta_flip=0.0, gamma_flip=0.0, zero_tol=0.0, use_numpy=True):
+    # f: (paths, steps) complex values; zero_tol > 0 selects the LR_ZERO_TOL log ratio
+    if np is not None and use_numpy:
+        return _posture_numpy(np.asarray(f, dtype=complex), a_min, s_max, r_safe, beta_flip, gamma_flip, zero_tol)
+    return _posture_python(f, a_min, s_max, r_safe, beta_flip, gamma_flip, zero_tol)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--func", default="exp1z", help="preset ({}) or expression in z".format(", ".join(sorted(PRESETS))))
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into the expression (repeatable)")
+    ap.add_argument("--z0", type=complex, default=0j, help="point approached, e.g. 1+2j")
+    ap.add_argument("--directions", type=int, default=72, help="paths, evenly spaced in angle")
+    ap.add_argument("--theta0", type=float, default=0.0, help="angle of the first path (degrees)")
+    ap.add_argument("--twist", type=float, default=0.0, help="spiral: turns per decade of radius (0 = rays)")
+    ap.add_argument("--radii", choices=RADII, default="log", help="log ladder, or a3's 1/(n pi + shift)")
+    ap.add_argument("--r_max", type=float, default=1e-1)
+    ap.add_argument("--r_min", type=float, default=1e-8)
+    ap.add_argument("--shift", type=float, default=0.0, help="--radii harmonic: shift in multiples of pi")
+    ap.add_argument("--steps", type=int, default=200)
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    ap.add_argument("--zero_tol", type=float, default=0.0, help="|f| at or below this counts as 0 (a3 uses 1e-12)")
+    ap.add_argument("--batch", type=int, default=256, help="paths per vectorized pass")
+    ap.add_argument("--scalar", action="store_true", help="evaluate with cmath instead of NumPy")
+    ap.add_argument("--out_dir", default="out_ssom_complex_paths")
+    args = ap.parse_args(argv)
+
+    if args.directions < 1 or args.batch < 1:
+        raise ValueError("Require --directions >= 1 and --batch >= 1")
+    if args.steps < 5:
+        raise ValueError("Require --steps >= 5")
+    if args.radii == "log":
+        engine._check_ladder(argparse.Namespace(h_max=args.r_max, h_min=args.r_min, steps=args.steps), 5)
+    expr = PRESETS[args.func][0] if args.func in PRESETS else args.func
+    params = functions.parse_params(args.param)
+    use_numpy = np is not None and not args.scalar
+    module = NumpyMath if use_numpy else ComplexMath
+    f = functions.compile_analytic(expr, params, module, variables=("z",))
+
+    rs = radii(args)
+    thetas = [math.radians(args.theta0 + 360.0 * j / args.directions) for j in range(args.directions)]
+    knobs = dict(a_min=args.a_min, s_max=args.s_max, r_safe=args.r_safe, beta_flip=args.beta_flip,
+                 gamma_flip=args.gamma_flip, zero_tol=args.zero_tol, use_numpy=use_numpy)
+    os.makedirs(args.out_dir, exist_ok=True)
+    paths_csv = os.path.join(args.out_dir, "complex_paths_ssom.csv")
+    map_csv = os.path.join(args.out_dir, "complex_posture_map_ssom.csv")
+    results = []
+    with open(map_csv, "w", newline="", encoding="utf-8") as fm:
+        wm = csv.writer(fm)
+        wm.writerow(["path", "theta_deg", "k", "r", "abs_f", "arg_f", "a", "s", "phase_weight", "status"])
+        for start in range(0, args.directions, args.batch):
+            chunk = thetas[start:start + args.batch]
+            vals, zs = evaluate(f, args.z0, rs, path_angles(args, rs, chunk), use_numpy)
+            res = complex_posture(vals, **knobs)
+            for j in range(len(chunk)):
+                p = start + j
+                deg = math.degrees(chunk[j])
+                for k, r in enumerate(rs):
+                    v = complex(vals[j][k])
+                    wm.writerow([p, "{:.6f}".format(deg), k, "{:.6e}".format(r), "{:.16e}".format(abs(v)),
+                                 "{:.8f}".format(cmath.phase(v)), "{:.8f}".format(res.a[j][k]),
+                                 "{:.8f}".format(res.s[j][k]), "{:.8f}".format(res.w[j][k]),
+                                 batch.STATUS_NAMES[int(res.status[j][k])]])
+                k = int(res.stop[j])
+                z = complex(zs[j][k]) if k >= 0 else None
+                results.append((p, deg, k, batch.STATUS_NAMES[int(res.status[j][k])] if k >= 0 else "NONE",
+                                rs[k] if k >= 0 else None, z, float(res.s[j][k]) if k >= 0 else float(res.s[j][-1]),
+                                float(res.winding[j])))
+
+    with open(paths_csv, "w", newline="", encoding="utf-8") as f_out:
+        w = csv.writer(f_out)
+        w.writerow(["path", "theta_deg", "twist", "stop_k", "stop_status", "horizon_r", "z_stop_re", "z_stop_im",
+                    "s", "winding_turns"])
+        for p, deg, k, status, r, z, s, turns in results:
+            w.writerow([p, "{:.6f}".format(deg), args.twist, k, status, "" if r is None else "{:.6e}".format(r),
+                        "" if z is None else "{:.16e}".format(z.real), "" if z is None else "{:.16e}".format(z.imag),
+                        "{:.8f}".format(s), "{:.6f}".format(turns)])
+
+    print("SSOM complex-path posture complete: f(z) = {} as z -> {}, {} paths ({} radii, twist {})".format(
+        expr, args.z0, args.directions, args.radii, args.twist))
+    print("Output:", paths_csv)
+    print("Output:", map_csv)
+    counts = {}
+    for row in results:
+        counts[row[3]] = counts.get(row[3], 0) + 1
+    print("  " + ", ".join("{} {}".format(name, counts[name]) for name in sorted(counts)))
+    stopped = [row for row in results if row[4] is not None]
+    if stopped:
+        widest = max(stopped, key=lambda row: row[4])
+        narrowest = min(stopped, key=lambda row: row[4])
+        print("  widest horizon: r ~= {:.3e} at {:.1f} deg ({}); narrowest: r ~= {:.3e} at {:.1f} deg ({})".format(
+            widest[4], widest[1], widest[3], narrowest[4], narrowest[1], narrowest[3]))
+    return results
+
+if __name__ == "__main__":
+    main()
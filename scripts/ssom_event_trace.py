@@ -0,0 +1,93 @@
+# ssom_event_trace.py
+# Inspect and expand .ssome event traces written by `ssom_fast_engine.py <test> --trace_mode events`.
+# An event trace keeps only the posture transitions and the rows where log_ratio exceeds r_safe;
+# "expand" replays the recorded run and writes the dense CSV (and optionally .ssomb) exactly.
+import argparse
+import csv
+import os
+import sys
+
+import ssom_fast_engine as engine
+
+def list_event_files(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, n) for n in sorted(os.listdir(path)) if n.endswith(engine.EVT_SUFFIX)]
+    return [path]
+
+def event_rows(meta, parts):
+    # the stored event records rendered through the trace layout, as CSV fields
+    _, fields, fmt, _ = engine.LAYOUTS[meta["layout"]]
+    index = {name: i for i, name in enumerate(engine.BIN_FIELDS)}
+    extras = meta["extras"]
+    for _, records in parts:
+        for rec in records:
+            vals = []
+            for name in fields:
+                if name == "extra":
+                    vals.append(extras[rec[0]])
+                elif name == "status":
+                    vals.append(engine.STATUS_NAMES[rec[index["status"]]])
+                else:
+                    vals.append(rec[index[name]])
+            yield fmt.format(*vals)[:-2].split(",")
+
+def cmd_info(args):
+    for path in list_event_files(args.path):
+        meta, _ = engine.read_events(path)
+        rows = sum(meta["rows"])
+        print("{}: test {} layout {}, {} rows -> {} segments + {} event rows, {} bytes".format(
+            os.path.basename(path), meta["params"]["test"], meta["layout"], rows,
+            sum(meta["segments"]), sum(meta["events"]), os.path.getsize(path)))
+
+def cmd_segments(args):
+    meta, parts = engine.read_events(args.path)
+    k0 = engine.LAYOUTS[meta["layout"]][3]
+    w = csv.writer(sys.stdout)
+    w.writerow(["part", "first_k", "last_k", "rows", "status", "sign_flip"])
+    for p, (segments, _) in enumerate(parts):
+        for start, length, status, flip in segments:
+            w.writerow([p, k0 + start, k0 + start + length - 1, length, engine.STATUS_NAMES[status], flip])
+
+def cmd_events(args):
+    meta, parts = engine.read_events(args.path)
+    header = engine.LAYOUTS[meta["layout"]][0]
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        w = csv.writer(out)
+        w.writerow(header)
+        w.writerows(event_rows(meta, parts))
+    finally:
+        if args.out:
+            out.close()
+
+def cmd_expand(args):
+    for path in list_event_files(args.path):
+        meta, parts = engine.replay_events(path)
+        out_dir = args.out_dir or os.path.dirname(path) or "."
+        os.makedirs(out_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        out_csv = os.path.join(out_dir, stem + ".csv")
+        engine.write_layout(out_csv, meta["layout"], *parts)
+        if args.binary:
+            engine.write_binary(engine.binary_path(out_csv), meta["layout"], *parts)
+        print("Expanded {} -> {} ({} rows)".format(path, out_csv, sum(meta["rows"])))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="row, segment and event counts")
+    p.add_argument("path", help=".ssome file or directory")
+    p = sub.add_parser("segments", help="run-length segments of constant status / sign_flip as CSV")
+    p.add_argument("path")
+    p = sub.add_parser("events", help="the stored event rows as CSV in the trace layout")
+    p.add_argument("path")
+    p.add_argument("--out", default="")
+    p = sub.add_parser("expand", help="replay and write the dense trace")
+    p.add_argument("path", help=".ssome file or directory")
+    p.add_argument("--out_dir", default="", help="default: next to the event trace")
+    p.add_argument("--binary", action="store_true", help="also write the .ssomb binary trace")
+    args = ap.parse_args(argv)
+    {"info": cmd_info, "segments": cmd_segments, "events": cmd_events, "expand": cmd_expand}[args.cmd](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# ssom_exact_slopes.py
+# Cancellation-free reference slopes for the derivative ladders (1b, a6, a9 or any expression).
+# Two float64 backends for analytic functions:
+#   dual    - forward-mode dual numbers carried to order K (Taylor jets): one pass at x0 gives
+#             c_k = f^(k)(x0) / k!, and the difference quotient of every ladder step is summed
+#             from them, D(h) = sum c_k h^(k-1) (odd k only for the central scheme), so
+#             f(x0 + h) - f(x0) is never formed;
+#   complex - the complex step Im f(x0 + i h) / h at a tiny h, free of subtraction as well. It
+#             estimates f'(x0), not D(h), so it is no ladder: it cross-checks the jet's c_1, and a
+#             jet that disagrees with it is not trusted as a reference.
+# The posture runs over the plain finite-difference ladder and over the dual ladder. A DENY that
+# the dual ladder reproduces is structure; one that comes after the two ladders part is round-off.
+# Only functions that are not analytic at x0 (branches, abs, 1/x at 0, ...) still need a
+# high-precision re-evaluation.
+import argparse
+import csv
+import math
+import os
+from array import array
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+from ssom_functions import ComplexMath, Jet, JetMath
+
+SCHEMES = ("forward", "central")
+BACKENDS = ("fd", "dual")
+# test -> (registered function, schemes, flip knobs taken from the engine flags)
+TESTS = {
+    "1b": ("x2sin1x", ("forward",), True),
+    "a6": ("1mcos", ("forward",), True),
+    "a9": ("1mcos", ("forward", "central"), False),
+}
+ULP = 2.0 ** -52
+COMPLEX_H = 1e-20  # complex step, relative to max(1, |x0|); its O(h^2) error is far below an ulp
+
+def analytic_forms(spec, params):
+    # (jet callable, complex callable) or (None, reason) when the expression is not analytic
+    if spec in functions.REGISTRY:
+        expr, defaults, _ = functions.REGISTRY[spec]
+        merged = dict(defaults)
+        merged.update((k, v) for k, v in params.items() if k in defaults)
+    else:
+        expr, merged = spec, params
+    try:
+        return (functions.compile_analytic(expr, merged, JetMath),
+                functions.compile_analytic(expr, merged, ComplexMath))
+    except functions.ExpressionError as exc:
+        return None, str(exc)
+
+def taylor_coefficients(f_jet, x0, order):
+    # [f(x0), f'(x0), f''(x0)/2, ...] or None where the series does not exist
+    try:
+        out = f_jet(Jet.variable(x0, order))
+    except functions.SCALAR_ERRORS:
+        return None
+    c = out.c if isinstance(out, Jet) else [float(out)] + [0.0] * order
+    return c if all(math.isfinite(v) for v in c) else None
+
+def dual_slopes(coeffs, hs, scheme):
+    # D(h) by Horner from the Taylor coefficients; nan where the truncated tail is not negligible
+    nan = float("nan")
+    out = array("d")
+    if coeffs is None:
+        return array("d", [nan]) * len(hs)
+    order = len(coeffs) - 1
+    ks = [k for k in range(1, order + 1) if scheme == "forward" or k % 2 == 1]
+    for h in hs:
+        d = 0.0
+        for k in reversed(ks):
+            d = d * (h if scheme == "forward" else h * h) + coeffs[k]
+        tail = abs(coeffs[ks[-1]]) * h ** (ks[-1] - 1)
+        if len(ks) > 1:
+            tail += abs(coeffs[ks[-2]]) * h ** (ks[-2] - 1)
+        out.append(d if tail == 0.0 or tail <= ULP * abs(d) else nan)
+    return out
+
+def complex_derivative(f_complex, x0):
+    # f'(x0) by the complex step, or nan where f cannot be evaluated off the real axis
+    h = COMPLEX_H * max(1.0, abs(x0))
+    try:
+        v = complex(f_complex(complex(x0, h))).imag / h
+    except functions.SCALAR_ERRORS:
+        return float("nan")
+    return v if math.isfinite(v) else float("nan")
+
+def jet_checked(coeffs, fprime, rtol):
+    # False when the complex step contradicts the jet's f'(x0); a nan complex step cannot object
+    if coeffs is None or not math.isfinite(fprime):
+        return coeffs is not None
+    return abs(coeffs[1] - fprime) <= rtol * max(abs(coeffs[1]), abs(fprime))
+
+def fd_slopes(f, x0, hs, scheme):
+    # the engine's difference quotients (x0 = 0 reproduces _slope_a6 / _central_a9 exactly)
+    f0 = f(x0)
+    if scheme == "forward":
+        return array("d", ((f(x0 + h) - f0) / h for h in hs))
+    return array("d", ((f(x0 + h) - f(x0 - h)) / (2.0 * h) for h in hs))
+
+def verdict(res, fd_row, ref_row, rtol, dual_ok):
+    # (verdict, first step where fd and dual part, or -1)
+    part = -1
+    for k, (a, b) in enumerate(zip(fd_row, ref_row)):
+        if math.isfinite(b) and abs(a - b) > rtol * abs(b) and abs(a - b) > 0.0:
+            part = k
+            break
+    k_fd = int(res.stop[0])
+    k_ref = int(res.stop[1])
+    if not dual_ok:
+        return "NEEDS_MP", part
+    if k_fd < 0:
+        return "ALLOW", part
+    if k_fd == k_ref and (part < 0 or part > k_fd):
+        return "STRUCTURAL", part
+    if 0 <= part <= k_fd:
+        return "ROUNDOFF", part
+    return "NEEDS_MP", part
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--test", choices=sorted(TESTS), default="a6", help="engine ladder and function to mirror")
+    ap.add_argument("--func", default="", help="registered name or expression in x (overrides the test's)")
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into the expression (repeatable)")
+    ap.add_argument("--x0", type=float, default=0.0)
+    ap.add_argument("--scheme", default="", help="comma-separated: forward,central (default: the test's)")
+    ap.add_argument("--h_max", type=float, default=None)
+    ap.add_argument("--h_min", type=float, default=None)
+    ap.add_argument("--steps", type=int, default=None)
+    ap.add_argument("--a_min", type=float, default=None)
+    ap.add_argument("--s_max", type=float, default=None)
+    ap.add_argument("--r_safe", type=float, default=None)
+    ap.add_argument("--order", type=int, default=24, help="dual-number (Taylor jet) order K")
+    ap.add_argument("--rtol", type=float, default=1e-8, help="relative gap at which fd and dual ladders part")
+    ap.add_argument("--scalar", action="store_true", help="run the posture with the stdlib backend")
+    ap.add_argument("--out_dir", default="out_ssom_exact_slopes")
+    args = ap.parse_args()
+
+    # ladder and thresholds: the engine's defaults for the test, then explicit flags
+    base = engine.build_parser().parse_args([args.test])
+    for name in ("h_max", "h_min", "steps", "a_min", "s_max", "r_safe"):
+        if getattr(args, name) is None:
+            setattr(args, name, getattr(base, name))
+    engine._check_ladder(args, 5)
+    if args.order < 2:
+        raise ValueError("Require --order >= 2")
+    spec, schemes, flips = TESTS[args.test]
+    spec = args.func or spec
+    if args.scheme:
+        schemes = [s for s in args.scheme.split(",") if s]
+        for s in schemes:
+            if s not in SCHEMES:
+                raise ValueError("unknown scheme {!r} (choose from {})".format(s, ", ".join(SCHEMES)))
+    params = functions.parse_params(args.param)
+    fn = functions.resolve(spec, params)
+    knobs = dict(abstain=engine.ABSTAIN_NONFINITE, **engine.strain_kw(argparse.Namespace(
+        strain=engine.STRAIN_CUMULATIVE, strain_window=0, strain_decay=1.0)))
+    if flips:
+        knobs.update(beta_flip=base.beta_flip, gamma_flip=base.gamma_flip)
+    use_numpy = np is not None and not args.scalar
+
+    hs = engine.log_ladder(args.h_max, args.h_min, args.steps, grouped=args.test != "a9")
+    f_jet, f_complex = analytic_forms(spec, params)
+    coeffs = taylor_coefficients(f_jet, args.x0, args.order) if f_jet is not None else None
+    fprime = complex_derivative(f_complex, args.x0) if f_jet is not None else float("nan")
+    dual_ok = jet_checked(coeffs, fprime, args.rtol)
+    why = f_complex if f_jet is None else ("no Taylor series at x0" if coeffs is None else
+                                           "" if dual_ok else "the complex step disagrees with the jet's f'(x0)")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    results = []
+    trace_csv = os.path.join(args.out_dir, "exact_slopes_trace_ssom.csv")
+    with open(trace_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["scheme", "k", "h", "m_fd", "m_dual", "rel_gap", "status_fd", "status_dual"])
+        for scheme in schemes:
+            rows = [fd_slopes(fn.scalar, args.x0, hs, scheme), dual_slopes(coeffs, hs, scheme)]
+            res = batch.batch_posture(rows, args.a_min, args.s_max, args.r_safe, use_numpy=use_numpy, **knobs)
+            v, part = verdict(res, rows[0], rows[1], args.rtol, dual_ok)
+            results.append((scheme, res, v, part))
+            for k, h in enumerate(hs):
+                fd, dual = rows[0][k], rows[1][k]
+                gap = abs(fd - dual) / abs(dual) if dual == dual and dual != 0.0 else float("nan")
+                w.writerow([scheme, k, "{:.3e}".format(h), "{:.16e}".format(fd), "{:.16e}".format(dual),
+                            "{:.3e}".format(gap)] +
+                           [batch.STATUS_NAMES[int(res.status[r][k])] for r in range(len(BACKENDS))])
+
+    summary_csv = os.path.join(args.out_dir, "exact_slopes_summary_ssom.csv")
+    with open(summary_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["scheme", "backend", "stop_k", "stop_status", "stop_h", "verdict", "part_h",
+                    "fprime_dual", "fprime_complex"])
+        for scheme, res, v, part in results:
+            for r, backend in enumerate(BACKENDS):
+                k = int(res.stop[r])
+                fd = backend == "fd"
+                w.writerow([scheme, backend, k, res.stop_status(r), "{:.3e}".format(hs[k]) if k >= 0 else "",
+                            v if fd else "", "{:.3e}".format(hs[part]) if part >= 0 and fd else "",
+                            "{:.16e}".format(coeffs[1]) if fd and coeffs is not None else "",
+                            "{:.16e}".format(fprime) if fd and math.isfinite(fprime) else ""])
+
+    print("SSOM exact slopes complete: f(x) = {} at x0 = {}, {} ladder ({} steps)".format(
+        spec, args.x0, args.test, len(hs)))
+    print("Output:", trace_csv)
+    print("Output:", summary_csv)
+    if why:
+        print("No cancellation-free reference ({}): a high-precision re-evaluation is still needed".format(why))
+    if coeffs is not None and math.isfinite(fprime):
+        print("  f'(x0): jet {:.16e}, complex step {:.16e} ({})".format(
+            coeffs[1], fprime, "agree" if dual_ok else "disagree"))
+    available = (True, coeffs is not None)
+    for scheme, res, v, part in results:
+        stops = ", ".join("{} {}".format(b, "unavailable" if not available[r] else "no DENY" if int(res.stop[r]) < 0
+                                         else "{} at h ~= {:.3e}".format(res.stop_status(r), hs[int(res.stop[r])]))
+                          for r, b in enumerate(BACKENDS))
+        gap = "" if part < 0 else "; fd leaves the dual ladder at h ~= {:.3e}".format(hs[part])
+        print("  {}: {} -> {}{}".format(scheme, stops, v, gap))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# ssom_expr_screen.py
+# Screen registered or user-supplied functions through the derivative, limit or integral
+# posture engines. Each function is compiled once (ssom_functions), evaluated over the whole
+# ladder / path / grid in one call, and all functions of a block share one batched posture pass.
+import argparse
+import csv
+import math
+import os
+from array import array
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+
+MODES = ("derivative", "limit", "integral")
+
+def read_func_file(path):
+    # one function per line: "expr" or "name: expr"; '#' starts a comment
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            name, sep, expr = line.partition(":")
+            out.append((name.strip(), expr.strip()) if sep else (None, line))
+    return out
+
+def own_params(spec, params):
+    # the shared --params a spec takes: all for an expression, its own for a registered name
+    if spec in functions.REGISTRY:
+        return {k: v for k, v in params.items() if k in functions.REGISTRY[spec][1]}
+    if spec.startswith(functions.TABLE_PREFIX):
+        return {}
+    return params
+
+def sample_points(args):
+    # the x values each function is evaluated at, plus the ladder / path / grid for the trace
+    if args.mode == "derivative":
+        hs = engine.log_ladder(args.h_max, args.h_min, args.steps)
+        fwd = array("d", (args.x0 + h for h in hs))
+        back = array("d", (args.x0 - h for h in hs)) if args.central else None
+        return hs, fwd, back
+    if args.mode == "limit":
+        pi = math.pi
+        if args.path == "harmonic":
+            xs = array("d", (args.x0 + 1.0 / (n * pi + args.phase) for n in range(1, args.steps + 1)))
+        else:
+            xs = array("d", (args.x0 + args.ratio ** n for n in range(1, args.steps + 1)))
+        return xs, xs, None
+    span = args.b - args.a
+    xs = array("d", (args.a + span * (i / args.steps) for i in range(args.steps + 1)))
+    return xs, xs, None
+
+def magnitudes(fn, args, axis, fwd, back, use_numpy):
+    # m per step for one function, as ndarray (NumPy) or array('d')
+    if args.mode == "derivative":
+        f0 = fn.scalar(args.x0)
+        vf = fn.evaluate(fwd, use_numpy)
+        if back is not None:
+            vb = fn.evaluate(back, use_numpy)
+            if use_numpy and np is not None and not isinstance(vf, array):
+                return (vf - vb) / (2.0 * np.asarray(axis))
+            return array("d", ((a - b) / (2.0 * h) for a, b, h in zip(vf, vb, axis)))
+        if use_numpy and np is not None and not isinstance(vf, array):
+            return (vf - f0) / np.asarray(axis)
+        return array("d", ((v - f0) / h for v, h in zip(vf, axis)))
+    if args.mode == "limit":
+        return fn.evaluate(fwd, use_numpy)
+    v = fn.evaluate(fwd[:-1], use_numpy)
+    if use_numpy and np is not None and not isinstance(v, array):
+        xs = np.asarray(fwd)
+        return v * (xs[1:] - xs[:-1])
+    return array("d", (v[i] * (fwd[i + 1] - fwd[i]) for i in range(len(v))))
+
+def knobs(args):
+    if args.mode == "derivative":
+        return dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_EPS,
+                    abstain=engine.ABSTAIN_NONFINITE)
+    return dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_ZERO_TOL,
+                zero_tol=args.zero_tol, abstain=engine.ABSTAIN_NEVER)
+
+def final_m(args, m_row, stop):
+    # last committed magnitude (running sum for integrals), as in the engine summaries
+    n = len(m_row) if stop < 0 else stop
+    if n == 0:
+        return 0.0
+    if args.mode == "integral":
+        total = 0.0
+        for i in range(n):
+            total += float(m_row[i])
+        return total
+    return float(m_row[n - 1])
+
+def write_trace(path, args, fn, axis, m_row, use_numpy):
+    # single-function trace in the layout of the matching reference test;
+    # integrals replay f(x_k) so the kernel forms dm = f(x_k) * dx itself
+    if args.mode == "integral":
+        vals = iter(fn.evaluate(axis[:-1], use_numpy))
+    else:
+        vals = iter(m_row)
+    step = (lambda _x: float(next(vals)))
+    if args.mode == "integral":
+        cols, _ = engine.run_posture(step, axis, args.a_min, args.s_max, args.r_safe, integral=True, **knobs(args))
+        engine.write_layout(path, "a5", cols)
+    elif args.mode == "limit":
+        cols, _ = engine.run_posture(step, axis, args.a_min, args.s_max, args.r_safe, **knobs(args))
+        engine.write_layout(path, "a3", cols)
+    else:
+        cols, _ = engine.run_posture(step, axis, args.a_min, args.s_max, args.r_safe, **knobs(args))
+        engine.write_layout(path, "a6", cols)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("mode", choices=MODES)
+    ap.add_argument("--func", action="append", default=[], help="registered name or expression in x (repeatable)")
+    ap.add_argument("--func_file", default="", help="one function per line: 'expr' or 'name: expr'")
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into expressions (repeatable)")
+    ap.add_argument("--list", action="store_true", help="list registered functions and exit")
+    ap.add_argument("--out_dir", default="out_ssom_expr_screen")
+    ap.add_argument("--x0", type=float, default=0.0, help="base point (derivative) or limit point (limit)")
+    ap.add_argument("--steps", type=int, default=200)
+    ap.add_argument("--h_max", type=float, default=1e-1)
+    ap.add_argument("--h_min", type=float, default=1e-15)
+    ap.add_argument("--central", action="store_true", help="central instead of forward slopes")
+    ap.add_argument("--path", choices=("harmonic", "geometric"), default="harmonic")
+    ap.add_argument("--phase", type=float, default=0.0, help="harmonic path: x_n = x0 + 1/(n*pi + phase)")
+    ap.add_argument("--ratio", type=float, default=0.5, help="geometric path: x_n = x0 + ratio^n")
+    ap.add_argument("--a", type=float, default=0.0, help="integral lower bound")
+    ap.add_argument("--b", type=float, default=1.0, help="integral upper bound")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    ap.add_argument("--zero_tol", type=float, default=1e-12)
+    ap.add_argument("--block", type=int, default=256, help="functions per batched posture pass")
+    ap.add_argument("--scalar", action="store_true", help="evaluate with math.* (bit-identical to the reference scripts)")
+    ap.add_argument("--trace", action="store_true", help="also write one trace CSV per function")
+    args = ap.parse_args()
+
+    if args.list:
+        for name, (expr, defaults, doc) in sorted(functions.REGISTRY.items()):
+            print("{:<11} {}  {}  {}".format(name, expr, defaults or "", doc))
+        return
+
+    if args.steps < 5:
+        raise ValueError("Require --steps >= 5")
+    if args.mode == "derivative" and (args.h_max <= 0.0 or args.h_min <= 0.0 or args.h_min >= args.h_max):
+        raise ValueError("Require 0 < h_min < h_max")
+    if args.mode == "integral" and not args.b > args.a:
+        raise ValueError("Require --a < --b")
+
+    params = functions.parse_params(args.param)
+    specs = [(None, f) for f in args.func]
+    if args.func_file:
+        specs += read_func_file(args.func_file)
+    if not specs:
+        raise ValueError("Give at least one --func or a --func_file")
+
+    # --param is shared by every screened function; one that none of them takes is a typo
+    taken = set()
+    for name, expr in specs:
+        taken.update(params if name is not None else own_params(expr, params))
+    unknown = sorted(set(params) - taken)
+    if unknown:
+        raise functions.ExpressionError("--param {} not taken by any screened function".format(", ".join(unknown)))
+    fns = [functions.resolve(expr, own_params(expr, params)) if name is None
+           else functions.compile_expr(expr, params, name) for name, expr in specs]
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    use_numpy = np is not None and not args.scalar
+    axis, fwd, back = sample_points(args)
+    kw = knobs(args)
+
+    out_csv = os.path.join(args.out_dir, "screen_ssom_{}.csv".format(args.mode))
+    unsafe = 0
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["index", "name", "expr", "stop_k", "stop_status", "stop_at", "last_allow_at", "final_m", "s_at_stop"])
+        for start in range(0, len(fns), args.block):
+            block = fns[start:start + args.block]
+            rows = [magnitudes(fn, args, axis, fwd, back, use_numpy) for fn in block]
+            if use_numpy:
+                rows = np.vstack(rows)
+            res = batch.batch_posture(rows, args.a_min, args.s_max, args.r_safe, use_numpy=use_numpy, **kw)
+            for i, fn in enumerate(block):
+                idx = start + i
+                k = int(res.stop[i])
+                st = res.stop_status(i)
+                if k >= 0:
+                    unsafe += 1
+                w.writerow([
+                    idx,
+                    fn.name,
+                    fn.expr,
+                    k,
+                    st,
+                    "{:.6e}".format(axis[k]) if k >= 0 else "",
+                    "{:.6e}".format(axis[k - 1] if k > 0 else axis[len(rows[i]) - 1]),
+                    "{:.12e}".format(final_m(args, rows[i], k)),
+                    "{:.8f}".format(float(res.s[i][k])),
+                ])
+                if args.trace:
+                    path = os.path.join(args.out_dir, "trace_ssom_expr_{}_{:05d}.csv".format(args.mode, idx))
+                    write_trace(path, args, fn, axis, rows[i], use_numpy)
+
+    print("SSOM expression screen complete: {} function(s), mode = {}".format(len(fns), args.mode))
+    print("Backend:", "numpy" if use_numpy else "stdlib")
+    print("Output:", out_csv)
+    print("Functions with a DENY/ABSTAIN horizon: {} of {}".format(unsafe, len(fns)))
+
+if __name__ == "__main__":
+    main()
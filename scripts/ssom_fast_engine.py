@@ -0,0 +1,1105 @@
+# ssom_fast_engine.py
+# Stdlib-only posture engine: columns live in array('d') / array('b'),
+# rows stay unformatted until write time. Reproduces the reference traces.
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import os
+import struct
+from array import array
+from itertools import islice, repeat
+
+try:
+    from ssm_infinity_core import clamp_lane
+except Exception:
+    def clamp_lane(a: float) -> float:
+        eps = 1e-12
+        return max(min(a, 1.0 - eps), -1.0 + eps)
+
+EPS = 1e-15
+
+ALLOW = 0
+DENY = 1
+ABSTAIN = 2
+STATUS_NAMES = ("ALLOW", "DENY", "ABSTAIN")
+
+# log-ratio variants used by the reference scripts
+LR_RATIO_MAX = 0   # 1a: |log(m / max(prev_m, EPS))|
+LR_EPS = 1         # 1b, a4, a6, a7, a9: |log((|m|+EPS) / (|prev_m|+EPS))|
+LR_ZERO_TOL = 2    # a3, a5: posture_step with zero tolerance
+
+# when a non-initial step abstains
+ABSTAIN_NEVER = 0
+ABSTAIN_NONFINITE = 1
+ABSTAIN_NONPOSITIVE = 2
+
+# running-sum variants for m_accum and strain
+ACCUM_NAIVE = "naive"        # reference: plain float addition
+ACCUM_KAHAN = "kahan"        # Kahan-Babuska (Neumaier) compensation
+ACCUM_PAIRWISE = "pairwise"  # naive within fixed chunks, chunk sums merged pairwise
+ACCUM_MODES = (ACCUM_NAIVE, ACCUM_KAHAN, ACCUM_PAIRWISE)
+
+# strain variants: the reference strain only ever grows
+STRAIN_CUMULATIVE = "cumulative"  # reference: s += increment
+STRAIN_WINDOW = "window"          # sum of the increments of the last W steps
+STRAIN_DECAY = "decay"            # s = decay * s + increment
+STRAIN_MODES = (STRAIN_CUMULATIVE, STRAIN_WINDOW, STRAIN_DECAY)
+
+class KahanBabuskaSum:
+    __slots__ = ("total", "comp")
+
+    def __init__(self):
+        self.total = 0.0
+        self.comp = 0.0
+
+    def add(self, v):
+        t = self.total + v
+        if abs(self.total) >= abs(v):
+            self.comp += (self.total - t) + v
+        else:
+            self.comp += (v - t) + self.total
+        self.total = t
+        return t + self.comp
+
+class ChunkedPairwiseSum:
+    __slots__ = ("chunk", "count", "local", "stack", "base")
+
+    def __init__(self, chunk=1024):
+        if chunk < 1:
+            raise ValueError("chunk must be >= 1")
+        self.chunk = chunk
+        self.count = 0
+        self.local = 0.0
+        self.stack = []   # [level, value], levels strictly decreasing
+        self.base = 0.0   # sum of completed chunks
+
+    def add(self, v):
+        self.local += v
+        self.count += 1
+        if self.count == self.chunk:
+            level = 0
+            val = self.local
+            stack = self.stack
+            while stack and stack[-1][0] == level:
+                val = stack.pop()[1] + val
+                level += 1
+            stack.append([level, val])
+            base = 0.0
+            for _, part in reversed(stack):
+                base += part
+            self.base = base
+            self.local = 0.0
+            self.count = 0
+        return self.base + self.local
+
+class WindowStrain:
+    __slots__ = ("ring", "pos", "s")
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("strain window must be >= 1")
+        self.ring = array("d", bytes(8 * window))
+        self.pos = 0
+        self.s = 0.0
+
+    def add(self, v):
+        ring = self.ring
+        pos = self.pos
+        s = (self.s + v) - ring[pos]
+        ring[pos] = v
+        pos += 1
+        if pos == len(ring):
+            # once per W steps, re-add the window oldest-first so the
+            # running add/subtract cannot drift
+            pos = 0
+            s = 0.0
+            for u in ring:
+                s += u
+        self.pos = pos
+        self.s = s
+        return s
+
+class DecayStrain:
+    __slots__ = ("decay", "s")
+
+    def __init__(self, decay):
+        if not 0.0 <= decay <= 1.0:
+            raise ValueError("strain decay must be in [0, 1]")
+        self.decay = decay
+        self.s = 0.0
+
+    def add(self, v):
+        s = self.s * self.decay + v
+        self.s = s
+        return s
+
+def make_strain(mode, window=0, decay=1.0):
+    if mode == STRAIN_WINDOW:
+        return WindowStrain(window)
+    if mode == STRAIN_DECAY:
+        return DecayStrain(decay)
+    raise ValueError("no strain object for mode {!r}".format(mode))
+
+def make_accumulator(mode, chunk=1024):
+    if mode == ACCUM_KAHAN:
+        return KahanBabuskaSum()
+    if mode == ACCUM_PAIRWISE:
+        return ChunkedPairwiseSum(chunk)
+    raise ValueError("no accumulator object for mode {!r}".format(mode))
+
+class TraceColumns:
+    __slots__ = ("x", "dx", "m", "m_eff", "m_accum", "a", "s", "lr", "flip", "status")
+
+    def __init__(self):
+        self.x = array("d")
+        self.dx = array("d")
+        self.m = array("d")
+        self.m_eff = array("d")
+        self.m_accum = array("d")
+        self.a = array("d")
+        self.s = array("d")
+        self.lr = array("d")
+        self.flip = array("b")
+        self.status = array("b")
+
+    def __len__(self):
+        return len(self.status)
+
+    def columns(self):
+        return (self.x, self.dx, self.m, self.m_eff, self.m_accum, self.a, self.s, self.lr)
+
+    def reserve(self, n):
+        # grow every column to n slots in one allocation each
+        extra = n - len(self.status)
+        if extra > 0:
+            for col in self.columns():
+                col.frombytes(bytes(8 * extra))
+            self.flip.frombytes(bytes(extra))
+            self.status.frombytes(bytes(extra))
+
+    def truncate(self, n):
+        for col in self.columns():
+            del col[n:]
+        del self.flip[n:]
+        del self.status[n:]
+
+    def last_status(self):
+        return STATUS_NAMES[self.status[-1]] if len(self.status) else "NO_TRACE"
+
+class PostureState:
+    # running state carried between run_posture calls over consecutive windows
+    __slots__ = ("s", "m_acc", "prev", "have_prev", "add_m", "add_s", "strain")
+
+    def __init__(self):
+        self.s = 0.0
+        self.m_acc = 0.0
+        self.prev = 0.0
+        self.have_prev = False
+        self.add_m = None
+        self.add_s = None
+        self.strain = None
+
+def snapshot_state(state) -> dict:
+    # PostureState as plain JSON data; floats keep their exact value through repr
+    def obj(o):
+        if o is None:
+            return None
+        out = {"type": type(o).__name__}
+        for name in o.__slots__:
+            v = getattr(o, name)
+            if isinstance(v, array):
+                v = list(v)
+            elif isinstance(v, list):
+                v = [list(x) for x in v]   # ChunkedPairwiseSum.stack
+            out[name] = v
+        return out
+    return {
+        "s": state.s,
+        "m_acc": state.m_acc,
+        "prev": state.prev,
+        "have_prev": state.have_prev,
+        "add_m": obj(state.add_m.__self__) if state.add_m is not None else None,
+        "add_s": obj(state.add_s.__self__) if state.add_s is not None else None,
+        "strain": obj(state.strain),
+    }
+
+_STATE_TYPES = {cls.__name__: cls for cls in (KahanBabuskaSum, ChunkedPairwiseSum, WindowStrain, DecayStrain)}
+
+def restore_state(data: dict):
+    def obj(d):
+        if d is None:
+            return None
+        cls = _STATE_TYPES[d["type"]]
+        o = cls.__new__(cls)
+        for name in cls.__slots__:
+            v = d[name]
+            setattr(o, name, array("d", v) if name == "ring" else v)
+        return o
+    state = PostureState()
+    state.s = data["s"]
+    state.m_acc = data["m_acc"]
+    state.prev = data["prev"]
+    state.have_prev = data["have_prev"]
+    add_m = obj(data["add_m"])
+    add_s = obj(data["add_s"])
+    state.add_m = add_m.add if add_m is not None else None
+    state.add_s = add_s.add if add_s is not None else None
+    state.strain = obj(data["strain"])
+    return state
+
+def log_ladder(h_max: float, h_min: float, steps: int, grouped: bool = True, extend: int = 0) -> array:
+    # grouped=True matches 1a/1b/a6/a7 (t = k/(steps-1) first),
+    # grouped=False matches a9 ((log_h_min - log_h_max) * i / (steps-1)).
+    # extend continues the same spacing past h_min; the first `steps` values never change.
+    log_h_max = math.log10(h_max)
+    log_h_min = math.log10(h_min)
+    span = log_h_min - log_h_max
+    hs = array("d")
+    n = steps - 1
+    if grouped:
+        for k in range(steps + extend):
+            hs.append(10 ** (log_h_max + span * (k / n)))
+    else:
+        for k in range(steps + extend):
+            hs.append(10 ** (log_h_max + span * k / n))
+    return hs
+
+def unit_grid(steps: int, extend: int = 0) -> array:
+    # extend continues the grid past 1 with the same spacing
+    return array("d", (i / steps for i in range(steps + 1 + extend)))
+
+def run_posture(fn, xs, a_min, s_max, r_safe, beta_flip=0.0, gamma_flip=0.0,
+                lr_mode=LR_EPS, zero_tol=0.0, abstain=ABSTAIN_NEVER,
+                deny_nonfinite=True, integral=False, cols=None, accum=ACCUM_NAIVE, chunk=1024, state=None,
+                strain=STRAIN_CUMULATIVE, strain_window=0, strain_decay=1.0, halt=True):
+    # Single pass over xs. With integral=False, m = fn(x) for every x;
+    # with integral=True, dm = fn(x0) * (x1 - x0) over consecutive pairs and
+    # m_accum carries the running sum. Stops at the first DENY / ABSTAIN.
+    # accum selects how m_accum and s are summed; only "naive" reproduces the reference traces.
+    # With a PostureState, the pass continues from (and updates) that state, so a long
+    # sequence can be fed window by window with the same result as one call.
+    # strain selects cumulative (reference), sliding-window or decaying strain; the latter
+    # two see one increment per step, (lr - r_safe if lr > r_safe) + (gamma_flip if flip).
+    # halt=False keeps going after a DENY (ABSTAIN rows are then skipped).
+    n = len(xs) - 1 if integral else len(xs)
+    if cols is None:
+        cols = TraceColumns()
+    base = len(cols)
+    cols.reserve(base + n)
+    c_x = cols.x
+    c_dx = cols.dx
+    c_m = cols.m
+    c_eff = cols.m_eff
+    c_acc = cols.m_accum
+    c_a = cols.a
+    c_s = cols.s
+    c_lr = cols.lr
+    c_flip = cols.flip
+    c_status = cols.status
+
+    isfinite = math.isfinite
+    log = math.log
+    nan = float("nan")
+    zero_tol_mode = lr_mode == LR_ZERO_TOL
+    ratio_max_mode = lr_mode == LR_RATIO_MAX
+    abstain_nonpos = abstain == ABSTAIN_NONPOSITIVE
+    check_abstain = abstain != ABSTAIN_NEVER
+    compensated = accum != ACCUM_NAIVE
+    if compensated:
+        if state is not None and state.add_m is not None:
+            add_m = state.add_m
+            add_s = state.add_s
+        else:
+            add_m = make_accumulator(accum, chunk).add
+            add_s = make_accumulator(accum, chunk).add
+
+    s = 0.0
+    m_acc = 0.0
+    prev = 0.0
+    have_prev = False
+    tracked = strain != STRAIN_CUMULATIVE
+    if tracked:
+        if state is not None and state.strain is not None:
+            strain_obj = state.strain
+        else:
+            strain_obj = make_strain(strain, strain_window, strain_decay)
+        add_strain = strain_obj.add
+    if state is not None:
+        s = state.s
+        m_acc = state.m_acc
+        prev = state.prev
+        have_prev = state.have_prev
+    first_deny_x = None
+    dx = 0.0
+    j = base - 1
+
+    for k in range(n):
+        x = xs[k]
+        if integral:
+            dx = xs[k + 1] - x
+            m = fn(x) * dx
+            m_new = m_acc + m
+        else:
+            m = fn(x)
+            m_new = m
+
+        flip = 0
+        if zero_tol_mode and abs(m) <= zero_tol:
+            m_eff = 0.0
+        else:
+            m_eff = m
+
+        if not have_prev:
+            a = 1.0
+            lr = 0.0
+            status = ALLOW
+        elif check_abstain and ((not isfinite(m)) or (abstain_nonpos and m <= 0.0)):
+            a = nan
+            lr = nan
+            status = ABSTAIN
+        else:
+            if ratio_max_mode:
+                lr = abs(log(m / max(prev, EPS)))
+                if prev <= 0.0:
+                    a = nan
+                else:
+                    a = clamp_lane(1.0 / (1.0 + lr))
+            else:
+                if zero_tol_mode:
+                    prev_eff = 0.0 if abs(prev) <= zero_tol else prev
+                    prev_abs = abs(prev_eff)
+                    cur_abs = abs(m_eff)
+                    if prev_abs <= EPS and cur_abs <= EPS:
+                        lr = 0.0
+                    elif prev_abs <= EPS:
+                        lr = abs(log((cur_abs + EPS) / EPS))
+                    elif cur_abs <= EPS:
+                        lr = abs(log(EPS / (prev_abs + EPS)))
+                    else:
+                        lr = abs(log((cur_abs + EPS) / (prev_abs + EPS)))
+                    if (prev_eff * m_eff) < 0.0:
+                        flip = 1
+                else:
+                    lr = abs(log((abs(m) + EPS) / (abs(prev) + EPS)))
+                    if (prev * m) < 0.0:
+                        flip = 1
+                if flip:
+                    a = clamp_lane(1.0 / (1.0 + lr + beta_flip))
+                else:
+                    a = clamp_lane(1.0 / (1.0 + lr))
+
+            if tracked:
+                inc = lr - r_safe if lr > r_safe else 0.0
+                if flip:
+                    inc += gamma_flip
+                s = add_strain(inc)
+            else:
+                if lr > r_safe:
+                    s = add_s(lr - r_safe) if compensated else s + (lr - r_safe)
+                if flip:
+                    s = add_s(gamma_flip) if compensated else s + gamma_flip
+
+            status = ALLOW
+            if (deny_nonfinite and not isfinite(a)) or (a < a_min) or (s > s_max):
+                status = DENY
+
+        if integral and compensated and status != ABSTAIN:
+            # only rows that are kept enter the compensated sum; an ABSTAIN row shows the
+            # tentative sum, as in naive mode, and leaves the accumulator as it was
+            m_new = add_m(m)
+
+        j += 1
+        c_x[j] = x
+        c_dx[j] = dx
+        c_m[j] = m
+        c_eff[j] = m_eff
+        c_acc[j] = m_new
+        c_a[j] = a
+        c_s[j] = s
+        c_lr[j] = lr
+        c_flip[j] = flip
+        c_status[j] = status
+
+        if status != ALLOW:
+            if status == DENY and first_deny_x is None:
+                first_deny_x = x
+            if halt:
+                break
+            if status == ABSTAIN:
+                continue
+
+        m_acc = m_new
+        prev = m
+        have_prev = True
+
+    cols.truncate(j + 1)
+    if state is not None:
+        state.s = s
+        state.m_acc = m_acc
+        state.prev = prev
+        state.have_prev = have_prev
+        if compensated:
+            state.add_m = add_m
+            state.add_s = add_s
+        if tracked:
+            state.strain = strain_obj
+    return cols, first_deny_x
+
+# ---------------------------------------------------------------------------
+# reference-test definitions (functions, ladders, row layouts)
+
+def f_sqrt(x: float) -> float:
+    if x < 0.0:
+        return float("nan")
+    return math.sqrt(x)
+
+def f_x2sin1x(x: float) -> float:
+    if x == 0.0:
+        return 0.0
+    return (x * x) * math.sin(1.0 / x)
+
+def f_xsin1x(x: float) -> float:
+    if x == 0.0:
+        return 0.0
+    return x * math.sin(1.0 / x)
+
+def f_1mcos(x: float) -> float:
+    return 1.0 - math.cos(x)
+
+def f_eps(x: float, eps_scale: float) -> float:
+    if x <= 0.0:
+        return 0.0
+    return eps_scale * (1.0 - math.exp(-x / eps_scale))
+
+def f_spiky(x: float, eps: float) -> float:
+    return 1.0 / math.sqrt(x + eps)
+
+def f_alt_square(x: float, blocks: int) -> float:
+    k = int(math.floor(x * blocks))
+    if k >= blocks:
+        k = blocks - 1
+    return 1.0 if (k % 2 == 0) else -1.0
+
+def _slope_1a(h):
+    return (f_sqrt(h) - 0.0) / h if h > 0.0 else float("nan")
+
+def _slope_1b(h):
+    return f_x2sin1x(h) / h if h > 0.0 else float("nan")
+
+def _slope_a6(h):
+    return f_1mcos(h) / h if h > 0.0 else float("nan")
+
+def _central_a9(h):
+    return (f_1mcos(h) - f_1mcos(-h)) / (2.0 * h) if h > 0 else float("nan")
+
+# header, column fields, row format, first row index
+LAYOUTS = {
+    "1a": (
+        ["k", "h", "m_slope", "a", "s", "log_ratio", "status"],
+        ("k", "x", "m", "a", "s", "lr", "status"),
+        "{},{:.3e},{:.8e},{:.8f},{:.8f},{:.8f},{}\r\n",
+        0,
+    ),
+    "1b": (
+        ["k", "h", "m_slope", "a", "s", "log_ratio_abs", "sign_flip", "status"],
+        ("k", "x", "m", "a", "s", "lr", "flip", "status"),
+        "{},{:.3e},{:.12e},{:.8f},{:.8f},{:.8f},{},{}\r\n",
+        0,
+    ),
+    "a3": (
+        ["n", "x_n", "m_raw=f(x_n)", "m_eff", "a", "s", "log_ratio_abs", "sign_flip", "status"],
+        ("k", "x", "m", "m_eff", "a", "s", "lr", "flip", "status"),
+        "{},{:.16e},{:.16e},{:.16e},{:.8f},{:.8f},{:.8f},{},{}\r\n",
+        1,
+    ),
+    "a4": (
+        ["step", "x", "delta_m", "m_accum", "a", "s", "log_ratio", "status"],
+        ("k", "x", "m", "m_accum", "a", "s", "lr", "status"),
+        "{},{:.6f},{:.8f},{:.8f},{:.6f},{:.6f},{:.6f},{}\r\n",
+        1,
+    ),
+    "a5": (
+        ["step", "x", "dx", "delta_m_raw", "delta_m_eff", "m_accum", "a", "s", "log_ratio", "sign_flip", "status"],
+        ("k", "x", "dx", "m", "m_eff", "m_accum", "a", "s", "lr", "flip", "status"),
+        "{},{:.6f},{:.10f},{:.12e},{:.12e},{:.12e},{:.8f},{:.8f},{:.8f},{},{}\r\n",
+        1,
+    ),
+    "a6": (
+        ["k", "h", "m_slope", "a", "s", "log_ratio_abs", "sign_flip", "status"],
+        ("k", "x", "m", "a", "s", "lr", "flip", "status"),
+        "{},{:.3e},{:.16e},{:.8f},{:.8f},{:.8f},{},{}\r\n",
+        0,
+    ),
+    "a7": (
+        ["k", "h", "eps_scale", "m_slope", "a", "s", "log_ratio_abs", "status"],
+        ("k", "x", "extra", "m", "a", "s", "lr", "status"),
+        "{},{:.3e},{:.3e},{:.16e},{:.8f},{:.8f},{:.8f},{}\r\n",
+        0,
+    ),
+    "a9": (
+        ["geometry", "k", "h", "m_slope", "a", "s", "log_ratio_abs", "status"],
+        ("extra", "k", "x", "m", "a", "s", "lr", "status"),
+        "{},{},{:.3e},{:.16e},{:.8f},{:.8f},{:.8f},{}\r\n",
+        0,
+    ),
+}
+
+def iter_rows(cols, fields, fmt, k0=0, extra=None):
+    # Formats rows lazily, one str per row; "extra" is a constant per-trace field.
+    n = len(cols)
+    sources = []
+    for name in fields:
+        if name == "k":
+            sources.append(range(k0, k0 + n))
+        elif name == "status":
+            sources.append(map(STATUS_NAMES.__getitem__, cols.status))
+        elif name == "extra":
+            sources.append(repeat(extra, n))
+        else:
+            sources.append(getattr(cols, name))
+    return map(fmt.format, *sources)
+
+def write_layout(path: str, layout: str, *parts):
+    # parts: TraceColumns, or (TraceColumns, extra) pairs appended in order
+    header, fields, fmt, k0 = LAYOUTS[layout]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(header) + "\r\n")
+        for part in parts:
+            cols, extra = part if isinstance(part, tuple) else (part, None)
+            f.writelines(iter_rows(cols, fields, fmt, k0, extra))
+
+def layout_digest(layout: str, *parts, batch=4096):
+    # (sha256, bytes, rows) of exactly what write_layout would write, without writing it
+    header, fields, fmt, k0 = LAYOUTS[layout]
+    h = hashlib.sha256()
+    data = (",".join(header) + "\r\n").encode("utf-8")
+    h.update(data)
+    size = len(data)
+    rows = 0
+    for part in parts:
+        cols, extra = part if isinstance(part, tuple) else (part, None)
+        it = iter_rows(cols, fields, fmt, k0, extra)
+        while True:
+            data = "".join(islice(it, batch)).encode("utf-8")
+            if not data:
+                break
+            h.update(data)
+            size += len(data)
+        rows += len(cols)
+    return h.hexdigest(), size, rows
+
+# Binary trace: magic line, one JSON metadata line, then fixed-size records
+# (part, k, x, dx, m, m_eff, m_accum, a, s, lr, flip, status), little-endian.
+BIN_MAGIC = b"SSOMBIN1\n"
+BIN_RECORD = struct.Struct("<Bq8dbb")
+BIN_FIELDS = ("part", "k", "x", "dx", "m", "m_eff", "m_accum", "a", "s", "lr", "flip", "status")
+BIN_SUFFIX = ".ssomb"
+
+def binary_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + BIN_SUFFIX
+
+def write_binary(path: str, layout: str, *parts):
+    k0 = LAYOUTS[layout][3]
+    parts = [part if isinstance(part, tuple) else (part, None) for part in parts]
+    meta = {
+        "layout": layout,
+        "extras": [extra for _, extra in parts],
+        "rows": [len(cols) for cols, _ in parts],
+    }
+    pack = BIN_RECORD.pack
+    with open(path, "wb") as f:
+        f.write(BIN_MAGIC)
+        f.write(json.dumps(meta, sort_keys=True).encode("utf-8") + b"\n")
+        for p, (cols, _) in enumerate(parts):
+            n = len(cols)
+            f.writelines(map(pack, repeat(p, n), range(k0, k0 + n), cols.x, cols.dx, cols.m, cols.m_eff,
+                             cols.m_accum, cols.a, cols.s, cols.lr, cols.flip, cols.status))
+
+def read_binary_meta(f):
+    if f.read(len(BIN_MAGIC)) != BIN_MAGIC:
+        raise ValueError("not an SSOM binary trace")
+    return json.loads(f.readline().decode("utf-8"))
+
+def iter_binary_records(f, chunk_rows: int = 4096):
+    # f must be positioned just after the metadata line
+    size = BIN_RECORD.size
+    while True:
+        buf = f.read(size * chunk_rows)
+        if not buf:
+            return
+        if len(buf) % size:
+            raise ValueError("truncated SSOM binary trace")
+        yield from BIN_RECORD.iter_unpack(buf)
+
+def iter_binary_csv_rows(f, meta):
+    # Renders binary records through the layout, giving the exact CSV row fields.
+    header, fields, fmt, _ = LAYOUTS[meta["layout"]]
+    extras = meta["extras"]
+    index = {name: i for i, name in enumerate(BIN_FIELDS)}
+    for rec in iter_binary_records(f):
+        vals = []
+        for name in fields:
+            if name == "extra":
+                vals.append(extras[rec[0]])
+            elif name == "status":
+                vals.append(STATUS_NAMES[rec[index["status"]]])
+            else:
+                vals.append(rec[index[name]])
+        yield fmt.format(*vals)[:-2].split(",")
+
+# Event trace: magic line, one JSON metadata line, then per part its run-length
+# segments of constant (status, flip) and the full records of every "event" row
+# (log_ratio > r_safe or not finite, plus the first and last row). The dense trace
+# is rebuilt by replaying the recorded run and is checked against a column digest.
+EVT_MAGIC = b"SSOMEVT1\n"
+EVT_SEGMENT = struct.Struct("<qqbb")
+EVT_SUFFIX = ".ssome"
+TRACE_MODES = ("dense", "events")
+_REPLAY_SKIP = ("out_dir", "binary", "trace_mode", "captured")
+
+def events_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + EVT_SUFFIX
+
+def column_digest(cols) -> str:
+    h = hashlib.sha256()
+    for col in cols.columns() + (cols.flip, cols.status):
+        h.update(col)
+    return h.hexdigest()
+
+def event_index(cols, r_safe: float):
+    # (segments, event rows): segments are (start, length, status, flip) runs
+    n = len(cols)
+    status = cols.status
+    flip = cols.flip
+    segments = []
+    start = 0
+    for i in range(1, n + 1):
+        if i == n or status[i] != status[start] or flip[i] != flip[start]:
+            segments.append((start, i - start, status[start], flip[start]))
+            start = i
+    isfinite = math.isfinite
+    rows = [i for i, v in enumerate(cols.lr) if v > r_safe or not isfinite(v)]
+    if n:
+        rows = sorted(set(rows) | {0, n - 1})
+    return segments, rows
+
+def write_events(path: str, layout: str, params: dict, r_safe: float, *parts):
+    k0 = LAYOUTS[layout][3]
+    parts = [part if isinstance(part, tuple) else (part, None) for part in parts]
+    indexed = [event_index(cols, r_safe) for cols, _ in parts]
+    meta = {
+        "layout": layout,
+        "params": params,
+        "r_safe": r_safe,
+        "extras": [extra for _, extra in parts],
+        "rows": [len(cols) for cols, _ in parts],
+        "segments": [len(seg) for seg, _ in indexed],
+        "events": [len(rows) for _, rows in indexed],
+        "digests": [column_digest(cols) for cols, _ in parts],
+    }
+    seg_pack = EVT_SEGMENT.pack
+    rec_pack = BIN_RECORD.pack
+    with open(path, "wb") as f:
+        f.write(EVT_MAGIC)
+        f.write(json.dumps(meta, sort_keys=True).encode("utf-8") + b"\n")
+        for p, ((cols, _), (segments, rows)) in enumerate(zip(parts, indexed)):
+            f.writelines(seg_pack(*seg) for seg in segments)
+            f.writelines(rec_pack(p, k0 + i, cols.x[i], cols.dx[i], cols.m[i], cols.m_eff[i], cols.m_accum[i],
+                                  cols.a[i], cols.s[i], cols.lr[i], cols.flip[i], cols.status[i]) for i in rows)
+
+def read_events(path: str):
+    # (meta, [(segments, records)] per part); records are BIN_RECORD tuples
+    with open(path, "rb") as f:
+        return read_events_file(f)
+
+def read_events_file(f):
+    if f.read(len(EVT_MAGIC)) != EVT_MAGIC:
+        raise ValueError("not an SSOM event trace")
+    meta = json.loads(f.readline().decode("utf-8"))
+    parts = []
+    for n_seg, n_evt in zip(meta["segments"], meta["events"]):
+        buf = f.read(EVT_SEGMENT.size * n_seg)
+        segments = list(EVT_SEGMENT.iter_unpack(buf))
+        buf = f.read(BIN_RECORD.size * n_evt)
+        if len(buf) != BIN_RECORD.size * n_evt:
+            raise ValueError("truncated SSOM event trace")
+        parts.append((segments, list(BIN_RECORD.iter_unpack(buf))))
+    return meta, parts
+
+def replay_events(path: str):
+    # Re-runs the recorded test and returns (meta, [(cols, extra)]) for this trace,
+    # after checking the replayed columns against the stored digests and events.
+    meta, stored = read_events(path)
+    params = meta["params"]
+    args = build_parser().parse_args([params["test"]])
+    for k, v in params.items():
+        setattr(args, k, v)
+    args.trace_mode = "capture"
+    args.captured = {}
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        TESTS[args.test](args)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    layout, parts = args.captured[stem]
+    parts = [part if isinstance(part, tuple) else (part, None) for part in parts]
+    if layout != meta["layout"] or len(parts) != len(stored):
+        raise ValueError("replay of {} produced a different trace layout".format(path))
+    k0 = LAYOUTS[layout][3]
+    for (cols, _), digest, (segments, records) in zip(parts, meta["digests"], stored):
+        seg, rows = event_index(cols, meta["r_safe"])
+        if column_digest(cols) != digest or seg != segments or [r[1] - k0 for r in records] != rows:
+            raise ValueError("replay of {} does not reproduce the recorded trace".format(path))
+    return meta, parts
+
+def replay_params(args) -> dict:
+    return {k: v for k, v in sorted(vars(args).items()) if k not in _REPLAY_SKIP}
+
+def emit(args, path: str, layout: str, *parts):
+    mode = getattr(args, "trace_mode", "dense")
+    if mode == "capture":
+        args.captured[os.path.splitext(os.path.basename(path))[0]] = (layout, parts)
+        return
+    if mode == "events":
+        write_events(events_path(path), layout, replay_params(args), args.r_safe, *parts)
+        return
+    write_layout(path, layout, *parts)
+    if getattr(args, "binary", False):
+        write_binary(binary_path(path), layout, *parts)
+
+def _check_ladder(args, min_steps):
+    if args.h_max <= 0.0 or args.h_min <= 0.0 or args.h_min >= args.h_max:
+        raise ValueError("Require 0 < h_min < h_max")
+    if args.steps < min_steps:
+        raise ValueError("Require --steps >= {}".format(min_steps))
+
+def strain_kw(args):
+    return {"strain": args.strain, "strain_window": args.strain_window, "strain_decay": args.strain_decay}
+
+def _report_h(cols, first_deny_h, out_csv, title):
+    print(title)
+    print("Output:", out_csv)
+    print("Last status:", cols.last_status())
+    if first_deny_h is not None:
+        print("First DENY at h ~= {:.3e}".format(first_deny_h))
+
+def _report_x(label, first_deny_x, none_msg):
+    if first_deny_x is None:
+        print(none_msg)
+    else:
+        print("{}: first DENY at x ~= {:.3e}".format(label, first_deny_x))
+
+def _final_m(cols):
+    # last committed magnitude: the reference drops the DENY step's m_accum
+    n = len(cols)
+    if n == 0:
+        return 0.0
+    if cols.status[n - 1] == DENY:
+        return cols.m_accum[n - 2] if n > 1 else 0.0
+    return cols.m_accum[n - 1]
+
+def summary(label: str, path: str, cols, first_deny):
+    return {
+        "label": label,
+        "trace": os.path.basename(path),
+        "rows": len(cols),
+        "first_deny": first_deny,
+        "last_status": cols.last_status(),
+        "final_m": _final_m(cols),
+    }
+
+def _run_plan(args):
+    # runs and emits every trace of the test's plan: [(path, [(label, cols, first_deny)])]
+    out = []
+    for name, layout, parts in plan(args):
+        path = os.path.join(args.out_dir, name)
+        done = []
+        emitted = []
+        for label, fn, xs, knobs, integral, extra in parts:
+            cols, deny = run_posture(fn, xs, integral=integral, **knobs)
+            done.append((label, cols, deny))
+            emitted.append(cols if extra is None else (cols, extra))
+        emit(args, path, layout, *emitted)
+        out.append((path, done))
+    return out
+
+def run_1a(args):
+    [(out_csv, [(label, cols, deny_h)])] = _run_plan(args)
+    _report_h(cols, deny_h, out_csv, "SSOM Test 1A complete: sqrt(x) forward-derivative at x=0")
+    return [summary(label, out_csv, cols, deny_h)]
+
+def run_1b(args):
+    [(out_csv, [(label, cols, deny_h)])] = _run_plan(args)
+    _report_h(cols, deny_h, out_csv, "SSOM Test 1B complete: f(x)=x^2*sin(1/x), forward-derivative at x=0 (classical derivative = 0)")
+    return [summary(label, out_csv, cols, deny_h)]
+
+def run_a3(args):
+    [(out_calm, [(_, cols_calm, deny_calm)]), (out_osc, [(_, cols_osc, deny_osc)])] = _run_plan(args)
+    print("SSOM Test A.3.1 (v2) complete: Structural limit with path-dependent posture for f(x)=x*sin(1/x) as x->0")
+    print("Output (calm path):", out_calm)
+    print("Output (osc path):", out_osc)
+    _report_x("Calm path", deny_calm, "Calm path: no DENY within steps = {}".format(args.steps))
+    _report_x("Osc path", deny_osc, "Osc path: no DENY within steps = {}".format(args.steps))
+    return [summary("calm", out_calm, cols_calm, deny_calm), summary("osc", out_osc, cols_osc, deny_osc)]
+
+def run_a4(args):
+    [(out_smooth, [(_, cols_smooth, deny_smooth)]), (out_spiky, [(_, cols_spiky, deny_spiky)])] = _run_plan(args)
+    print("SSOM Test A.4.1 complete: Structural integral (equal area)")
+    print("Output (smooth):", out_smooth)
+    print("Output (spiky):", out_spiky)
+    _report_x("Smooth integral", deny_smooth, "Smooth integral: no DENY")
+    _report_x("Spiky integral", deny_spiky, "Spiky integral: no DENY")
+    return [summary("smooth", out_smooth, cols_smooth, deny_smooth),
+            summary("spiky", out_spiky, cols_spiky, deny_spiky)]
+
+def run_a5(args):
+    [(out_zero, [(_, cols_zero, deny_zero)]), (out_cancel, [(_, cols_cancel, deny_cancel)])] = _run_plan(args)
+    print("SSOM Test A.5 complete: Structural integral cancellation (same classical value, different strain)")
+    print("Output (zero):", out_zero)
+    print("Output (cancellation):", out_cancel)
+    print("Zero integral: m_final ~= {:.6e}".format(_final_m(cols_zero)))
+    print("Cancellation integral: m_final ~= {:.6e}".format(_final_m(cols_cancel)))
+    _report_x("Zero integral", deny_zero, "Zero integral: no DENY")
+    _report_x("Cancellation integral", deny_cancel, "Cancellation integral: no DENY")
+    return [summary("zero", out_zero, cols_zero, deny_zero),
+            summary("cancellation", out_cancel, cols_cancel, deny_cancel)]
+
+def run_a6(args):
+    [(out_csv, [(label, cols, deny_h)])] = _run_plan(args)
+    _report_h(cols, deny_h, out_csv, "SSOM Test A.6 complete: Refinement fatigue in derivative at x=0 for f(x)=1-cos(x) (classical f'(0)=0)")
+    return [summary(label, out_csv, cols, deny_h)]
+
+def run_a7(args):
+    [(out_csv, [(label, cols, deny_h)])] = _run_plan(args)
+    _report_h(cols, deny_h, out_csv, "SSOM Test A.7 complete: Stiffness-like regime in derivative refinement at x=0 for f(x)=eps*(1-exp(-x/eps)) (classical f'(0)=1)")
+    return [summary(label, out_csv, cols, deny_h)]
+
+def run_a9(args):
+    [(out_csv, [(_, cols_fwd, deny_fwd), (_, cols_ctr, deny_ctr)])] = _run_plan(args)
+    print("SSOM Test A.9 complete: Geometry invariance (forward vs central)")
+    print("Output:", out_csv)
+    if deny_fwd is not None:
+        print("Forward diff: first DENY at h ~= {:.3e}".format(deny_fwd))
+    if deny_ctr is not None:
+        print("Central diff: first DENY at h ~= {:.3e}".format(deny_ctr))
+    return [summary("forward", out_csv, cols_fwd, deny_fwd), summary("central", out_csv, cols_ctr, deny_ctr)]
+
+# ---------------------------------------------------------------------------
+# the tests as (trace file, layout, [(label, fn, xs, run_posture knobs, integral, extra)]);
+# the runners above, ssom_pipeline, ssom_checkpoint and ssom_posture_budget all read this
+
+def _knobs(args, **kw):
+    knobs = dict(a_min=args.a_min, s_max=args.s_max, r_safe=args.r_safe, **strain_kw(args))
+    knobs.update(kw)
+    return knobs
+
+def _user_fn(args):
+    # --func: a registered name, table:PATH or expression in x that replaces the test's function
+    spec = getattr(args, "func", "")
+    if not spec:
+        return None
+    import ssom_functions as functions
+    return functions.resolve(spec, functions.parse_params(getattr(args, "param", [])))
+
+def _forward(f):
+    f0 = f(0.0)
+
+    def slope(h):
+        return (f(h) - f0) / h if h > 0.0 else float("nan")
+
+    return slope
+
+def _central(f):
+    def slope(h):
+        return (f(h) - f(-h)) / (2.0 * h) if h > 0.0 else float("nan")
+
+    return slope
+
+def plan(args, extend=0):
+    # extend > 0 continues every ladder / path / grid past its end with the same spacing;
+    # with --func the user function replaces f in the slopes, the a3 paths, the a4 spiky
+    # integrand (normalized to unit area) and the a5 cancellation integrand
+    t = args.test
+    user = _user_fn(args)
+    if t in ("1a", "1b", "a6", "a7"):
+        _check_ladder(args, 3 if t == "1a" else 5)
+    if t == "1a":
+        hs = log_ladder(args.h_max, args.h_min, args.steps, extend=extend)
+        return [("trace_ssom_derivative_sqrt0.csv", "1a", [
+            ("sqrt0", _slope_1a if user is None else _forward(user), hs, _knobs(args, lr_mode=LR_RATIO_MAX, abstain=ABSTAIN_NONPOSITIVE), False, None)])]
+    if t in ("1b", "a6"):
+        hs = log_ladder(args.h_max, args.h_min, args.steps, extend=extend)
+        fn, name, label = ((_slope_1b, "trace_ssom_derivative_x2sin1x_at0.csv", "x2sin1x") if t == "1b" else
+                           (_slope_a6, "trace_ssom_derivative_1minuscos_at0.csv", "1minuscos"))
+        if user is not None:
+            fn = _forward(user)
+        knobs = _knobs(args, beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, abstain=ABSTAIN_NONFINITE)
+        return [(name, t, [(label, fn, hs, knobs, False, None)])]
+    if t == "a7":
+        if args.eps_scale <= 0.0:
+            raise ValueError("Require --eps_scale > 0")
+        hs = log_ladder(args.h_max, args.h_min, args.steps, extend=extend)
+        eps_scale = args.eps_scale
+
+        def slope(h):
+            return f_eps(h, eps_scale) / h if h > 0.0 else float("nan")
+
+        if user is not None:
+            slope = _forward(user)
+        return [("trace_ssom_derivative_stiffness_exp_at0.csv", "a7", [
+            ("stiffness_exp", slope, hs, _knobs(args, abstain=ABSTAIN_NONFINITE), False, eps_scale)])]
+    if t == "a9":
+        hs = log_ladder(args.h_max, args.h_min, args.steps, grouped=False, extend=extend)
+        knobs = _knobs(args, abstain=ABSTAIN_NONFINITE)
+        return [("trace_ssom_derivative_geometry.csv", "a9", [
+            ("forward", _slope_a6 if user is None else _forward(user), hs, knobs, False, "forward"),
+            ("central", _central_a9 if user is None else _central(user), hs, knobs, False, "central")])]
+    if t == "a3":
+        if args.steps < 5:
+            raise ValueError("Require --steps >= 5")
+        pi = math.pi
+        xs_calm = array("d", (1.0 / (n * pi) for n in range(1, args.steps + 1 + extend)))
+        xs_osc = array("d", (1.0 / (n * pi + (pi / 2.0)) for n in range(1, args.steps + 1 + extend)))
+        knobs = _knobs(args, beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=LR_ZERO_TOL,
+                       zero_tol=args.m_zero_tol)
+        f = f_xsin1x if user is None else user
+        return [("trace_ssom_limit_path_calm.csv", "a3", [("calm", f, xs_calm, knobs, False, None)]),
+                ("trace_ssom_limit_path_oscillatory.csv", "a3", [("osc", f, xs_osc, knobs, False, None)])]
+    if t == "a4":
+        if extend:
+            raise ValueError("a4 normalizes the spiky integrand by the area of the whole grid; it cannot be extended")
+        xs = unit_grid(args.steps)
+        eps = args.eps
+        knobs = _knobs(args, deny_nonfinite=False, accum=args.accum, chunk=args.chunk)
+        spiky = (lambda x: f_spiky(x, eps)) if user is None else user
+        # builtin sum keeps the reference accumulation order and semantics
+        area = sum(spiky(xs[i]) * (xs[i + 1] - xs[i]) for i in range(len(xs) - 1))
+        if user is not None and not (math.isfinite(area) and area != 0.0):
+            raise ValueError("--func has area {!r} over the grid; a4 needs a finite, nonzero area".format(area))
+
+        def f_spiky_norm(x):
+            return spiky(x) / area
+
+        return [("trace_ssom_integral_smooth.csv", "a4", [("smooth", lambda x: 1.0, xs, knobs, True, None)]),
+                ("trace_ssom_integral_spiky.csv", "a4", [("spiky", f_spiky_norm, xs, knobs, True, None)])]
+    if t == "a5":
+        if args.steps < 10:
+            raise ValueError("Require --steps >= 10")
+        if args.blocks < 2 or (args.blocks % 2 != 0):
+            raise ValueError("Require --blocks to be an even integer >= 2")
+        xs = unit_grid(args.steps, extend)
+        blocks = args.blocks
+        knobs = _knobs(args, beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=LR_ZERO_TOL,
+                       zero_tol=args.dm_zero_tol, accum=args.accum, chunk=args.chunk)
+        return [("trace_ssom_integral_zero.csv", "a5", [("zero", lambda x: 0.0, xs, knobs, True, None)]),
+                ("trace_ssom_integral_cancellation.csv", "a5",
+                 [("cancellation", (lambda x: f_alt_square(x, blocks)) if user is None else user, xs, knobs, True,
+                   None)])]
+    raise ValueError("unknown test {!r}".format(t))
+
+REFERENCE_SCRIPTS = {
+    "1a": "ssom_test1a_derivative_sqrt0.py",
+    "1b": "ssom_test1b_derivative_x2sin1x_at0.py",
+    "a3": "ssom_test_a3_limit_path_posture.py",
+    "a4": "ssom_test_a4_integral_equal_area.py",
+    "a5": "ssom_test_a5_integral_cancellation.py",
+    "a6": "ssom_test_a6_derivative_refinement_fatigue_cos.py",
+    "a7": "ssom_test_a7_derivative_stiffness_exp.py",
+    "a9": "ssom_test_a9_derivative_geometry_invariance.py",
+}
+
+TESTS = {
+    "1a": run_1a,
+    "1b": run_1b,
+    "a3": run_a3,
+    "a4": run_a4,
+    "a5": run_a5,
+    "a6": run_a6,
+    "a7": run_a7,
+    "a9": run_a9,
+}
+
+def accum_flags(p):
+    p.add_argument("--accum", choices=ACCUM_MODES, default=ACCUM_NAIVE,
+                   help="summation for m_accum and s (naive = reference traces)")
+    p.add_argument("--chunk", type=int, default=1024, help="chunk length for --accum pairwise")
+
+def strain_flags(p):
+    p.add_argument("--strain", choices=STRAIN_MODES, default=STRAIN_CUMULATIVE,
+                   help="cumulative = reference traces; window / decay let strain recover")
+    p.add_argument("--strain_window", type=int, default=50, help="steps summed by --strain window")
+    p.add_argument("--strain_decay", type=float, default=0.95, help="per-step factor for --strain decay")
+
+def build_parser(extra_flags=None):
+    # extra_flags(p), if given, adds a tool's own flags to every test subparser
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="test", required=True)
+
+    def ladder(name, steps, h_min, **extra):
+        p = sub.add_parser(name)
+        p.add_argument("--out_dir", default="out_ssom_test{}".format(name if name[0] != "a" else "_" + name))
+        p.add_argument("--h_max", type=float, default=1e-1)
+        p.add_argument("--h_min", type=float, default=h_min)
+        p.add_argument("--steps", type=int, default=steps)
+        p.add_argument("--a_min", type=float, default=0.70)
+        p.add_argument("--s_max", type=float, default=1.00)
+        p.add_argument("--r_safe", type=float, default=0.10)
+        for k, v in extra.items():
+            p.add_argument("--" + k, type=float, default=v)
+        return p
+
+    ladder("1a", 15, 1e-15)
+    ladder("1b", 200, 1e-15, beta_flip=0.50, gamma_flip=0.20)
+    ladder("a6", 200, 1e-18, beta_flip=0.50, gamma_flip=0.20)
+    ladder("a7", 240, 1e-18, eps_scale=1e-6)
+    ladder("a9", 200, 1e-18)
+
+    p = sub.add_parser("a3")
+    p.add_argument("--out_dir", default="out_ssom_test_a3_v2")
+    p.add_argument("--steps", type=int, default=200)
+    p.add_argument("--a_min", type=float, default=0.70)
+    p.add_argument("--s_max", type=float, default=1.00)
+    p.add_argument("--r_safe", type=float, default=0.10)
+    p.add_argument("--beta_flip", type=float, default=0.50)
+    p.add_argument("--gamma_flip", type=float, default=0.20)
+    p.add_argument("--m_zero_tol", type=float, default=1e-12)
+
+    p = sub.add_parser("a4")
+    p.add_argument("--out_dir", default="out_ssom_test_a4")
+    p.add_argument("--steps", type=int, default=500)
+    p.add_argument("--a_min", type=float, default=0.70)
+    p.add_argument("--s_max", type=float, default=1.00)
+    p.add_argument("--r_safe", type=float, default=0.10)
+    p.add_argument("--eps", type=float, default=1e-6)
+    accum_flags(p)
+
+    p = sub.add_parser("a5")
+    p.add_argument("--out_dir", default="out_ssom_test_a5")
+    p.add_argument("--steps", type=int, default=1000)
+    p.add_argument("--blocks", type=int, default=200)
+    p.add_argument("--a_min", type=float, default=0.70)
+    p.add_argument("--s_max", type=float, default=1.00)
+    p.add_argument("--r_safe", type=float, default=0.10)
+    p.add_argument("--beta_flip", type=float, default=0.50)
+    p.add_argument("--gamma_flip", type=float, default=0.05)
+    p.add_argument("--dm_zero_tol", type=float, default=1e-15)
+    accum_flags(p)
+    for p in sub.choices.values():
+        strain_flags(p)
+        p.add_argument("--binary", action="store_true", help="also write .ssomb binary traces")
+        p.add_argument("--func", default="",
+                       help="registered name, table:PATH or expression in x replacing the test's function")
+        p.add_argument("--param", action="append", default=[], help="name=value bound into --func (repeatable)")
+        p.add_argument("--trace_mode", choices=TRACE_MODES, default="dense",
+                       help="events: write .ssome event traces instead of dense CSV")
+        if extra_flags is not None:
+            extra_flags(p)
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.out_dir, exist_ok=True)
+    return TESTS[args.test](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+# ssom_functions.py
+# Function registry and expression compiler for SSOM tests.
+# An expression such as "0 if x == 0 else (x*x)*sin(1.0/x)" is parsed once, checked
+# against a whitelist, and compiled into a scalar (math) and, when NumPy is
+# installed, a vectorized (numpy) callable. Compiled forms are cached.
+import ast
+import cmath
+import functools
+import math
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# name -> (scalar source, vector source, arity)
+FUNCS = {
+    "sin": ("_m.sin", "_np.sin", 1),
+    "cos": ("_m.cos", "_np.cos", 1),
+    "tan": ("_m.tan", "_np.tan", 1),
+    "asin": ("_m.asin", "_np.arcsin", 1),
+    "acos": ("_m.acos", "_np.arccos", 1),
+    "atan": ("_m.atan", "_np.arctan", 1),
+    "sinh": ("_m.sinh", "_np.sinh", 1),
+    "cosh": ("_m.cosh", "_np.cosh", 1),
+    "tanh": ("_m.tanh", "_np.tanh", 1),
+    "exp": ("_m.exp", "_np.exp", 1),
+    "expm1": ("_m.expm1", "_np.expm1", 1),
+    "log": ("_m.log", "_np.log", 1),
+    "log1p": ("_m.log1p", "_np.log1p", 1),
+    "log10": ("_m.log10", "_np.log10", 1),
+    "sqrt": ("_m.sqrt", "_np.sqrt", 1),
+    "abs": ("abs", "_np.abs", 1),
+    "floor": ("_m.floor", "_np.floor", 1),
+    "min": ("_min", "_np.minimum", 2),
+    "max": ("_max", "_np.maximum", 2),
+}
+
+# functions without a derivative everywhere: rejected by the analytic target
+NON_ANALYTIC = ("abs", "floor", "min", "max")
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "nan": float("nan"), "inf": float("inf")}
+
+BINOPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**", ast.Mod: "%"}
+UNARYOPS = {ast.USub: "-", ast.UAdd: "+"}
+CMPOPS = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+
+SCALAR_ERRORS = (ZeroDivisionError, ValueError, OverflowError, TypeError)
+
+class ExpressionError(ValueError):
+    pass
+
+class SSOMFunction:
+    __slots__ = ("name", "expr", "params", "scalar", "vector")
+
+    def __init__(self, name, expr, params, scalar, vector):
+        self.name = name
+        self.expr = expr
+        self.params = params
+        self.scalar = scalar    # float -> float, nan on domain errors
+        self.vector = vector    # ndarray -> ndarray, or None without NumPy
+
+    def __call__(self, x):
+        return self.scalar(x)
+
+    def evaluate(self, xs, use_numpy=True):
+        # values at every point of xs: ndarray with NumPy, array('d') otherwise
+        if self.vector is not None and use_numpy:
+            return self.vector(np.asarray(xs, dtype=float))
+        from array import array
+        return array("d", map(self.scalar, xs))
+
+class _Emitter(ast.NodeVisitor):
+    # emits Python source for one target ("scalar", "vector" or "analytic"); the analytic
+    # target calls _m.<name> for every function and rejects branches and non-smooth operations
+    def __init__(self, target, names, variables=("x",)):
+        self.vector = target == "vector"
+        self.analytic = target == "analytic"
+        self.names = names
+        self.variables = variables
+
+    def generic_visit(self, node):
+        raise ExpressionError("unsupported syntax: {}".format(type(node).__name__))
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError("only numeric constants are allowed")
+        return repr(float(node.value))
+
+    def visit_Name(self, node):
+        if node.id in self.variables or node.id in self.names:
+            return node.id
+        if node.id in CONSTANTS:
+            return repr(CONSTANTS[node.id]) if math.isfinite(CONSTANTS[node.id]) else "_const_" + node.id
+        raise ExpressionError("unknown name {!r}".format(node.id))
+
+    def visit_BinOp(self, node):
+        op = BINOPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError("unsupported operator {}".format(type(node.op).__name__))
+        if self.analytic and op == "%":
+            raise ExpressionError("'%' is not analytic")
+        return "({} {} {})".format(self.visit(node.left), op, self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        op = UNARYOPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError("unsupported operator {}".format(type(node.op).__name__))
+        return "({}{})".format(op, self.visit(node.operand))
+
+    def visit_Compare(self, node):
+        if self.analytic:
+            raise ExpressionError("comparisons are not analytic")
+        if len(node.ops) != 1:
+            raise ExpressionError("chained comparisons are not supported")
+        op = CMPOPS.get(type(node.ops[0]))
+        if op is None:
+            raise ExpressionError("unsupported comparison {}".format(type(node.ops[0]).__name__))
+        return "({} {} {})".format(self.visit(node.left), op, self.visit(node.comparators[0]))
+
+    def visit_BoolOp(self, node):
+        if self.analytic:
+            raise ExpressionError("boolean operators are not analytic")
+        parts = [self.visit(v) for v in node.values]
+        if self.vector:
+            fn = "_np.logical_and" if isinstance(node.op, ast.And) else "_np.logical_or"
+            out = parts[0]
+            for p in parts[1:]:
+                out = "{}({}, {})".format(fn, out, p)
+            return out
+        joiner = " and " if isinstance(node.op, ast.And) else " or "
+        return "(" + joiner.join(parts) + ")"
+
+    def visit_IfExp(self, node):
+        if self.analytic:
+            raise ExpressionError("conditional expressions are not analytic")
+        test = self.visit(node.test)
+        body = self.visit(node.body)
+        orelse = self.visit(node.orelse)
+        if self.vector:
+            return "_np.where({}, {}, {})".format(test, body, orelse)
+        return "({} if {} else {})".format(body, test, orelse)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCS or node.keywords:
+            raise ExpressionError("unsupported call")
+        scalar_src, vector_src, arity = FUNCS[node.func.id]
+        if len(node.args) != arity:
+            raise ExpressionError("{}() takes {} argument(s)".format(node.func.id, arity))
+        args = ", ".join(self.visit(a) for a in node.args)
+        if self.analytic:
+            if node.func.id in NON_ANALYTIC:
+                raise ExpressionError("{}() is not analytic".format(node.func.id))
+            return "_m.{}({})".format(node.func.id, args)
+        return "{}({})".format(vector_src if self.vector else scalar_src, args)
+
+def _min(a, b):
+    # NaN in either argument gives NaN, like numpy.minimum (builtin min depends on the order)
+    return a if a != a or a <= b else b
+
+def _max(a, b):
+    return a if a != a or a >= b else b
+
+def _namespace(params):
+    ns = {"_m": math, "_np": np, "_min": _min, "_max": _max, "__builtins__": {"abs": abs}}
+    ns.update({"_const_nan": float("nan"), "_const_inf": float("inf")})
+    ns.update(params)
+    return ns
+
+@functools.lru_cache(maxsize=4096)
+def _compile(expr, params_items, name, variables=("x",)):
+    # variables other than ("x",) give multivariate callables: scalar(x, y, ...), vector(x, y, ...)
+    params = dict(params_items)
+    clash = set(variables) & (set(params) | set(CONSTANTS) | set(FUNCS))
+    if clash:
+        raise ExpressionError("variable name(s) {} clash with parameters or builtins".format(", ".join(sorted(clash))))
+    signature = "lambda {}: ".format(", ".join(variables))
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ExpressionError("cannot parse {!r}: {}".format(expr, exc.msg))
+    names = set(params)
+    scalar_src = _Emitter("scalar", names, variables).visit(tree)
+    raw_scalar = eval(compile(signature + scalar_src, "<ssom:{}>".format(name), "eval"), _namespace(params))
+
+    def scalar(*x):
+        try:
+            return float(raw_scalar(*x))
+        except SCALAR_ERRORS:
+            return float("nan")
+
+    vector = None
+    if np is not None:
+        vector_src = _Emitter("vector", names, variables).visit(tree)
+        raw_vector = eval(compile(signature + vector_src, "<ssom:{}:vec>".format(name), "eval"), _namespace(params))
+
+        def vector(*x):
+            with np.errstate(all="ignore"):
+                out = np.asarray(raw_vector(*x), dtype=float)
+            if out.shape != x[0].shape:
+                out = np.broadcast_to(out, x[0].shape).copy()
+            return out
+
+    return SSOMFunction(name, expr, params, scalar, vector)
+
+def compile_expr(expr: str, params=None, name=None, variables=("x",)) -> SSOMFunction:
+    params = params or {}
+    items = tuple(sorted((k, float(v)) for k, v in params.items()))
+    return _compile(expr, items, name or expr, tuple(variables))
+
+def compile_analytic(expr: str, params=None, module=None, variables=("x",)):
+    # the expression over another number type (complex, Taylor jets, ...): `module` provides
+    # sin, cos, exp, ... for it. Raises ExpressionError for branches and abs/floor/min/max.
+    params = {k: float(v) for k, v in (params or {}).items()}
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ExpressionError("cannot parse {!r}: {}".format(expr, exc.msg))
+    src = _Emitter("analytic", set(params), tuple(variables)).visit(tree)
+    ns = _namespace(params)
+    ns["_m"] = module
+    return eval(compile("lambda {}: ".format(", ".join(variables)) + src, "<ssom:analytic>", "eval"), ns)
+
+# ---------------------------------------------------------------------------
+# number types for compile_analytic: Taylor jets (forward-mode dual numbers to order K) and
+# complex values
+
+class Jet:
+    # truncated Taylor series in the step: c[k] = f^(k)(x0) / k!, k = 0..order
+    __slots__ = ("c",)
+
+    def __init__(self, c):
+        self.c = c
+
+    @staticmethod
+    def variable(x0, order):
+        return Jet([float(x0), 1.0] + [0.0] * (order - 1))
+
+    def _lift(self, other):
+        if isinstance(other, Jet):
+            return other.c
+        return [float(other)] + [0.0] * (len(self.c) - 1)
+
+    def __add__(self, other):
+        return Jet([a + b for a, b in zip(self.c, self._lift(other))])
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Jet([a - b for a, b in zip(self.c, self._lift(other))])
+
+    def __rsub__(self, other):
+        return Jet([b - a for a, b in zip(self.c, self._lift(other))])
+
+    def __neg__(self):
+        return Jet([-a for a in self.c])
+
+    def __pos__(self):
+        return self
+
+    def __mul__(self, other):
+        if not isinstance(other, Jet):
+            other = float(other)
+            return Jet([a * other for a in self.c])
+        return Jet(_mul(self.c, other.c))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if not isinstance(other, Jet):
+            other = float(other)
+            return Jet([a / other for a in self.c])
+        return Jet(_div(self.c, other.c))
+
+    def __rtruediv__(self, other):
+        return Jet(_div(self._lift(other), self.c))
+
+    def __pow__(self, y):
+        if isinstance(y, Jet):
+            return JetMath.exp(y * JetMath.log(self))
+        y = float(y)
+        if y.is_integer() and abs(y) <= 64:
+            out = [1.0] + [0.0] * (len(self.c) - 1)
+            base = self.c
+            n = int(abs(y))
+            while n:
+                if n & 1:
+                    out = _mul(out, base)
+                n >>= 1
+                if n:
+                    base = _mul(base, base)
+            return Jet(out) if y >= 0 else Jet(_div([1.0] + [0.0] * (len(out) - 1), out))
+        return Jet(_pow(self.c, y))
+
+    def __rpow__(self, base):
+        return JetMath.exp(self * math.log(float(base)))
+
+def _mul(a, b):
+    n = len(a)
+    return [math.fsum(a[j] * b[k - j] for j in range(k + 1)) for k in range(n)]
+
+def _div(a, b):
+    if b[0] == 0.0:
+        raise ZeroDivisionError("jet division by a series with zero constant term")
+    q = []
+    for k in range(len(a)):
+        q.append((a[k] - math.fsum(b[j] * q[k - j] for j in range(1, k + 1))) / b[0])
+    return q
+
+def _exp(a, first=None):
+    e = [math.exp(a[0])]
+    for k in range(1, len(a)):
+        e.append(math.fsum(j * a[j] * e[k - j] for j in range(1, k + 1)) / k)
+    if first is not None:
+        e[0] = first
+    return e
+
+def _log(a, base0=None):
+    a0 = a[0] if base0 is None else base0
+    if a0 <= 0.0:
+        raise ValueError("log of a series with constant term <= 0")
+    out = [math.log(a0)]
+    for k in range(1, len(a)):
+        out.append((a[k] - math.fsum(j * out[j] * a[k - j] for j in range(1, k)) / k) / a0)
+    return out
+
+def _sincos(a, hyperbolic):
+    if hyperbolic:
+        s = [math.sinh(a[0])]
+        c = [math.cosh(a[0])]
+    else:
+        s = [math.sin(a[0])]
+        c = [math.cos(a[0])]
+    sign = 1.0 if hyperbolic else -1.0
+    for k in range(1, len(a)):
+        s.append(math.fsum(j * a[j] * c[k - j] for j in range(1, k + 1)) / k)
+        c.append(sign * math.fsum(j * a[j] * s[k - j] for j in range(1, k + 1)) / k)
+    return s, c
+
+def _sqrt(a):
+    if a[0] <= 0.0:
+        raise ValueError("sqrt of a series with constant term <= 0")
+    r = [math.sqrt(a[0])]
+    for k in range(1, len(a)):
+        r.append((a[k] - math.fsum(r[j] * r[k - j] for j in range(1, k))) / (2.0 * r[0]))
+    return r
+
+def _pow(a, y):
+    if a[0] <= 0.0:
+        raise ValueError("non-integer power of a series with constant term <= 0")
+    p = [a[0] ** y]
+    for k in range(1, len(a)):
+        p.append(math.fsum((y * j - (k - j)) * a[j] * p[k - j] for j in range(1, k + 1)) / (k * a[0]))
+    return p
+
+def _integrate(first, da, g):
+    # the series whose derivative is da * g, with constant term `first`
+    d = _mul(da, g)
+    return [first] + [d[k - 1] / k for k in range(1, len(da))]
+
+def _one_plus_sq(a, sign):
+    sq = _mul(a, a)
+    return [1.0 + sign * sq[0]] + [sign * v for v in sq[1:]]
+
+def _deriv(a):
+    return [(k + 1) * a[k + 1] for k in range(len(a) - 1)] + [0.0]
+
+class JetMath:
+    # the math functions over Jet (and float) arguments, for compile_analytic
+    @staticmethod
+    def _unary(x, scalar, series):
+        if isinstance(x, Jet):
+            return Jet(series(x.c))
+        return scalar(x)
+
+    @staticmethod
+    def exp(x):
+        return JetMath._unary(x, math.exp, _exp)
+
+    @staticmethod
+    def expm1(x):
+        return JetMath._unary(x, math.expm1, lambda a: _exp(a, math.expm1(a[0])))
+
+    @staticmethod
+    def log(x):
+        return JetMath._unary(x, math.log, _log)
+
+    @staticmethod
+    def log1p(x):
+        def series(a):
+            out = _log([1.0 + a[0]] + a[1:], 1.0 + a[0])
+            out[0] = math.log1p(a[0])
+            return out
+        return JetMath._unary(x, math.log1p, series)
+
+    @staticmethod
+    def log10(x):
+        def series(a):
+            out = [v / math.log(10.0) for v in _log(a)]
+            out[0] = math.log10(a[0])
+            return out
+        return JetMath._unary(x, math.log10, series)
+
+    @staticmethod
+    def sqrt(x):
+        return JetMath._unary(x, math.sqrt, _sqrt)
+
+    @staticmethod
+    def sin(x):
+        return JetMath._unary(x, math.sin, lambda a: _sincos(a, False)[0])
+
+    @staticmethod
+    def cos(x):
+        return JetMath._unary(x, math.cos, lambda a: _sincos(a, False)[1])
+
+    @staticmethod
+    def tan(x):
+        return JetMath._unary(x, math.tan, lambda a: _div(*_sincos(a, False)))
+
+    @staticmethod
+    def sinh(x):
+        return JetMath._unary(x, math.sinh, lambda a: _sincos(a, True)[0])
+
+    @staticmethod
+    def cosh(x):
+        return JetMath._unary(x, math.cosh, lambda a: _sincos(a, True)[1])
+
+    @staticmethod
+    def tanh(x):
+        return JetMath._unary(x, math.tanh, lambda a: _div(*_sincos(a, True)))
+
+    @staticmethod
+    def asin(x):
+        return JetMath._unary(x, math.asin, lambda a: _integrate(
+            math.asin(a[0]), _deriv(a), _pow(_one_plus_sq(a, -1.0), -0.5)))
+
+    @staticmethod
+    def acos(x):
+        return JetMath._unary(x, math.acos, lambda a: _integrate(
+            math.acos(a[0]), [-v for v in _deriv(a)], _pow(_one_plus_sq(a, -1.0), -0.5)))
+
+    @staticmethod
+    def atan(x):
+        return JetMath._unary(x, math.atan, lambda a: _integrate(
+            math.atan(a[0]), _deriv(a), _div([1.0] + [0.0] * (len(a) - 1), _one_plus_sq(a, 1.0))))
+
+class ComplexMath:
+    # cmath, plus expm1 / log1p that keep their accuracy near 0 for the complex step
+    sin = staticmethod(cmath.sin)
+    cos = staticmethod(cmath.cos)
+    tan = staticmethod(cmath.tan)
+    asin = staticmethod(cmath.asin)
+    acos = staticmethod(cmath.acos)
+    atan = staticmethod(cmath.atan)
+    sinh = staticmethod(cmath.sinh)
+    cosh = staticmethod(cmath.cosh)
+    tanh = staticmethod(cmath.tanh)
+    exp = staticmethod(cmath.exp)
+    log = staticmethod(cmath.log)
+    log10 = staticmethod(cmath.log10)
+    sqrt = staticmethod(cmath.sqrt)
+
+    @staticmethod
+    def expm1(z):
+        return 2.0 * cmath.exp(z / 2.0) * cmath.sinh(z / 2.0)
+
+    @staticmethod
+    def log1p(z):
+        u = 1.0 + z
+        if u == 1.0:
+            return complex(z)
+        return cmath.log(u) * z / (u - 1.0)
+
+# ---------------------------------------------------------------------------
+# registry
+
+REGISTRY = {}
+TABLE_PREFIX = "table:"
+
+def register(name: str, expr: str, defaults=None, doc: str = ""):
+    REGISTRY[name] = (expr, dict(defaults or {}), doc)
+
+def resolve(spec: str, params=None) -> SSOMFunction:
+    # a registered name, "table:PATH[#XCOL,YCOL]" (interpolated samples), or an expression in x
+    # for a registered name or a table, a --param it does not take is an error, not a silent default
+    if spec.startswith(TABLE_PREFIX):
+        if params:
+            raise ExpressionError("{} takes no --param (got {})".format(spec, ", ".join(sorted(params))))
+        import ssom_tabulated
+        return ssom_tabulated.table_function(spec[len(TABLE_PREFIX):])
+    if spec in REGISTRY:
+        expr, defaults, _ = REGISTRY[spec]
+        unknown = sorted(set(params or {}) - set(defaults))
+        if unknown:
+            raise ExpressionError("unknown parameter(s) {} for {} (takes: {})".format(
+                ", ".join(unknown), spec, ", ".join(sorted(defaults)) or "none"))
+        merged = dict(defaults)
+        merged.update(params or {})
+        return compile_expr(expr, merged, spec)
+    return compile_expr(spec, params)
+
+def input_digest(spec: str) -> str:
+    # digest of the data a --func spec reads besides the scripts: the table file's contents for
+    # "table:..." specs, "" for names and expressions
+    if spec and spec.startswith(TABLE_PREFIX):
+        import ssom_tabulated
+        return ssom_tabulated.table_digest(spec[len(TABLE_PREFIX):])
+    return ""
+
+def parse_params(items) -> dict:
+    out = {}
+    for item in items or []:
+        key, _, val = item.partition("=")
+        if not val or not key.isidentifier():
+            raise ExpressionError("--param expects name=value, got {!r}".format(item))
+        out[key] = float(val)
+    return out
+
+# the functions hardcoded in the reference scripts, written so the scalar form
+# performs the same float operations in the same order
+register("sqrt", "nan if x < 0 else sqrt(x)", doc="test 1a: f(x) = sqrt(x)")
+register("x2sin1x", "0.0 if x == 0 else (x * x) * sin(1.0 / x)", doc="test 1b: f(x) = x^2 sin(1/x)")
+register("xsin1x", "0.0 if x == 0 else x * sin(1.0 / x)", doc="test a3: f(x) = x sin(1/x)")
+register("1mcos", "1.0 - cos(x)", doc="tests a6/a9: f(x) = 1 - cos(x)")
+register("f_eps", "0.0 if x <= 0 else eps_scale * (1.0 - exp(-x / eps_scale))", {"eps_scale": 1e-6},
+         doc="test a7: f(x) = eps (1 - exp(-x/eps))")
+register("spiky", "1.0 / sqrt(x + eps)", {"eps": 1e-6}, doc="test a4: f(x) = 1/sqrt(x + eps), unnormalized")
+register("alt_square", "1.0 if min(floor(x * blocks), blocks - 1) % 2 == 0 else -1.0", {"blocks": 200.0},
+         doc="test a5: +1/-1 blocks of width 1/blocks")
@@ -0,0 +1,301 @@
+# ssom_grid_integral.py
+# Integration posture over 2-D and 3-D tensor grids. Cells are visited in a configurable
+# traversal order (row-major, Morton or Hilbert); each block of consecutive cells is decoded,
+# evaluated in one vectorized call and fed to ssom_fast_engine.run_posture as the A.4 integral
+# (dm = f(cell) * volume, m_accum = running integral). A PostureState carries strain across
+# blocks, so memory is bounded by --block, not by the grid size.
+import argparse
+import csv
+import math
+import os
+import time
+from array import array
+
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+
+ORDERS = ("rowmajor", "morton", "hilbert")
+RULES = ("midpoint", "left")
+VARIABLES = ("x", "y", "z")
+
+# name -> ({dims: expression}, {dims: exact integral over the unit cube} or {})
+INTEGRANDS = {
+    "smooth": ({2: "1.0", 3: "1.0"}, {2: 1.0, 3: 1.0}),
+    "corner": ({2: "1/sqrt(x*y)", 3: "1/sqrt(x*y*z)"}, {2: 4.0, 3: 8.0}),
+    "radial": ({2: "1/sqrt(x*x + y*y)", 3: "1/(x*x + y*y + z*z)"}, {}),
+    "ridge": ({2: "1/sqrt(abs(x - y))", 3: "1/sqrt(abs(x - y) + abs(y - z))"}, {2: 8.0 / 3.0}),
+}
+
+def curve_bits(n: int) -> int:
+    return max(1, (n - 1).bit_length())
+
+def _deinterleave(codes, dims, bits):
+    # transposed form: bit j of axis i is bit j*dims + (dims-1-i) of the code
+    axes = []
+    for i in range(dims):
+        v = codes * 0
+        for j in range(bits):
+            v = v | (((codes >> (j * dims + (dims - 1 - i))) & 1) << j)
+        axes.append(v)
+    return axes
+
+def _hilbert_axes(X, bits, where):
+    # Skilling's TransposetoAxes, on ints or integer ndarrays alike
+    n = len(X)
+    N = 2 << (bits - 1)
+    t = X[n - 1] >> 1
+    for i in range(n - 1, 0, -1):
+        X[i] = X[i] ^ X[i - 1]
+    X[0] = X[0] ^ t
+    Q = 2
+    while Q != N:
+        P = Q - 1
+        for i in range(n - 1, -1, -1):
+            hit = (X[i] & Q) != 0
+            if i == 0:
+                X[0] = where(hit, X[0] ^ P, X[0])
+                continue
+            t = (X[0] ^ X[i]) & P
+            X[0], X[i] = where(hit, X[0] ^ P, X[0] ^ t), where(hit, X[i], X[i] ^ t)
+        Q <<= 1
+    return X
+
+def _where_scalar(cond, a, b):
+    return a if cond else b
+
+def decode(order, codes, n, dims, use_numpy):
+    # cell indices (one sequence per axis, axis 0 slowest) of the traversal positions in codes
+    if order == "rowmajor":
+        axes = []
+        rest = codes
+        for _ in range(dims):
+            axes.append(rest % n)
+            rest = rest // n
+        return axes[::-1]
+    bits = curve_bits(n)
+    axes = _deinterleave(codes, dims, bits)
+    if order == "hilbert":
+        axes = _hilbert_axes(axes, bits, np.where if use_numpy else _where_scalar)
+    return axes
+
+def iter_blocks(order, n, dims, block, use_numpy):
+    # (axis index arrays, count) per block of traversal positions; curves over the
+    # enclosing 2^bits cube drop the codes that fall outside the n^dims grid
+    total = n ** dims if order == "rowmajor" else (1 << (curve_bits(n) * dims))
+    for start in range(0, total, block):
+        stop = min(total, start + block)
+        if use_numpy:
+            axes = decode(order, np.arange(start, stop, dtype=np.int64), n, dims, True)
+            if order != "rowmajor":
+                keep = np.ones(stop - start, dtype=bool)
+                for a in axes:
+                    keep &= a < n
+                axes = [a[keep] for a in axes]
+            yield axes, len(axes[0])
+            continue
+        axes = [array("q") for _ in range(dims)]
+        for code in range(start, stop):
+            cell = decode(order, code, n, dims, False)
+            if order == "rowmajor" or max(cell) < n:
+                for a, v in zip(axes, cell):
+                    a.append(v)
+        yield axes, len(axes[0])
+
+def cell_points(axes, n, lo, hi, rule, use_numpy):
+    shift = 0.5 if rule == "midpoint" else 0.0
+    span = hi - lo
+    if use_numpy:
+        return [lo + span * ((a + shift) / n) for a in axes]
+    return [array("d", (lo + span * ((i + shift) / n) for i in a)) for a in axes]
+
+def run_order(fn, args, order, dims, use_numpy, writer=None):
+    n = args.n
+    isfinite = math.isfinite
+    volume = ((args.hi - args.lo) / n) ** dims
+    # singular cells (non-finite f) ABSTAIN and stay out of m_accum
+    knobs = dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_EPS,
+                 abstain=engine.ABSTAIN_NONFINITE, deny_nonfinite=True, accum=args.accum, chunk=args.chunk,
+                 halt=not args.monitor, **engine.strain_kw(args))
+    state = engine.PostureState()
+    cols = engine.TraceColumns()
+    out = {"order": order, "rows": 0, "first_deny": None, "deny_cell": None, "first_abstain": None,
+           "abstain_cell": None, "deny_rows": 0, "abstain_rows": 0, "max_s": 0.0, "last_status": "NO_TRACE"}
+    pos = 0
+    for axes, count in iter_blocks(order, n, dims, args.block, use_numpy):
+        if count == 0:
+            continue
+        pts = cell_points(axes, n, args.lo, args.hi, args.rule, use_numpy)
+        if use_numpy and fn.vector is not None:
+            dm = (fn.vector(*pts) * volume).tolist()
+        else:
+            dm = [fn.scalar(*p) * volume for p in zip(*pts)]
+        if not state.have_prev:
+            # run_posture ALLOWs its first row unconditionally; a singular cell cannot be the
+            # baseline, so leading non-finite cells ABSTAIN here
+            lead = 0
+            while lead < count and not isfinite(dm[lead]):
+                lead += 1
+            if lead:
+                kept = lead if args.monitor else 1
+                out["abstain_rows"] += kept
+                out["rows"] += kept
+                out["last_status"] = "ABSTAIN"
+                if out["first_abstain"] is None:
+                    out["first_abstain"] = pos
+                    out["abstain_cell"] = tuple(int(a[0]) for a in axes)
+                if writer is not None:
+                    for j in range(kept):
+                        writer.writerow([order, pos + j] + [int(a[j]) for a in axes] +
+                                        ["{:.16e}".format(float(p[j])) for p in pts] +
+                                        ["{:.16e}".format(dm[j]), "{:.16e}".format(state.m_acc),
+                                         "nan", "{:.8f}".format(state.s), "nan", 0, "ABSTAIN"])
+                if not args.monitor:
+                    break
+                pos += lead
+                count -= lead
+                axes = [a[lead:] for a in axes]
+                pts = [p[lead:] for p in pts]
+                dm = dm[lead:]
+                if count == 0:
+                    continue
+        vals = iter(dm)
+        # traversal positions as x: consecutive integers, so dx = 1.0 and m = dm exactly
+        cols.truncate(0)
+        _, deny = engine.run_posture(lambda _x: next(vals), range(pos, pos + count + 1), args.a_min, args.s_max,
+                                     args.r_safe, integral=True, cols=cols, state=state, **knobs)
+        rows = len(cols)
+        if rows:
+            out["max_s"] = max(out["max_s"], max(s for s in cols.s if s == s) if rows > 1 else 0.0)
+            out["last_status"] = cols.last_status()
+            out["deny_rows"] += cols.status.count(engine.DENY)
+            out["abstain_rows"] += cols.status.count(engine.ABSTAIN)
+            if out["first_abstain"] is None and engine.ABSTAIN in cols.status:
+                j = cols.status.index(engine.ABSTAIN)
+                out["first_abstain"] = pos + j
+                out["abstain_cell"] = tuple(int(a[j]) for a in axes)
+        if deny is not None and out["first_deny"] is None:
+            j = int(deny) - pos
+            out["first_deny"] = int(deny)
+            out["deny_cell"] = tuple(int(a[j]) for a in axes)
+            out["deny_point"] = tuple(float(p[j]) for p in pts)
+        if writer is not None:
+            # the trace is streamed block by block
+            for j in range(rows):
+                writer.writerow([order, pos + j] + [int(a[j]) for a in axes] +
+                                ["{:.16e}".format(float(p[j])) for p in pts] +
+                                ["{:.16e}".format(cols.m[j]), "{:.16e}".format(cols.m_accum[j]),
+                                 "{:.8f}".format(cols.a[j]), "{:.8f}".format(cols.s[j]),
+                                 "{:.8f}".format(cols.lr[j]), cols.flip[j], engine.STATUS_NAMES[cols.status[j]]])
+        out["rows"] += rows
+        pos += count
+        if rows < count or (cols.status[rows - 1] != engine.ALLOW and not args.monitor):
+            break
+    out["integral"] = state.m_acc
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--func", default="corner",
+                    help="registered integrand ({}) or an expression in x, y[, z]".format(", ".join(sorted(INTEGRANDS))))
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into the expression (repeatable)")
+    ap.add_argument("--dims", type=int, choices=(2, 3), default=2)
+    ap.add_argument("--n", type=int, default=512, help="cells per axis")
+    ap.add_argument("--lo", type=float, default=0.0)
+    ap.add_argument("--hi", type=float, default=1.0)
+    ap.add_argument("--rule", choices=RULES, default="midpoint", help="left = lower cell corner, as in A.4")
+    ap.add_argument("--order", default="rowmajor,morton,hilbert", help="comma-separated: " + ",".join(ORDERS))
+    ap.add_argument("--block", type=int, default=65536, help="traversal positions decoded and evaluated at once")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.0)
+    ap.add_argument("--gamma_flip", type=float, default=0.0)
+    engine.accum_flags(ap)
+    engine.strain_flags(ap)
+    ap.add_argument("--monitor", action="store_true", help="keep going after a DENY (full integral, all DENY rows)")
+    ap.add_argument("--scalar", action="store_true", help="decode and evaluate with plain Python instead of NumPy")
+    ap.add_argument("--trace", action="store_true", help="also write the per-cell trace (one row per visited cell)")
+    ap.add_argument("--out_dir", default="out_ssom_grid_integral")
+    args = ap.parse_args()
+
+    if args.n < 2 or args.block < 1:
+        raise ValueError("Require --n >= 2 and --block >= 1")
+    if not args.hi > args.lo:
+        raise ValueError("Require --lo < --hi")
+    orders = [o for o in args.order.split(",") if o]
+    for o in orders:
+        if o not in ORDERS:
+            raise ValueError("unknown order {!r} (choose from {})".format(o, ", ".join(ORDERS)))
+
+    dims = args.dims
+    variables = VARIABLES[:dims]
+    exact = None
+    if args.func in INTEGRANDS:
+        exprs, exacts = INTEGRANDS[args.func]
+        expr = exprs[dims]
+        if args.lo == 0.0 and args.hi == 1.0:
+            exact = exacts.get(dims)
+    else:
+        expr = args.func
+    fn = functions.compile_expr(expr, functions.parse_params(args.param), args.func, variables)
+    use_numpy = np is not None and not args.scalar
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    results = []
+    trace_file = None
+    writer = None
+    if args.trace:
+        trace_file = open(os.path.join(args.out_dir, "grid_trace_ssom.csv"), "w", newline="", encoding="utf-8")
+        writer = csv.writer(trace_file)
+        writer.writerow(["order", "pos"] + ["i_" + v for v in variables] + list(variables) +
+                        ["dm", "m_accum", "a", "s", "lr", "flip", "status"])
+    try:
+        for order in orders:
+            t0 = time.perf_counter()
+            res = run_order(fn, args, order, dims, use_numpy, writer)
+            res["seconds"] = time.perf_counter() - t0
+            results.append(res)
+    finally:
+        if trace_file is not None:
+            trace_file.close()
+
+    out_csv = os.path.join(args.out_dir, "grid_posture_ssom.csv")
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["order", "dims", "n", "rule", "cells_visited", "last_status", "first_deny_pos",
+                    "deny_cell", "deny_point", "first_abstain_pos", "deny_rows", "abstain_rows", "max_s", "integral", "exact", "seconds"])
+        for r in results:
+            w.writerow([
+                r["order"], dims, args.n, args.rule, r["rows"], r["last_status"],
+                "" if r["first_deny"] is None else r["first_deny"],
+                "" if r["deny_cell"] is None else " ".join(map(str, r["deny_cell"])),
+                "" if r["deny_cell"] is None else " ".join("{:.6e}".format(v) for v in r["deny_point"]),
+                "" if r["first_abstain"] is None else r["first_abstain"],
+                r["deny_rows"],
+                r["abstain_rows"],
+                "{:.8f}".format(r["max_s"]),
+                "{:.16e}".format(r["integral"]),
+                "" if exact is None else "{:.16e}".format(exact),
+                "{:.3f}".format(r["seconds"]),
+            ])
+
+    print("SSOM grid integral posture complete: f = {} on [{}, {}]^{} with {}^{} cells ({})".format(
+        expr, args.lo, args.hi, dims, args.n, dims, args.rule))
+    print("Backend:", "numpy" if use_numpy else "stdlib")
+    print("Output:", out_csv)
+    for r in results:
+        if r["first_deny"] is not None:
+            where = "first DENY at position {} (cell {})".format(r["first_deny"], r["deny_cell"])
+        elif r["last_status"] == "ABSTAIN" and not args.monitor:
+            # the traversal halted on a singular cell before reaching the end
+            where = "first ABSTAIN at position {} (cell {})".format(r["first_abstain"], r["abstain_cell"])
+        else:
+            where = "no DENY"
+        print("  {:<8} {}; m_accum ~= {:.10e} after {} cells, max s {:.4f}".format(
+            r["order"], where, r["integral"], r["rows"], r["max_s"]))
+    if exact is not None:
+        print("Exact integral:", exact)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# ssom_manifest.py
+# Reproducibility manifest: one entry per run with the script version hash, the Python / libm
+# environment, the parameter tuple and a sha256 per trace file. `verify` re-runs only the entries
+# whose inputs (scripts or environment) changed, in memory, and compares digests instead of text.
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import ssom_fast_engine as engine
+from ssom_run_cache import version_hash
+
+DEFAULT_MANIFEST = "ssom_manifest.json"
+MANIFEST_FORMAT = 1
+
+def environment() -> dict:
+    # everything besides the scripts that can change a formatted float
+    libc, libc_version = platform.libc_ver()
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "compiler": platform.python_compiler(),
+        "libm": "{} {}".format(libc, libc_version).strip() or "unknown",
+        "machine": platform.machine(),
+        "byteorder": sys.byteorder,
+        "float_repr_style": sys.float_repr_style,
+        "clamp_lane": engine.clamp_lane.__module__,
+    }
+
+def entry_key(test: str, params: dict, out_dir: str) -> str:
+    # the output folder is part of the key: the same run recorded into two folders is two
+    # entries, and `verify --files` checks the traces in each of them
+    blob = json.dumps({"test": test, "params": params, "out_dir": out_dir}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def fingerprint(version: str, env: dict) -> str:
+    blob = json.dumps({"version": version, "env": env}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def file_digest(path: str):
+    h = hashlib.sha256()
+    size = 0
+    rows = -1
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+            size += len(chunk)
+            rows += chunk.count(b"\n")
+    return {"sha256": h.hexdigest(), "bytes": size, "rows": rows}
+
+def captured_digests(argv) -> dict:
+    # trace name -> digest of the CSV the run would write, computed without touching the disk
+    args = engine.build_parser().parse_args(list(argv))
+    args.trace_mode = "capture"
+    args.captured = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.TESTS[args.test](args)
+    out = {}
+    for stem, (layout, parts) in sorted(args.captured.items()):
+        sha, size, rows = engine.layout_digest(layout, *parts)
+        out[stem + ".csv"] = {"sha256": sha, "bytes": size, "rows": rows}
+    return out
+
+def load(path: str) -> dict:
+    if not os.path.isfile(path):
+        return {"format": MANIFEST_FORMAT, "runs": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError("{}: unsupported manifest format {!r}".format(path, manifest.get("format")))
+    return manifest
+
+def save(path: str, manifest: dict):
+    # write-then-rename, so an interrupted save never leaves a torn manifest
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_manifest_", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def record(manifest: dict, argv, env: dict, versions: dict) -> dict:
+    # runs the test (writing its traces as usual) and stores the entry for it
+    args = engine.build_parser().parse_args(list(argv))
+    args.trace_mode = "dense"
+    args.binary = False
+    os.makedirs(args.out_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summaries = engine.TESTS[args.test](args)
+    if (args.test, args.func) not in versions:
+        versions[args.test, args.func] = version_hash(args.test, args.func)
+    params = engine.replay_params(args)
+    outputs = {}
+    for name in sorted({sm["trace"] for sm in summaries}):
+        outputs[name] = file_digest(os.path.join(args.out_dir, name))
+    out_dir = os.path.abspath(args.out_dir)
+    entry = {
+        "key": entry_key(args.test, params, out_dir),
+        "test": args.test,
+        "argv": list(argv),
+        "params": params,
+        "out_dir": out_dir,
+        "version": versions[args.test, args.func],
+        "env": env,
+        "fingerprint": fingerprint(versions[args.test, args.func], env),
+        "recorded": time.time(),
+        "outputs": outputs,
+    }
+    manifest["runs"][entry["key"]] = entry
+    return entry
+
+def engine_argv(entry) -> list:
+    # the recorded command line, minus --out_dir (re-runs stay in memory)
+    argv = list(entry["argv"])
+    out = []
+    skip = False
+    for a in argv:
+        if skip:
+            skip = False
+            continue
+        if a == "--out_dir":
+            skip = True
+            continue
+        if a.startswith("--out_dir="):
+            continue
+        out.append(a)
+    return out
+
+def _rerun(entry):
+    # worker: (key, digests or error text)
+    argv = engine_argv(entry)
+    try:
+        return entry["key"], captured_digests(argv)
+    except Exception as exc:
+        return entry["key"], "{}: {}".format(type(exc).__name__, exc)
+
+def compare(recorded: dict, current: dict) -> list:
+    # names of traces whose digest differs, is missing or is new
+    bad = []
+    for name in sorted(set(recorded) | set(current)):
+        if recorded.get(name, {}).get("sha256") != current.get(name, {}).get("sha256"):
+            bad.append(name)
+    return bad
+
+def verify(manifest: dict, env: dict, rerun_all=False, check_files=False, workers=1, update=False):
+    # returns [(key, verdict, detail)] with verdict in PASS / FAIL / ERROR / UNCHANGED / FILES_OK / FILES_BAD
+    versions = {}
+    todo = []
+    results = []
+    for key, entry in sorted(manifest["runs"].items()):
+        test = (entry["test"], entry["params"].get("func", ""))
+        if test not in versions:
+            try:
+                versions[test] = version_hash(*test)
+            except OSError:
+                versions[test] = None  # the table file is gone: re-run, which reports the error
+        changed = fingerprint(versions[test], env) != entry["fingerprint"]
+        if changed or rerun_all:
+            todo.append(entry)
+            continue
+        if check_files:
+            bad = []
+            for name, rec in sorted(entry["outputs"].items()):
+                path = os.path.join(entry["out_dir"], name)
+                if not os.path.isfile(path) or file_digest(path)["sha256"] != rec["sha256"]:
+                    bad.append(name)
+            results.append((key, "FILES_BAD" if bad else "FILES_OK", ", ".join(bad)))
+        else:
+            results.append((key, "UNCHANGED", ""))
+
+    if workers > 1 and len(todo) > 1:
+        with Pool(workers) as pool:
+            reruns = pool.map(_rerun, todo, chunksize=max(1, len(todo) // (4 * workers)))
+    else:
+        reruns = list(map(_rerun, todo))
+
+    for entry, (key, current) in zip(todo, reruns):
+        if isinstance(current, str):
+            results.append((key, "ERROR", current))
+            continue
+        bad = compare(entry["outputs"], current)
+        results.append((key, "FAIL" if bad else "PASS", ", ".join(bad)))
+        if update and not bad:
+            entry["version"] = versions[entry["test"], entry["params"].get("func", "")]
+            entry["env"] = env
+            entry["fingerprint"] = fingerprint(entry["version"], env)
+    results.sort()
+    return results
+
+def read_batch(path: str) -> list:
+    # one engine command line per line, e.g. "a6 --beta_flip 0.3"; '#' starts a comment
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                out.append(line.split())
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("record", help="run and record: record <test> [test flags] | record --batch FILE")
+    p.add_argument("--batch", default="", help="file with one engine command line per line")
+    p.add_argument("engine_args", nargs=argparse.REMAINDER)
+
+    p = sub.add_parser("verify")
+    p.add_argument("--all", action="store_true", help="re-run every entry, not only those whose inputs changed")
+    p.add_argument("--files", action="store_true", help="hash the traces on disk of unchanged entries")
+    p.add_argument("--workers", type=int, default=1, help="processes for re-runs (0 = all cores)")
+    p.add_argument("--update", action="store_true", help="store the new fingerprint of entries that pass")
+
+    sub.add_parser("show")
+    args = ap.parse_args()
+
+    manifest = load(args.manifest)
+    env = environment()
+
+    if args.cmd == "record":
+        runs = read_batch(args.batch) if args.batch else []
+        if args.engine_args:
+            runs.append(args.engine_args)
+        if not runs:
+            raise ValueError("record needs a test name, e.g. record a6 --beta_flip 0.3, or --batch FILE")
+        versions = {}
+        for argv in runs:
+            entry = record(manifest, argv, env, versions)
+            print("Recorded {} {}: {}".format(entry["test"], entry["key"][:16],
+                                             ", ".join("{} {}".format(n, o["sha256"][:16])
+                                                       for n, o in sorted(entry["outputs"].items()))))
+        save(args.manifest, manifest)
+    elif args.cmd == "verify":
+        t0 = time.perf_counter()
+        workers = args.workers or os.cpu_count() or 1
+        results = verify(manifest, env, args.all, args.files, workers, args.update)
+        counts = {}
+        for key, verdict, detail in results:
+            counts[verdict] = counts.get(verdict, 0) + 1
+            if verdict in ("FAIL", "ERROR", "FILES_BAD"):
+                entry = manifest["runs"][key]
+                print("{} {} {} {}: {}".format(verdict, entry["test"], key[:16], " ".join(engine_argv(entry)[1:]), detail))
+        if args.update:
+            save(args.manifest, manifest)
+        print("Verified {} run(s) in {:.2f} s: {}".format(
+            len(results), time.perf_counter() - t0, ", ".join("{} {}".format(v, n) for v, n in sorted(counts.items()))))
+        if any(v in ("FAIL", "ERROR", "FILES_BAD") for _, v, _ in results):
+            sys.exit(1)
+    else:
+        print("Manifest:", args.manifest)
+        print("Environment now:", json.dumps(env, sort_keys=True))
+        for key, entry in sorted(manifest["runs"].items(), key=lambda kv: (kv[1]["test"], kv[0])):
+            print("{} {} {} ({} trace(s))".format(entry["test"], key[:16], " ".join(engine_argv(entry)[1:]),
+                                                  len(entry["outputs"])))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# ssom_mmap_input.py
+# Posture over recorded magnitude sequences (raw float64/float32 files or .npy arrays).
+# The file is memory-mapped and fed to ssom_fast_engine.run_posture window by window;
+# a PostureState carries strain and the previous magnitude across windows, so the trace and
+# the first DENY are exactly those of one run_path-style pass over the whole sequence.
+import argparse
+import ast
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import ssom_fast_engine as engine
+
+NPY_MAGIC = b"\x93NUMPY"
+TYPECODES = {"f8": "d", "f4": "f"}
+NATIVE = "<" if sys.byteorder == "little" else ">"
+
+def npy_header(f):
+    # (descr, shape, data offset) of a .npy file, without NumPy
+    if f.read(6) != NPY_MAGIC:
+        raise ValueError("not a .npy file")
+    major, _minor = f.read(2)
+    size = struct.unpack("<H" if major == 1 else "<I", f.read(2 if major == 1 else 4))[0]
+    header = ast.literal_eval(f.read(size).decode("latin1"))
+    if header.get("fortran_order"):
+        raise ValueError(".npy arrays in Fortran order are not supported")
+    return header["descr"], tuple(header["shape"]), f.tell()
+
+class MappedSequence:
+    # one float column of a memory-mapped file; window() never copies in native byte order
+    def __init__(self, path, dtype="f8", byteorder="little", offset=0, count=-1, column=0):
+        width = 1
+        if path.endswith(".npy"):
+            with open(path, "rb") as f:
+                descr, shape, offset = npy_header(f)
+            if descr[0] in "<>|=":
+                byteorder = "big" if descr[0] == ">" else ("little" if descr[0] == "<" else sys.byteorder)
+                descr = descr[1:]
+            dtype = descr
+            if len(shape) == 2:
+                width = shape[1]
+            elif len(shape) != 1:
+                raise ValueError("expected a 1-D or 2-D .npy array, got shape {}".format(shape))
+            # --count still limits the rows read; the header only caps it
+            count = shape[0] if count < 0 else min(count, shape[0])
+        if dtype not in TYPECODES:
+            raise ValueError("unsupported dtype {!r} (use f8 or f4)".format(dtype))
+        if not 0 <= column < width:
+            raise ValueError("column {} out of range for {} column(s)".format(column, width))
+        typecode = TYPECODES[dtype]
+        itemsize = struct.calcsize(typecode)
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        avail = (len(self._map) - offset) // (itemsize * width)
+        if count < 0 or count > avail:
+            count = avail
+        raw = memoryview(self._map)[offset:offset + count * itemsize * width]
+        self._swap = (byteorder == "big") != (NATIVE == ">")
+        self.typecode = typecode
+        self.view = raw.cast(typecode)[column::width] if not self._swap else raw
+        self.itemsize = itemsize
+        self.width = width
+        self.column = column
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def window(self, start, stop):
+        if not self._swap:
+            return self.view[start:stop]
+        step = self.itemsize * self.width
+        vals = array(self.typecode, self.view[start * step:stop * step].tobytes())
+        vals.byteswap()
+        return vals[self.column::self.width]
+
+    def close(self):
+        self.view.release()
+        self._map.close()
+        self._file.close()
+
+def run_windows(seq, args, xseq=None, out=None):
+    # posture over seq in windows; returns (rows, first_deny_x, deny_rows, last_status, state)
+    kw = dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, abstain=engine.ABSTAIN_NEVER,
+              halt=not args.monitor, **engine.strain_kw(args))
+    if args.lr == "zero_tol":
+        kw.update(lr_mode=engine.LR_ZERO_TOL, zero_tol=args.m_zero_tol)
+    else:
+        kw.update(lr_mode=engine.LR_EPS)
+    header, fields, fmt, k0 = engine.LAYOUTS["a3"]
+    if out is not None:
+        out.write(",".join(header) + "\r\n")
+    state = engine.PostureState()
+    cols = engine.TraceColumns()
+    rows = 0
+    first_deny = None
+    denied = 0
+    last = "NO_TRACE"
+    for start in range(0, len(seq), args.window):
+        stop = min(len(seq), start + args.window)
+        vals = seq.window(start, stop)
+        cols.truncate(0)
+        _, deny = engine.run_posture(vals.__getitem__, range(stop - start), args.a_min, args.s_max, args.r_safe,
+                                       cols=cols, state=state, **kw)
+        n = len(cols)
+        # x column: sample index, or the matching values of --x_file
+        if xseq is not None:
+            cols.x[:] = array("d", xseq.window(start, start + n))
+        else:
+            cols.x[:] = array("d", range(start, start + n))
+        if out is not None:
+            out.writelines(engine.iter_rows(cols, fields, fmt, k0 + start))
+        rows += n
+        last = cols.last_status()
+        if deny is not None:
+            denied += cols.status.count(engine.DENY)
+            if first_deny is None:
+                # run_posture returns the DENY's x, here the index within the window; the row is
+                # looked up instead, as the x column was just replaced
+                first_deny = cols.x[cols.status.index(engine.DENY)]
+        if n < stop - start or (cols.status[n - 1] != engine.ALLOW and not args.monitor):
+            break
+    return rows, first_deny, denied, last, state
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("input", help="raw float file or .npy array of magnitudes")
+    ap.add_argument("--dtype", choices=sorted(TYPECODES), default="f8", help="raw files only")
+    ap.add_argument("--byteorder", choices=("little", "big"), default="little", help="raw files only")
+    ap.add_argument("--offset", type=int, default=0, help="header bytes to skip (raw files only)")
+    ap.add_argument("--count", type=int, default=-1, help="number of samples, or rows of a .npy array (default: all)")
+    ap.add_argument("--column", type=int, default=0, help="column of a 2-D .npy array")
+    ap.add_argument("--x_file", default="", help="optional sequence of x values (same options)")
+    ap.add_argument("--window", type=int, default=65536, help="samples per posture window")
+    ap.add_argument("--lr", choices=("zero_tol", "eps"), default="zero_tol",
+                    help="zero_tol: posture_step of test A.3; eps: log ratio of tests 1B/A.6")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    ap.add_argument("--m_zero_tol", type=float, default=1e-12)
+    engine.strain_flags(ap)
+    ap.add_argument("--monitor", action="store_true",
+                    help="keep going after a DENY (continuous monitoring; pair with --strain window/decay)")
+    ap.add_argument("--no_trace", action="store_true", help="summary only")
+    ap.add_argument("--out_dir", default="out_ssom_mmap_input")
+    args = ap.parse_args(argv)
+
+    if args.window < 1:
+        raise ValueError("Require --window >= 1")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    opts = dict(dtype=args.dtype, byteorder=args.byteorder, offset=args.offset, count=args.count)
+    seq = MappedSequence(args.input, column=args.column, **opts)
+    xseq = MappedSequence(args.x_file, **opts) if args.x_file else None
+    if xseq is not None and len(xseq) < len(seq):
+        raise ValueError("--x_file has fewer values than the input")
+
+    stem = os.path.splitext(os.path.basename(args.input))[0]
+    out_csv = os.path.join(args.out_dir, "trace_ssom_mmap_{}.csv".format(stem))
+    out_json = os.path.join(args.out_dir, "summary_ssom_mmap_{}.json".format(stem))
+    try:
+        if args.no_trace:
+            rows, first_deny, denied, last, state = run_windows(seq, args, xseq)
+        else:
+            with open(out_csv, "w", newline="", encoding="utf-8") as f:
+                rows, first_deny, denied, last, state = run_windows(seq, args, xseq, f)
+    finally:
+        seq.close()
+        if xseq is not None:
+            xseq.close()
+
+    result = {
+        "label": stem,
+        "trace": "" if args.no_trace else os.path.basename(out_csv),
+        "rows": rows,
+        "samples": len(seq),
+        "first_deny": first_deny,
+        "deny_rows": denied,
+        "last_status": last,
+        "final_m": state.m_acc,
+        "s": state.s,
+    }
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+
+    print("SSOM mapped-input posture complete: {} ({} samples)".format(args.input, len(seq)))
+    if not args.no_trace:
+        print("Output:", out_csv)
+    print("Summary:", out_json)
+    print("Rows:", rows, "| DENY rows:", denied, "| Last status:", last)
+    if first_deny is not None:
+        print("First DENY at x ~= {:.16e}".format(first_deny))
+    return result
+
+if __name__ == "__main__":
+    main()
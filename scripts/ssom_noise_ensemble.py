@@ -0,0 +1,266 @@
+# ssom_noise_ensemble.py
+# How fragile is a DENY horizon? Runs the A.3 limit path (run_path) or the A.5 integral
+# (integrate_ssom) under K seeded perturbations of the function values or of the sample points,
+# and reports the distribution of first-DENY positions instead of a single trace.
+# Members are processed in blocks: every block is one (block x N) batched posture pass, and
+# blocks are spread over processes. Member j always draws from its own generator seeded with
+# (seed, j), so the ensemble does not depend on --block or --workers.
+import argparse
+import csv
+import math
+import os
+import random
+from array import array
+from multiprocessing import Pool
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+
+KINDS = ("path", "integral")
+PATHS = {"calm": 0.0, "osc": math.pi / 2.0}   # x_n = 1 / (n pi + offset), as in A.3
+NOISE = ("value", "point")
+MODELS = ("relative", "absolute")
+DISTS = ("gauss", "uniform")
+# point shifts are clipped to this fraction of the local spacing, so perturbed points never cross
+POINT_CLIP = 0.49
+# per-kind defaults, from the A.3 / A.5 reference scripts
+DEFAULTS = {
+    "path": {"func": "xsin1x", "steps": 200, "gamma_flip": 0.20, "zero_tol": 1e-12},
+    "integral": {"func": "alt_square", "steps": 1000, "gamma_flip": 0.05, "zero_tol": 1e-15},
+}
+
+def sample_points(args):
+    if args.kind == "path":
+        pi = math.pi
+        offset = PATHS[args.path]
+        return array("d", (1.0 / (n * pi + offset) for n in range(1, args.steps + 1)))
+    return engine.unit_grid(args.steps)
+
+def spacing(xs):
+    # local sample spacing, the smaller of the two neighbouring gaps; point noise moves x_k by
+    # sigma * z * spacing_k, clipped to POINT_CLIP * spacing_k
+    n = len(xs)
+    gaps = [abs(xs[k + 1] - xs[k]) for k in range(n - 1)]
+    return array("d", (min(gaps[k - 1] if k > 0 else gaps[k], gaps[k] if k + 1 < n else gaps[k - 1])
+                       for k in range(n)))
+
+def _draws_numpy(seed, j0, j1, n, dist):
+    out = np.empty((j1 - j0, n))
+    for i, j in enumerate(range(j0, j1)):
+        rng = np.random.default_rng((seed, j))
+        out[i] = rng.standard_normal(n) if dist == "gauss" else rng.uniform(-1.0, 1.0, n)
+    return out
+
+def _draws_python(seed, j, n, dist):
+    rng = random.Random("{}:{}".format(seed, j))
+    if dist == "gauss":
+        return [rng.gauss(0.0, 1.0) for _ in range(n)]
+    return [rng.uniform(-1.0, 1.0) for _ in range(n)]
+
+def rows_numpy(fn, xs, dxs, kind, noise, model, sigma, z):
+    x = np.asarray(xs, dtype=float)
+    if noise == "point":
+        if kind == "integral":
+            z[:, 0] = 0.0
+            z[:, -1] = 0.0
+        shift = np.clip(sigma * z, -POINT_CLIP, POINT_CLIP)
+        pts = x[None, :] + shift * np.asarray(dxs, dtype=float)[None, :]
+        vals = fn.vector(pts)
+    else:
+        pts = np.broadcast_to(x, z.shape)
+        base = fn.vector(x)[None, :]
+        vals = base * (1.0 + sigma * z) if model == "relative" else base + sigma * z
+    if kind == "integral":
+        with np.errstate(all="ignore"):
+            return vals[:, :-1] * np.diff(pts, axis=1)
+    return vals
+
+def row_python(fn, xs, dxs, kind, noise, model, sigma, z):
+    f = fn.scalar
+    if noise == "point":
+        if kind == "integral":
+            z[0] = 0.0
+            z[-1] = 0.0
+        pts = [x + max(-POINT_CLIP, min(POINT_CLIP, sigma * zk)) * d for x, zk, d in zip(xs, z, dxs)]
+        vals = [f(x) for x in pts]
+    else:
+        pts = xs
+        if model == "relative":
+            vals = [f(x) * (1.0 + sigma * zk) for x, zk in zip(xs, z)]
+        else:
+            vals = [f(x) + sigma * zk for x, zk in zip(xs, z)]
+    if kind == "integral":
+        return array("d", (vals[k] * (pts[k + 1] - pts[k]) for k in range(len(pts) - 1)))
+    return array("d", vals)
+
+def run_block(task):
+    # worker: (stop index, status code at stop or -1) per member of [j0, j1)
+    spec, params, xs, kind, noise, model, dist, sigma, seed, j0, j1, knobs, use_numpy = task
+    fn = functions.resolve(spec, params)
+    dxs = spacing(xs)
+    n = len(xs)
+    if use_numpy and fn.vector is not None:
+        m = rows_numpy(fn, xs, dxs, kind, noise, model, sigma, _draws_numpy(seed, j0, j1, n, dist))
+        res = batch.batch_posture(m, use_numpy=True, **knobs)
+        stop = res.stop.astype(np.int64)
+        code = np.where(stop >= 0, res.status[np.arange(len(stop)), np.maximum(stop, 0)], -1)
+        return array("q", stop.tolist()), array("b", code.tolist())
+    m = [row_python(fn, xs, dxs, kind, noise, model, sigma, _draws_python(seed, j, n, dist)) for j in range(j0, j1)]
+    res = batch.batch_posture(m, use_numpy=False, **knobs)
+    stop = array("q", res.stop)
+    code = array("b", (res.status[i][k] if k >= 0 else -1 for i, k in enumerate(stop)))
+    return stop, code
+
+def baseline_stop(fn, xs, kind, knobs):
+    # the unperturbed run through the scalar engine: (stop index or -1, status name)
+    integral = kind == "integral"
+    cols, _ = engine.run_posture(fn.scalar, xs, integral=integral, **knobs)
+    if cols.status[len(cols) - 1] == engine.ALLOW:
+        return -1, "NONE"
+    return len(cols) - 1, cols.last_status()
+
+def quantile(sorted_vals, q):
+    # linear interpolation between closest ranks (NumPy's default method)
+    if not sorted_vals:
+        return float("nan")
+    pos = q * (len(sorted_vals) - 1)
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kind", choices=KINDS, default="path", help="path: A.3 run_path; integral: A.5 integrate_ssom")
+    ap.add_argument("--path", choices=sorted(PATHS), default="osc", help="A.3 path (kind path)")
+    ap.add_argument("--func", default="", help="registered name or expression in x (default: the test's function)")
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into the expression (repeatable)")
+    ap.add_argument("--steps", type=int, default=0, help="path points / grid intervals (default: the test's)")
+    ap.add_argument("--noise", choices=NOISE, default="value", help="perturb f(x) or the sample points x")
+    ap.add_argument("--model", choices=MODELS, default="relative",
+                    help="value noise: f (1 + sigma z) or f + sigma z; point noise is always x + sigma z spacing, "
+                         "|sigma z| clipped to {}".format(POINT_CLIP))
+    ap.add_argument("--dist", choices=DISTS, default="gauss", help="z ~ N(0, 1) or U(-1, 1)")
+    ap.add_argument("--sigma", type=float, default=1e-3)
+    ap.add_argument("--members", type=int, default=1000, help="ensemble size K")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--quantiles", default="0.05,0.25,0.5,0.75,0.95")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=None)
+    ap.add_argument("--zero_tol", type=float, default=None, help="m_zero_tol (path) / dm_zero_tol (integral)")
+    engine.strain_flags(ap)
+    ap.add_argument("--block", type=int, default=256, help="members per batched pass / worker task")
+    ap.add_argument("--workers", type=int, default=0, help="processes (0 = all cores, 1 = in-process)")
+    ap.add_argument("--scalar", action="store_true", help="draw with random.Random and evaluate with math.*")
+    ap.add_argument("--member_csv", action="store_true", help="also write one row per ensemble member")
+    ap.add_argument("--out_dir", default="out_ssom_noise_ensemble")
+    args = ap.parse_args()
+
+    defaults = DEFAULTS[args.kind]
+    args.func = args.func or defaults["func"]
+    args.steps = args.steps or defaults["steps"]
+    if args.gamma_flip is None:
+        args.gamma_flip = defaults["gamma_flip"]
+    if args.zero_tol is None:
+        args.zero_tol = defaults["zero_tol"]
+    if args.steps < 5:
+        raise ValueError("Require --steps >= 5")
+    if args.members < 1 or args.block < 1:
+        raise ValueError("Require --members >= 1 and --block >= 1")
+    if args.sigma < 0.0:
+        raise ValueError("Require --sigma >= 0")
+    qs = [float(q) for q in args.quantiles.split(",") if q]
+    if any(not 0.0 <= q <= 1.0 for q in qs):
+        raise ValueError("Require --quantiles in [0, 1]")
+
+    params = functions.parse_params(args.param)
+    fn = functions.resolve(args.func, params)
+    use_numpy = np is not None and not args.scalar
+    xs = sample_points(args)
+    knobs = dict(a_min=args.a_min, s_max=args.s_max, r_safe=args.r_safe, beta_flip=args.beta_flip,
+                 gamma_flip=args.gamma_flip, lr_mode=engine.LR_ZERO_TOL, zero_tol=args.zero_tol,
+                 abstain=engine.ABSTAIN_NEVER, **engine.strain_kw(args))
+    workers = args.workers or os.cpu_count() or 1
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    base_k, base_status = baseline_stop(fn, xs, args.kind, knobs)
+    tasks = [(args.func, params, xs, args.kind, args.noise, args.model, args.dist, args.sigma, args.seed,
+              j0, min(args.members, j0 + args.block), knobs, use_numpy)
+             for j0 in range(0, args.members, args.block)]
+    if workers > 1 and len(tasks) > 1:
+        with Pool(workers) as pool:
+            results = pool.map(run_block, tasks)
+    else:
+        results = list(map(run_block, tasks))
+    stops = array("q")
+    codes = array("b")
+    for stop, code in results:
+        stops.extend(stop)
+        codes.extend(code)
+
+    # row positions: path rows are the points, integral rows the intervals [x_k, x_k+1]
+    n_rows = len(xs) - 1 if args.kind == "integral" else len(xs)
+    deny_at = [0] * n_rows
+    abstain_at = [0] * n_rows
+    deny_ks = []
+    for k, code in zip(stops, codes):
+        if code == engine.DENY:
+            deny_at[k] += 1
+            deny_ks.append(k)
+        elif code == engine.ABSTAIN:
+            abstain_at[k] += 1
+    deny_ks.sort()
+    K = args.members
+
+    steps_csv = os.path.join(args.out_dir, "noise_ensemble_steps_ssom.csv")
+    with open(steps_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["k", "x", "p_deny_at", "p_deny_by", "p_abstain_at", "p_reached"])
+        by = 0
+        stopped = 0
+        for k in range(n_rows):
+            reached = K - stopped
+            by += deny_at[k]
+            stopped += deny_at[k] + abstain_at[k]
+            w.writerow([k, "{:.16e}".format(xs[k]), "{:.6f}".format(deny_at[k] / K), "{:.6f}".format(by / K),
+                        "{:.6f}".format(abstain_at[k] / K), "{:.6f}".format(reached / K)])
+
+    summary_csv = os.path.join(args.out_dir, "noise_ensemble_quantiles_ssom.csv")
+    with open(summary_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["quantile", "first_deny_k", "first_deny_x"])
+        for q in qs:
+            kq = quantile(deny_ks, q)
+            xq = float("nan") if kq != kq else xs[int(round(kq))]
+            w.writerow(["{:g}".format(q), "{:.2f}".format(kq), "{:.16e}".format(xq)])
+
+    if args.member_csv:
+        members_csv = os.path.join(args.out_dir, "noise_ensemble_members_ssom.csv")
+        with open(members_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["member", "stop_k", "stop_x", "status"])
+            for j, (k, code) in enumerate(zip(stops, codes)):
+                w.writerow([j, k, "{:.16e}".format(xs[k]) if k >= 0 else "",
+                            batch.STATUS_NAMES[code] if code >= 0 else "NONE"])
+
+    print("SSOM noise ensemble complete: {} {} f(x) = {}, {} noise ({}, {}), sigma = {:g}".format(
+        args.kind, args.path if args.kind == "path" else "grid", args.func, args.noise,
+        args.model if args.noise == "value" else "spacing", args.dist, args.sigma))
+    print("Backend:", "numpy" if use_numpy else "stdlib", "| workers:", workers, "| members:", K, "| seed:", args.seed)
+    print("Output:", steps_csv)
+    print("Output:", summary_csv)
+    if base_k < 0:
+        print("Unperturbed: no DENY")
+    else:
+        print("Unperturbed: first {} at k = {} (x ~= {:.3e})".format(base_status, base_k, xs[base_k]))
+    print("P(DENY) = {:.4f}, P(ABSTAIN) = {:.4f}".format(len(deny_ks) / K, sum(abstain_at) / K))
+    if deny_ks:
+        print("First-DENY k quantiles: " + ", ".join(
+            "q{:g} = {:.1f}".format(q, quantile(deny_ks, q)) for q in qs))
+
+if __name__ == "__main__":
+    main()
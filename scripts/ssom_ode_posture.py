@@ -0,0 +1,260 @@
+# ssom_ode_posture.py
+# Posture of ODE integrators under step-size refinement. Every (problem, eps, method) row
+# integrates to --t_end once per step size of the ladder; all rows and step sizes advance
+# together as one (lanes, dim) state array. The magnitude per step size is the solution at
+# t_end (or its peak), and the row's posture is taken with ssom_batch_posture.
+# Default order walks from the finest step size to the coarsest, so the last ALLOW is the
+# coarsest step size the posture still trusts: the step-size reliability horizon.
+import argparse
+import csv
+import math
+import os
+from array import array
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+from ssom_batch_posture import np
+
+# name -> (dim, y0(eps), f(t, y, eps, xm), exact(t, eps, xm) or None, linear stability factor, doc)
+# f and exact take the math module or NumPy as xm and work on floats or arrays alike;
+# the stability factor c is the explicit-Euler / RK4 bound h < c * eps for the stiff mode.
+PROBLEMS = {
+    "decay": (
+        1,
+        lambda eps: (1.0,),
+        lambda t, y, eps, xm: (-y[0] / eps,),
+        lambda t, eps, xm: xm.exp(-t / eps),
+        {"euler": 2.0, "rk4": 2.785293563405282},
+        "y' = -y/eps, y(0) = 1",
+    ),
+    "prothero": (
+        1,
+        lambda eps: (1.0,),
+        lambda t, y, eps, xm: (-(y[0] - xm.cos(t)) / eps - xm.sin(t),),
+        lambda t, eps, xm: xm.cos(t),
+        {"euler": 2.0, "rk4": 2.785293563405282},
+        "Prothero-Robinson: y' = -(y - cos t)/eps - sin t, y(0) = 1, y = cos t",
+    ),
+    "oscillator": (
+        2,
+        lambda eps: (1.0, 0.0),
+        lambda t, y, eps, xm: (y[1] / eps, -y[0] / eps),
+        lambda t, eps, xm: xm.cos(t / eps),
+        {"euler": 0.0, "rk4": 2.8284271247461903},
+        "y'' = -y/eps^2, y(0) = 1: explicit Euler gains energy at every step size",
+    ),
+}
+
+METHODS = ("euler", "rk4")
+ORDERS = ("coarsen", "refine")
+OBSERVABLES = ("final", "peak")
+
+def _axpy(y, a, k):
+    return tuple(yi + a * ki for yi, ki in zip(y, k))
+
+def step_euler(f, t, y, h, eps, xm):
+    return _axpy(y, h, f(t, y, eps, xm))
+
+def step_rk4(f, t, y, h, eps, xm):
+    k1 = f(t, y, eps, xm)
+    k2 = f(t + 0.5 * h, _axpy(y, 0.5 * h, k1), eps, xm)
+    k3 = f(t + 0.5 * h, _axpy(y, 0.5 * h, k2), eps, xm)
+    k4 = f(t + h, _axpy(y, h, k3), eps, xm)
+    return tuple(yi + (h / 6.0) * (a + 2.0 * b + 2.0 * c + d) for yi, a, b, c, d in zip(y, k1, k2, k3, k4))
+
+STEPPERS = {"euler": step_euler, "rk4": step_rk4}
+
+def step_counts(hs, t_end):
+    # steps per lane; every lane lands exactly on t_end with h = t_end / n.
+    # Coarse ladder entries that round to the same count are kept once.
+    out = []
+    for h in hs:
+        n = max(1, int(round(t_end / h)))
+        if not out or n != out[-1]:
+            out.append(n)
+    return out
+
+def integrate_numpy(problem, method, eps_values, counts, t_end):
+    # all (eps, step size) lanes at once; lanes sorted by step count so the active set is a prefix
+    dim, y0, f, _, _, _ = PROBLEMS[problem]
+    step = STEPPERS[method]
+    n_eps = len(eps_values)
+    lanes = [(e, k) for e in range(n_eps) for k in range(len(counts))]
+    lanes.sort(key=lambda ek: -counts[ek[1]])
+    n = np.array([counts[k] for _, k in lanes])
+    h = t_end / n
+    eps = np.array([eps_values[e] for e, _ in lanes])
+    y = tuple(np.array([y0(eps_values[e])[i] for e, _ in lanes]) for i in range(dim))
+    peak = np.abs(y[0])
+    active = len(lanes)
+    with np.errstate(all="ignore"):
+        for j in range(int(n[0])):
+            while n[active - 1] <= j:
+                active -= 1
+            ya = tuple(yi[:active] for yi in y)
+            ha = h[:active]
+            new = step(f, j * ha, ya, ha, eps[:active], np)
+            for yi, ni in zip(y, new):
+                yi[:active] = ni
+            np.maximum(peak[:active], np.abs(y[0][:active]), out=peak[:active])
+    final = np.empty((n_eps, len(counts)))
+    top = np.empty((n_eps, len(counts)))
+    for i, (e, k) in enumerate(lanes):
+        final[e, k] = y[0][i]
+        top[e, k] = peak[i]
+    return final, top
+
+def integrate_python(problem, method, eps_values, counts, t_end):
+    dim, y0, f, _, _, _ = PROBLEMS[problem]
+    step = STEPPERS[method]
+    final = []
+    top = []
+    for eps in eps_values:
+        row_final = array("d")
+        row_peak = array("d")
+        for n in counts:
+            h = t_end / n
+            y = y0(eps)
+            peak = abs(y[0])
+            for j in range(n):
+                y = step(f, j * h, y, h, eps, math)
+                # inf - inf turns the state into nan; the peak keeps the last finite maximum
+                if abs(y[0]) > peak:
+                    peak = abs(y[0])
+            row_final.append(y[0])
+            row_peak.append(peak)
+        final.append(row_final)
+        top.append(row_peak)
+    return final, top
+
+def eps_list(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--problem", default="prothero", help="comma-separated: " + ",".join(sorted(PROBLEMS)))
+    ap.add_argument("--method", default="euler,rk4", help="comma-separated: " + ",".join(METHODS))
+    ap.add_argument("--eps", default="1e-2,1e-3", help="comma-separated stiffness parameters")
+    ap.add_argument("--t_end", type=float, default=1.0)
+    ap.add_argument("--h_max", type=float, default=0.5)
+    ap.add_argument("--h_min", type=float, default=1e-4)
+    ap.add_argument("--steps", type=int, default=60)
+    ap.add_argument("--order", choices=ORDERS, default="coarsen",
+                    help="coarsen: finest step first (horizon = coarsest safe h); refine: coarsest first, as in A.7")
+    ap.add_argument("--observable", choices=OBSERVABLES, default="final", help="y(t_end) or max |y| over [0, t_end]")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    engine.strain_flags(ap)
+    ap.add_argument("--scalar", action="store_true", help="integrate lane by lane with math.* instead of NumPy")
+    ap.add_argument("--trace", action="store_true", help="also write the full per-step-size trace")
+    ap.add_argument("--out_dir", default="out_ssom_ode_posture")
+    args = ap.parse_args()
+
+    engine._check_ladder(args, 5)
+    if args.t_end <= 0.0:
+        raise ValueError("Require --t_end > 0")
+    problems = [p for p in args.problem.split(",") if p]
+    methods = [m for m in args.method.split(",") if m]
+    for p in problems:
+        if p not in PROBLEMS:
+            raise ValueError("unknown problem {!r} (choose from {})".format(p, ", ".join(sorted(PROBLEMS))))
+    for m in methods:
+        if m not in STEPPERS:
+            raise ValueError("unknown method {!r} (choose from {})".format(m, ", ".join(METHODS)))
+    eps_values = eps_list(args.eps)
+    if not eps_values or min(eps_values) <= 0.0:
+        raise ValueError("Require --eps values > 0")
+
+    use_numpy = np is not None and not args.scalar
+    counts = step_counts(engine.log_ladder(args.h_max, args.h_min, args.steps), args.t_end)
+    hs = [args.t_end / n for n in counts]
+    order = list(range(len(hs)))
+    if args.order == "coarsen":
+        order.reverse()
+    knobs = dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_EPS,
+                 abstain=engine.ABSTAIN_NONFINITE, **engine.strain_kw(args))
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    rows = []
+    traces = []
+    for problem in problems:
+        exact = PROBLEMS[problem][3]
+        factors = PROBLEMS[problem][4]
+        for method in methods:
+            integrate = integrate_numpy if use_numpy else integrate_python
+            final, top = integrate(problem, method, eps_values, counts, args.t_end)
+            values = final if args.observable == "final" else top
+            m_rows = [[float(values[e][k]) for k in order] for e in range(len(eps_values))]
+            res = batch.batch_posture(m_rows, args.a_min, args.s_max, args.r_safe, use_numpy=use_numpy, **knobs)
+            for e, eps in enumerate(eps_values):
+                stop = int(res.stop[e])
+                last = stop - 1 if stop >= 0 else len(order) - 1
+                # coarsen: the coarsest step size still ALLOWed; refine: the first DENY, as in A.7.
+                # The finest step is ALLOWed by construction (it is the baseline), so a coarsen
+                # run that stops on the next one has no safe step size
+                if args.order == "coarsen":
+                    at = -1 if 0 <= stop <= 1 else last
+                else:
+                    at = stop
+                ref = exact(args.t_end, eps, math)
+                stable = factors[method] * eps
+                rows.append({
+                    "problem": problem,
+                    "method": method,
+                    "eps": eps,
+                    "stop_k": stop,
+                    "stop_status": res.stop_status(e),
+                    "stop_h": hs[order[stop]] if stop >= 0 else None,
+                    "last_allow_h": hs[order[last]],
+                    "horizon_h": hs[order[at]] if at >= 0 else None,
+                    "stability_h": stable if stable > 0.0 else None,
+                    "error_at_horizon": abs(float(final[e][order[at]]) - ref) if at >= 0 else None,
+                })
+                if args.trace:
+                    for j, k in enumerate(order):
+                        traces.append([problem, method, "{:.6e}".format(eps), j, "{:.16e}".format(hs[k]), counts[k],
+                                       "{:.16e}".format(m_rows[e][j]), "{:.6e}".format(abs(float(final[e][k]) - ref)),
+                                       "{:.8f}".format(float(res.a[e][j])), "{:.8f}".format(float(res.s[e][j])),
+                                       "{:.8f}".format(float(res.lr[e][j])), int(res.flip[e][j]),
+                                       batch.STATUS_NAMES[int(res.status[e][j])]])
+
+    def fmt(v, spec="{:.6e}"):
+        return "" if v is None else spec.format(v)
+
+    out_csv = os.path.join(args.out_dir, "ode_horizons_ssom.csv")
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["problem", "method", "eps", "order", "observable", "stop_k", "stop_status", "stop_h",
+                    "last_allow_h", "horizon_h", "horizon_over_eps", "linear_stability_h", "abs_error_at_horizon"])
+        for r in rows:
+            w.writerow([r["problem"], r["method"], fmt(r["eps"]), args.order, args.observable, r["stop_k"],
+                        r["stop_status"], fmt(r["stop_h"]), fmt(r["last_allow_h"]),
+                        fmt(r["horizon_h"]),
+                        fmt(None if r["horizon_h"] is None else r["horizon_h"] / r["eps"], "{:.4f}"),
+                        fmt(r["stability_h"]), fmt(r["error_at_horizon"])])
+    if args.trace:
+        trace_csv = os.path.join(args.out_dir, "ode_trace_ssom.csv")
+        with open(trace_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["problem", "method", "eps", "k", "h", "n_steps", "m", "abs_error", "a", "s", "lr", "flip",
+                        "status"])
+            w.writerows(traces)
+
+    print("SSOM ODE posture complete: t_end = {}, {} step sizes, order = {}".format(args.t_end, len(hs), args.order))
+    print("Backend:", "numpy" if use_numpy else "stdlib")
+    print("Output:", out_csv)
+    for r in rows:
+        if args.order == "coarsen" and r["horizon_h"] is None:
+            horizon = "no safe step size ({} already at h ~= {:.3e})".format(r["stop_status"], r["stop_h"])
+        elif args.order == "coarsen":
+            horizon = "coarsest safe h ~= {:.3e}".format(r["horizon_h"])
+        else:
+            horizon = "no DENY" if r["horizon_h"] is None else "first DENY at h ~= {:.3e}".format(r["horizon_h"])
+        stable = "" if r["stability_h"] is None else " (linear stability h < {:.3e})".format(r["stability_h"])
+        print("  {} / {} / eps = {:.1e}: {}{}".format(r["problem"], r["method"], r["eps"], horizon, stable))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# ssom_pipeline.py
+# Pipelined trace emission: the posture pass runs in chunks of rows (a PostureState carries
+# strain across chunks), each chunk is formatted and handed to a bounded queue, and a writer
+# thread compresses and writes it while the next chunk is computed. zlib / bz2 / lzma release
+# the GIL while compressing, so compression and disk I/O overlap with the posture pass.
+# Output bytes (after decompression) are identical to `ssom_fast_engine.py <test>`.
+import bz2
+import gzip
+import lzma
+import os
+import queue
+import threading
+import time
+
+import ssom_fast_engine as engine
+
+COMPRESSORS = {
+    "none": ("", lambda path, level: open(path, "wb")),
+    "gzip": (".gz", lambda path, level: gzip.open(path, "wb", compresslevel=level)),
+    "bz2": (".bz2", lambda path, level: bz2.open(path, "wb", compresslevel=level)),
+    "lzma": (".xz", lambda path, level: lzma.open(path, "wb", preset=level)),
+}
+
+_DONE = object()
+
+class ChunkWriter(threading.Thread):
+    # consumes byte chunks from a bounded queue; put() blocks when the writer falls behind
+    def __init__(self, path, compress="none", level=6, queue_size=8):
+        super().__init__(daemon=True)
+        suffix, opener = COMPRESSORS[compress]
+        self.path = path + suffix
+        self._f = opener(self.path, level)
+        self._q = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.busy = 0.0   # seconds spent compressing / writing
+        self.start()
+
+    def run(self):
+        try:
+            while True:
+                data = self._q.get()
+                if data is _DONE:
+                    break
+                t0 = time.perf_counter()
+                self._f.write(data)
+                self.busy += time.perf_counter() - t0
+        except BaseException as exc:
+            self.error = exc
+            # keep draining so the producer never blocks on a dead writer
+            while self._q.get() is not _DONE:
+                pass
+        finally:
+            self._f.close()
+
+    def put(self, data):
+        if self.error is not None:
+            raise self.error
+        self._q.put(data)
+
+    def close(self):
+        self._q.put(_DONE)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+class PartResult:
+    __slots__ = ("label", "rows", "first_deny", "last_status")
+
+def pipelined_part(writer, fn, xs, layout, knobs, chunk_rows, integral=False, extra=None):
+    # posture over xs in chunks, each chunk formatted and queued for the writer
+    _, fields, fmt, k0 = engine.LAYOUTS[layout]
+    state = engine.PostureState()
+    cols = engine.TraceColumns()
+    n_total = len(xs) - 1 if integral else len(xs)
+    res = PartResult()
+    res.rows = 0
+    res.first_deny = None
+    res.last_status = "NO_TRACE"
+    for start in range(0, n_total, chunk_rows):
+        stop = min(n_total, start + chunk_rows)
+        window = xs[start:stop + 1] if integral else xs[start:stop]
+        cols.truncate(0)
+        _, deny = engine.run_posture(fn, window, cols=cols, state=state, integral=integral, **knobs)
+        n = len(cols)
+        writer.put("".join(engine.iter_rows(cols, fields, fmt, k0 + start, extra)).encode("utf-8"))
+        res.rows += n
+        res.last_status = cols.last_status()
+        if deny is not None:
+            res.first_deny = deny
+        if n < stop - start or cols.status[n - 1] != engine.ALLOW:
+            break
+    return res
+
+def run_pipelined(args, compress="none", level=6, chunk_rows=65536, queue_size=8, writer_cls=ChunkWriter):
+    # returns [(path, [PartResult]), ...] and the writers' busy time;
+    # writer_cls(path, compress, level, queue_size) must offer put / close / path / busy;
+    # only the dense CSV is streamed, so the other outputs of the shared parser are refused
+    if getattr(args, "binary", False):
+        raise ValueError("--binary is not supported by the pipelined writer; run ssom_fast_engine.py for .ssomb traces")
+    if getattr(args, "trace_mode", "dense") != "dense":
+        raise ValueError("--trace_mode {} is not supported by the pipelined writer (dense CSV only)".format(
+            args.trace_mode))
+    os.makedirs(args.out_dir, exist_ok=True)
+    out = []
+    busy = 0.0
+    for name, layout, parts in engine.plan(args):
+        header = engine.LAYOUTS[layout][0]
+        writer = writer_cls(os.path.join(args.out_dir, name), compress, level, queue_size)
+        results = []
+        try:
+            writer.put((",".join(header) + "\r\n").encode("utf-8"))
+            for label, fn, xs, knobs, integral, extra in parts:
+                res = pipelined_part(writer, fn, xs, layout, knobs, chunk_rows, integral, extra)
+                res.label = label
+                results.append(res)
+        finally:
+            writer.close()
+        busy += writer.busy
+        out.append((writer.path, results))
+    return out, busy
+
+def pipeline_flags(p):
+    p.add_argument("--compress", choices=sorted(COMPRESSORS), default="none")
+    p.add_argument("--level", type=int, default=6, help="compression level / lzma preset")
+    p.add_argument("--chunk_rows", type=int, default=65536, help="rows per queued chunk")
+    p.add_argument("--queue", type=int, default=8, help="chunks buffered between engine and writer")
+
+def build_parser():
+    return engine.build_parser(pipeline_flags)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.chunk_rows < 1 or args.queue < 1:
+        raise ValueError("Require --chunk_rows >= 1 and --queue >= 1")
+    t0 = time.perf_counter()
+    out, busy = run_pipelined(args, args.compress, args.level, args.chunk_rows, args.queue)
+    wall = time.perf_counter() - t0
+    print("SSOM pipelined run complete: test {} ({:.2f} s wall, writer busy {:.2f} s)".format(args.test, wall, busy))
+    for path, results in out:
+        print("Output:", path)
+        for res in results:
+            deny = "no DENY" if res.first_deny is None else "first DENY at ~= {:.3e}".format(res.first_deny)
+            print("  {}: rows={}, last status={}, {}".format(res.label, res.rows, res.last_status, deny))
+    return out
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# ssom_posture_budget.py
+# Deadline-bounded posture: the best verdict an engine test can give within --budget_ms.
+# Every trace part is refined coarse to fine. Level 0 evaluates f on every d-th point of the
+# ladder / path / grid (about --coarse points, plus the last one); each following level halves
+# d and fills in the points between, until d = 1 is the full ladder. After each completed level
+# the posture runs over the points known so far. When the deadline (or --max_evals) hits, the
+# last completed level's verdict is returned with the evaluations and time spent and the level
+# (stride) reached. Only the last level (stride 1) is the exhaustive verdict; earlier ones are
+# provisional. A coarse ladder sees larger log ratios than the full one and misses what happens
+# between its points, so a provisional DENY only says where to look: its one-sided bound runs
+# from the first unevaluated point after the last coarse ALLOW to the end of the ladder. It is
+# not a confidence interval. --compare runs the exhaustive posture as well and reports, per
+# budget, how often the budgeted verdict differs from it and how often the bound holds its stop.
+import csv
+import os
+import time
+from array import array
+
+import ssom_fast_engine as engine
+
+NO_VERDICT = "NONE"
+
+class BudgetVerdict:
+    __slots__ = ("status", "stop", "lo", "hi", "level", "stride", "evals", "elapsed", "complete")
+
+    def __init__(self, status, stop, lo, hi, level, stride, evals, elapsed, complete):
+        # status: ALLOW / DENY / ABSTAIN, or NONE if no level finished in time;
+        # stop: ladder index of the stop (-1 if none); lo .. hi: ladder indexes bounding the
+        # exhaustive stop (the stop itself once complete, -1 without a stop)
+        self.status = status
+        self.stop = stop
+        self.lo = lo
+        self.hi = hi
+        self.level = level
+        self.stride = stride
+        self.evals = evals
+        self.elapsed = elapsed
+        self.complete = complete
+
+def level_strides(n_points, coarse):
+    # d, d/2, ..., 1 with about `coarse` points at the first level
+    d = 1
+    while (n_points - 1) // (d * 2) + 1 >= coarse:
+        d *= 2
+    strides = []
+    while d >= 1:
+        strides.append(d)
+        d //= 2
+    return strides
+
+def budget_posture(fn, xs, knobs, integral, budget_s, coarse=9, check_every=16, max_evals=0):
+    # f values are cached per x, so every level only evaluates its new points
+    t0 = time.perf_counter()
+    deadline = t0 + budget_s
+    n_points = len(xs) - 1 if integral else len(xs)
+    known = {}
+    best = BudgetVerdict(NO_VERDICT, -1, -1, -1, -1, 0, 0, 0.0, False)
+    strides = level_strides(n_points, coarse)
+    for level, d in enumerate(strides):
+        idx = list(range(0, n_points, d))
+        if idx[-1] != n_points - 1:
+            idx.append(n_points - 1)
+        todo = [i for i in idx if xs[i] not in known]
+        stopped = False
+        for c in range(0, len(todo), check_every):
+            if time.perf_counter() >= deadline:
+                stopped = True
+                break
+            for i in todo[c:c + check_every]:
+                if max_evals and len(known) >= max_evals:
+                    stopped = True
+                    break
+                known[xs[i]] = fn(xs[i])
+            if stopped:
+                break
+        if stopped:
+            break
+        sub = array("d", (xs[i] for i in idx))
+        if integral:
+            sub.append(xs[-1])
+        cols, _ = engine.run_posture(known.__getitem__, sub, integral=integral, **knobs)
+        if time.perf_counter() > deadline:
+            break
+        k = len(cols) - 1
+        status = engine.STATUS_NAMES[cols.status[k]]
+        halted = status != "ALLOW"
+        stop = idx[k] if halted else -1
+        if not halted:
+            lo = hi = -1
+        elif d == 1:
+            lo = hi = stop
+        else:
+            lo = idx[k - 1] + 1 if k > 0 else 0
+            hi = n_points - 1
+        best = BudgetVerdict(status, stop, lo, hi, level, d, len(known), time.perf_counter() - t0, d == 1)
+    best.evals = len(known)
+    best.elapsed = time.perf_counter() - t0
+    return best
+
+def exhaustive(fn, xs, knobs, integral):
+    # (status, stop index) of the full ladder
+    cols, _ = engine.run_posture(fn, xs, integral=integral, **knobs)
+    k = len(cols) - 1
+    status = engine.STATUS_NAMES[cols.status[k]]
+    return status, (k if status != "ALLOW" else -1)
+
+def budget_flags(p):
+    p.add_argument("--budget_ms", default="2", help="deadline(s) in milliseconds, comma-separated")
+    p.add_argument("--max_evals", type=int, default=0, help="also stop after this many evaluations (0 = no cap)")
+    p.add_argument("--coarse", type=int, default=9, help="points of the first, coarsest level")
+    p.add_argument("--check_every", type=int, default=16, help="evaluations between deadline checks")
+    p.add_argument("--repeat", type=int, default=1, help="runs per budget (timing varies between runs)")
+    p.add_argument("--compare", action="store_true", help="also run the exhaustive posture and report agreement")
+
+def build_parser():
+    return engine.build_parser(budget_flags)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    budgets = [float(b) for b in args.budget_ms.split(",") if b]
+    if not budgets or min(budgets) <= 0.0:
+        raise ValueError("Require --budget_ms > 0")
+    if args.coarse < 2 or args.check_every < 1 or args.repeat < 1 or args.max_evals < 0:
+        raise ValueError("Require --coarse >= 2, --check_every >= 1, --repeat >= 1 and --max_evals >= 0")
+    os.makedirs(args.out_dir, exist_ok=True)
+    # the plan is setup (a4 normalizes its integrand over the grid there), not part of the budget
+    parts = [part for _, _, group in engine.plan(args) for part in group]
+    reference = {}
+    if args.compare:
+        for label, fn, xs, knobs, integral, _ in parts:
+            reference[label] = exhaustive(fn, xs, knobs, integral)
+
+    out_csv = os.path.join(args.out_dir, "posture_budget_ssom.csv")
+    tally = {}
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["test", "part", "budget_ms", "run", "status", "provisional", "stop_x", "bound_lo_x", "bound_hi_x",
+                    "level", "stride", "evaluations", "points", "elapsed_ms", "exhaustive_status", "exhaustive_x",
+                    "agrees", "covered"])
+        for budget in budgets:
+            for run in range(args.repeat):
+                for label, fn, xs, knobs, integral, _ in parts:
+                    v = budget_posture(fn, xs, knobs, integral, budget / 1000.0, args.coarse, args.check_every,
+                                       args.max_evals)
+                    row = [args.test, label, budget, run, v.status, int(not v.complete),
+                           "{:.6e}".format(xs[v.stop]) if v.stop >= 0 else "",
+                           "{:.6e}".format(xs[v.lo]) if v.lo >= 0 else "",
+                           "{:.6e}".format(xs[v.hi]) if v.hi >= 0 else "",
+                           v.level, v.stride, v.evals, len(xs) - 1 if integral else len(xs),
+                           "{:.3f}".format(v.elapsed * 1000.0)]
+                    missed = False
+                    if label in reference:
+                        ref_status, ref_stop = reference[label]
+                        agrees = v.status == ref_status and v.stop == ref_stop
+                        covered = (ref_stop == v.stop == -1 and v.status == ref_status) or (
+                            v.stop >= 0 and ref_stop >= 0 and v.lo <= ref_stop <= v.hi)
+                        row += [ref_status, "{:.6e}".format(xs[ref_stop]) if ref_stop >= 0 else "",
+                                int(agrees), int(covered)]
+                        missed = not covered
+                        counts = tally.setdefault(budget, [0, 0, 0, 0])
+                        counts[0] += 1
+                        counts[1] += v.status == NO_VERDICT
+                        counts[2] += not agrees
+                        counts[3] += covered
+                    else:
+                        row += ["", "", "", ""]
+                    w.writerow(row)
+                    if run == 0:
+                        where = ""
+                        if v.stop >= 0:
+                            where = " at x ~= {:.3e}".format(xs[v.stop])
+                            if not v.complete:
+                                where += " (exhaustive stop bounded by {:.3e} .. {:.3e}{})".format(
+                                    xs[v.lo], xs[v.hi], ", missed" if missed else "")
+                        print("  {} ms, {}: {}{}{}; level {} (stride {}), {} evaluations, {:.3f} ms".format(
+                            budget, label, v.status, "" if v.complete or v.status == NO_VERDICT else " (provisional)",
+                            where, v.level, v.stride, v.evals, v.elapsed * 1000.0))
+
+    print("SSOM posture budget complete: test {}".format(args.test))
+    print("Output:", out_csv)
+    for budget in budgets:
+        if budget in tally:
+            runs, none, differ, covered = tally[budget]
+            print("  {} ms: differs from the exhaustive verdict in {} of {} runs ({} without a verdict), "
+                  "bound holds the exhaustive stop in {}".format(budget, differ, runs, none, covered))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# ssom_run_cache.py
+# Content-addressed cache of SSOM runs keyed on (script version hash, parameter tuple).
+# Identical runs are served from the cache; the scripts are deterministic, so this is exact.
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import ssom_fast_engine as engine
+import ssom_functions as functions
+
+SUMMARY_FILE = "summary.json"
+DEFAULT_CACHE_DIR = os.environ.get("SSOM_CACHE_DIR", ".ssom_cache")
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _file_digest(h, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+
+VERSION_SOURCES = ("ssom_fast_engine.py", "ssom_functions.py", "ssom_tabulated.py")
+
+def version_hash(test: str, func: str = "") -> str:
+    # engine, function compiler, table adapter and reference script sources, which clamp_lane
+    # is in effect, and for --func table:PATH the table file's contents
+    h = hashlib.sha256()
+    for name in VERSION_SOURCES + (engine.REFERENCE_SCRIPTS[test],):
+        _file_digest(h, os.path.join(HERE, name))
+    h.update(engine.clamp_lane.__module__.encode("utf-8"))
+    h.update(functions.input_digest(func).encode("utf-8"))
+    return h.hexdigest()
+
+def run_params(args) -> dict:
+    # the parameter tuple: every flag except where the outputs are copied to
+    return {k: v for k, v in sorted(vars(args).items()) if k != "out_dir"}
+
+def run_key(test: str, version: str, params: dict) -> str:
+    # json floats use repr(), so the key is exact for every parameter value
+    blob = json.dumps({"test": test, "version": version, "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _entry_size(entry: str) -> int:
+    total = 0
+    for name in os.listdir(entry):
+        total += os.path.getsize(os.path.join(entry, name))
+    return total
+
+def list_entries(cache_dir: str):
+    # [(last_used, size, key, meta)] for every complete entry
+    out = []
+    if not os.path.isdir(cache_dir):
+        return out
+    for key in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, key, SUMMARY_FILE)
+        if not os.path.isfile(meta_path):
+            continue
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        out.append((os.path.getmtime(meta_path), _entry_size(os.path.join(cache_dir, key)), key, meta))
+    return out
+
+def evict(cache_dir: str, max_bytes: int, keep=None) -> list:
+    # least-recently-used first until the cache fits in max_bytes
+    entries = sorted(list_entries(cache_dir))
+    total = sum(e[1] for e in entries)
+    removed = []
+    for _, size, key, _ in entries:
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= size
+        removed.append(key)
+    return removed
+
+def invalidate(cache_dir: str, test=None, key_prefix=None, stale=False, everything=False) -> list:
+    removed = []
+    versions = {}
+    for _, _, key, meta in list_entries(cache_dir):
+        hit = everything
+        if test is not None and meta["test"] == test:
+            hit = True
+        if key_prefix and key.startswith(key_prefix):
+            hit = True
+        if stale:
+            t = (meta["test"], meta["params"].get("func", ""))
+            if t not in versions:
+                try:
+                    versions[t] = version_hash(*t)
+                except OSError:
+                    versions[t] = None  # the table file is gone
+            if meta["version"] != versions[t]:
+                hit = True
+        if hit:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            removed.append(key)
+    return removed
+
+def cached_run(argv, cache_dir=DEFAULT_CACHE_DIR, max_bytes=None, copy_outputs=True):
+    # Returns (meta, hit). meta carries key, test, params and the per-trace summaries.
+    args = engine.build_parser().parse_args(argv)
+    version = version_hash(args.test, args.func)
+    params = run_params(args)
+    key = run_key(args.test, version, params)
+    entry = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry, SUMMARY_FILE)
+
+    hit = os.path.isfile(meta_path)
+    if hit:
+        os.utime(meta_path, None)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp_", dir=cache_dir)
+        run_argv = list(argv) + ["--out_dir", tmp]
+        with contextlib.redirect_stdout(io.StringIO()):
+            summaries = engine.main(run_argv)
+        meta = {
+            "key": key,
+            "test": args.test,
+            "version": version,
+            "params": params,
+            "created": time.time(),
+            "summaries": summaries,
+        }
+        with open(os.path.join(tmp, SUMMARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, sort_keys=True)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same run first; its result is identical
+            shutil.rmtree(tmp, ignore_errors=True)
+        if max_bytes is not None:
+            evict(cache_dir, max_bytes, keep=key)
+
+    if copy_outputs:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for name in sorted(os.listdir(entry)):
+            if name != SUMMARY_FILE:
+                shutil.copyfile(os.path.join(entry, name), os.path.join(args.out_dir, name))
+    return meta, hit
+
+def print_summary(meta, hit):
+    print("Cache {}: test {} key {}".format("HIT" if hit else "MISS", meta["test"], meta["key"][:16]))
+    for sm in meta["summaries"]:
+        deny = "no DENY" if sm["first_deny"] is None else "first DENY at ~= {:.3e}".format(sm["first_deny"])
+        print("{} ({}): rows={}, last status={}, {}, final m ~= {:.6e}".format(
+            sm["label"], sm["trace"], sm["rows"], sm["last_status"], deny, sm["final_m"]))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="run a test through the cache: run [--max_mb N] <test> [test flags]")
+    p.add_argument("--max_mb", type=float, default=None, help="evict least-recently-used entries above this size")
+    p.add_argument("--no_copy", action="store_true", help="report the summary without copying traces")
+    p.add_argument("engine_args", nargs=argparse.REMAINDER)
+
+    p = sub.add_parser("invalidate")
+    p.add_argument("--test", default=None)
+    p.add_argument("--key", default=None, help="key or key prefix")
+    p.add_argument("--stale", action="store_true", help="entries whose script version changed")
+    p.add_argument("--all", action="store_true")
+
+    p = sub.add_parser("stats")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        if not args.engine_args:
+            raise ValueError("run needs a test name, e.g. run a4 --steps 500")
+        max_bytes = None if args.max_mb is None else int(args.max_mb * 1024 * 1024)
+        meta, hit = cached_run(args.engine_args, args.cache_dir, max_bytes, not args.no_copy)
+        print_summary(meta, hit)
+    elif args.cmd == "invalidate":
+        if not (args.test or args.key or args.stale or args.all):
+            raise ValueError("invalidate needs --test, --key, --stale or --all")
+        removed = invalidate(args.cache_dir, args.test, args.key, args.stale, args.all)
+        print("Invalidated {} entr{}".format(len(removed), "y" if len(removed) == 1 else "ies"))
+    else:
+        entries = list_entries(args.cache_dir)
+        print("Cache dir:", args.cache_dir)
+        print("Entries:", len(entries))
+        print("Bytes:", sum(e[1] for e in entries))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+# ssom_run_catalog.py
+# SQLite catalog of SSOM runs: one row per trace file (test, parameters) and one per trace
+# part (rows, first DENY index / k / location, final s, final m, last status).
+# Ingests output directories, evidence.zip bundles, run-cache entries and event traces,
+# and answers horizon / parameter queries from indexes instead of re-reading traces.
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+
+import ssom_fast_engine as engine
+import ssom_trace_diff as diff
+from ssom_run_cache import SUMMARY_FILE, run_params
+
+DEFAULT_DB = os.environ.get("SSOM_CATALOG", "ssom_catalog.sqlite")
+CATALOG_SUFFIXES = (".csv", engine.BIN_SUFFIX, engine.EVT_SUFFIX)
+
+# trace file stem -> (test, label), as written by the reference scripts and the engine
+TRACE_NAMES = {
+    "trace_ssom_derivative_sqrt0": ("1a", "sqrt0"),
+    "trace_ssom_derivative_x2sin1x_at0": ("1b", "x2sin1x"),
+    "trace_ssom_limit_path_calm": ("a3", "calm"),
+    "trace_ssom_limit_path_oscillatory": ("a3", "osc"),
+    "trace_ssom_integral_smooth": ("a4", "smooth"),
+    "trace_ssom_integral_spiky": ("a4", "spiky"),
+    "trace_ssom_integral_zero": ("a5", "zero"),
+    "trace_ssom_integral_cancellation": ("a5", "cancellation"),
+    "trace_ssom_derivative_1minuscos_at0": ("a6", "1minuscos"),
+    "trace_ssom_derivative_stiffness_exp_at0": ("a7", "stiffness_exp"),
+    "trace_ssom_derivative_geometry": ("a9", "geometry"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id   INTEGER PRIMARY KEY,
+    source   TEXT NOT NULL UNIQUE,   -- file path, or archive::member
+    test     TEXT,
+    label    TEXT,
+    layout   TEXT,
+    size     INTEGER,
+    mtime    REAL,
+    ingested REAL,
+    params   TEXT NOT NULL           -- JSON object, {} when unknown
+);
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id    INTEGER PRIMARY KEY,
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    part        TEXT NOT NULL,       -- a9 geometry, '' for single-part traces
+    rows        INTEGER NOT NULL,
+    deny_index  INTEGER,             -- 0-based row of the first DENY
+    deny_k      INTEGER,             -- its k / n / step column
+    deny_at     REAL,                -- its h (ladders) or x (paths, integrals)
+    final_s     REAL,
+    final_m     REAL,
+    last_status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    name   TEXT NOT NULL,
+    num    REAL,
+    text   TEXT,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_runs_test ON runs(test, label);
+CREATE INDEX IF NOT EXISTS idx_traces_run ON traces(run_id);
+CREATE INDEX IF NOT EXISTS idx_traces_deny ON traces(deny_at);
+CREATE INDEX IF NOT EXISTS idx_traces_status ON traces(last_status, deny_at);
+CREATE INDEX IF NOT EXISTS idx_traces_final_s ON traces(final_s);
+CREATE INDEX IF NOT EXISTS idx_params_num ON params(name, num, run_id);
+CREATE INDEX IF NOT EXISTS idx_params_text ON params(name, text, run_id);
+"""
+
+def connect(path: str, readonly: bool = False):
+    if readonly:
+        con = sqlite3.connect("file:{}?mode=ro".format(path), uri=True)
+    else:
+        con = sqlite3.connect(path)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.executescript(SCHEMA)
+    con.execute("PRAGMA foreign_keys=ON")
+    return con
+
+# ---------------------------------------------------------------------------
+# trace statistics
+
+def _layout_for(stem, header):
+    # the file name decides (1b and a6 share a header); the header only identifies unknown files
+    test = TRACE_NAMES.get(stem, (None, None))[0]
+    if test in engine.LAYOUTS and list(engine.LAYOUTS[test][0]) == list(header):
+        return test
+    for name, (head, _, _, _) in engine.LAYOUTS.items():
+        if list(head) == list(header):
+            return name
+    return None
+
+def _scan(rows, k_i, x_i, m_i, s_i, status_i, part_i, deny_name):
+    # one pass over rows of any form; returns {part: stats}
+    parts = {}
+    for row in rows:
+        part = row[part_i] if part_i is not None else ""
+        st = parts.get(part)
+        if st is None:
+            st = parts[part] = {"rows": 0, "deny": None, "prev_m": None, "last": None}
+        n = st["rows"]
+        if st["deny"] is None and row[status_i] == deny_name:
+            st["deny"] = (n, row[k_i], row[x_i])
+        if st["last"] is not None:
+            st["prev_m"] = st["last"][0]
+        st["last"] = (row[m_i], row[s_i], row[status_i])
+        st["rows"] = n + 1
+    out = {}
+    for part, st in parts.items():
+        m, s, status = st["last"]
+        final_m = st["prev_m"] if status == deny_name else m
+        deny = st["deny"]
+        out[str(part)] = {
+            "rows": st["rows"],
+            "deny_index": deny[0] if deny else None,
+            "deny_k": int(deny[1]) if deny else None,
+            "deny_at": float(deny[2]) if deny else None,
+            "final_s": float(s),
+            "final_m": float(final_m) if final_m is not None else (0.0 if status == deny_name else None),
+            "status": status,
+        }
+    return out
+
+def csv_stats(header, reader, stem=""):
+    layout = _layout_for(stem, header)
+    if layout is None:
+        return None, None
+    fields = engine.LAYOUTS[layout][1]
+    pos = {name: i for i, name in enumerate(fields)}
+    m_i = pos["m_accum"] if "m_accum" in pos else pos["m"]
+    part_i = pos["extra"] if layout == "a9" else None
+    stats = _scan(reader, pos["k"], pos["x"], m_i, pos["s"], pos["status"], part_i, "DENY")
+    for st in stats.values():
+        st["last_status"] = st.pop("status")
+    return layout, stats
+
+def binary_stats(meta, handle):
+    idx = {name: i for i, name in enumerate(engine.BIN_FIELDS)}
+    stats = _scan(engine.iter_binary_records(handle), idx["k"], idx["x"], idx["m_accum"], idx["s"],
+                  idx["status"], idx["part"], engine.DENY)
+    extras = meta["extras"]
+    out = {}
+    for part, st in stats.items():
+        st["last_status"] = engine.STATUS_NAMES[st.pop("status")]
+        out[str(extras[int(part)]) if len(extras) > 1 else ""] = st
+    return meta["layout"], out
+
+def event_stats(meta, parts):
+    # from segments (first DENY index) and event records (always hold the last row)
+    k0 = engine.LAYOUTS[meta["layout"]][3]
+    idx = {name: i for i, name in enumerate(engine.BIN_FIELDS)}
+    extras = meta["extras"]
+    out = {}
+    for p, (segments, records) in enumerate(parts):
+        by_k = {rec[idx["k"]]: rec for rec in records}
+        deny = next((seg[0] for seg in segments if seg[2] == engine.DENY), None)
+        last = records[-1]
+        deny_rec = by_k.get(k0 + deny) if deny is not None else None
+        final_m = last[idx["m_accum"]]
+        if last[idx["status"]] == engine.DENY:
+            # the committed value sits one row earlier; unknown unless that row is an event too
+            prev = by_k.get(last[idx["k"]] - 1)
+            final_m = prev[idx["m_accum"]] if prev is not None else (0.0 if meta["rows"][p] == 1 else None)
+        out[str(extras[p]) if len(extras) > 1 else ""] = {
+            "rows": meta["rows"][p],
+            "deny_index": deny,
+            "deny_k": k0 + deny if deny is not None else None,
+            "deny_at": deny_rec[idx["x"]] if deny_rec is not None else None,
+            "final_s": last[idx["s"]],
+            "final_m": final_m,
+            "last_status": engine.STATUS_NAMES[last[idx["status"]]],
+        }
+    return meta["layout"], out
+
+def _stem(source):
+    return os.path.splitext(os.path.basename(source.split("::")[-1]))[0]
+
+def replay_deny(test, params, stem):
+    # {part: first DENY h/x} at full precision, by re-running the trace's plan part;
+    # CSV traces round h to 3 digits. None if the trace is not part of the test's plan.
+    args = engine.build_parser().parse_args([test])
+    for name, value in params.items():
+        if hasattr(args, name) and name != "test":
+            setattr(args, name, value)
+    for name, _, parts in engine.plan(args):
+        if os.path.splitext(name)[0] != stem:
+            continue
+        out = {}
+        for _, fn, xs, knobs, integral, extra in parts:
+            cols, deny = engine.run_posture(fn, xs, integral=integral, **knobs)
+            out[str(extra) if len(parts) > 1 else ""] = (len(cols), deny)
+        return out
+    return None
+
+def trace_stats(opener, name):
+    # (layout, {part: stats}) for one trace, or (None, None) if it is not a trace
+    if name.endswith(engine.EVT_SUFFIX):
+        f = opener()
+        try:
+            meta, parts = engine.read_events_file(f)
+        finally:
+            diff._close(f)
+        return event_stats(meta, parts) + (meta.get("params"),)
+    kind, head, handle = diff.open_trace(opener)
+    try:
+        if kind == "bin":
+            return binary_stats(head, handle) + (None,)
+        return csv_stats(head, handle[0], _stem(name)) + (None,)
+    finally:
+        diff._close(handle)
+
+# ---------------------------------------------------------------------------
+# ingest
+
+def iter_sources(path):
+    # (source name, opener, size, mtime, sidecar summary path or None) for every trace-like file
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            sidecar = os.path.join(root, SUMMARY_FILE)
+            sidecar = sidecar if SUMMARY_FILE in files else None
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                if name.endswith(CATALOG_SUFFIXES):
+                    st = os.stat(full)
+                    yield os.path.abspath(full), diff.file_opener(full), st.st_size, st.st_mtime, sidecar
+                elif zipfile.is_zipfile(full) and name.endswith(".zip"):
+                    yield from iter_sources(full)
+    elif zipfile.is_zipfile(path):
+        archive = os.path.abspath(path)
+        with zipfile.ZipFile(path) as zf:
+            infos = sorted(zf.infolist(), key=lambda i: i.filename)
+        for info in infos:
+            if info.filename.endswith(CATALOG_SUFFIXES):
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                yield ("{}::{}".format(archive, info.filename), diff.zip_opener(path, info.filename),
+                       info.file_size, mtime, None)
+    else:
+        st = os.stat(path)
+        yield os.path.abspath(path), diff.file_opener(path), st.st_size, st.st_mtime, None
+
+def _sidecar_params(path, cache):
+    if path is None:
+        return None, None
+    if path not in cache:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        cache[path] = (meta.get("test"), meta.get("params"))
+    return cache[path]
+
+def _param_rows(run_id, params):
+    for name, value in sorted(params.items()):
+        if isinstance(value, bool) or value is None:
+            yield run_id, name, None, json.dumps(value)
+        elif isinstance(value, (int, float)):
+            yield run_id, name, float(value), None
+        else:
+            yield run_id, name, None, str(value)
+
+def _full_deny(stats, deny_at, run_test, run_param, source):
+    # replaces the CSV-rounded deny_at with the engine's value where it is known
+    stem = _stem(source)
+    exact = (deny_at or {}).get(stem)
+    if exact is None and source.endswith(".csv") and run_param and run_test in engine.TESTS \
+            and any(st["deny_index"] is not None for st in stats.values()):
+        try:
+            exact = replay_deny(run_test, run_param, stem)
+        except (ValueError, TypeError):
+            exact = None
+    for part, st in stats.items():
+        rows, deny = (exact or {}).get(part, (None, None))
+        # only if the replay reproduced the trace: same rows, DENY on its last row
+        if deny is not None and rows == st["rows"] and st["deny_index"] == rows - 1:
+            st["deny_at"] = deny
+
+def ingest(con, paths, force=False, params=None, test=None, verbose=False, deny_at=None):
+    # returns (ingested, skipped_unchanged, not_traces);
+    # deny_at: {trace stem: {part: (rows, first DENY h/x)}} from the run that wrote the traces
+    done = skipped = ignored = 0
+    sidecars = {}
+    with con:
+        for path in paths:
+            for source, opener, size, mtime, sidecar in iter_sources(path):
+                row = con.execute("SELECT run_id, size, mtime FROM runs WHERE source = ?", (source,)).fetchone()
+                if row is not None and not force and row[1] == size and row[2] == mtime:
+                    skipped += 1
+                    continue
+                stem = _stem(source)
+                layout, stats, evt_params = trace_stats(opener, source)
+                if layout is None:
+                    ignored += 1
+                    continue
+                known_test, label = TRACE_NAMES.get(stem, (None, stem))
+                side_test, side_params = _sidecar_params(sidecar, sidecars)
+                run_test = test or (evt_params or {}).get("test") or side_test or known_test
+                run_param = dict(params or evt_params or side_params or {})
+                if not run_param and layout == "a7":
+                    # A.7 traces carry eps_scale as a column
+                    run_param = _a7_eps(opener)
+                _full_deny(stats, deny_at, run_test, run_param, source)
+                if row is not None:
+                    con.execute("DELETE FROM runs WHERE run_id = ?", (row[0],))
+                cur = con.execute(
+                    "INSERT INTO runs (source, test, label, layout, size, mtime, ingested, params) VALUES (?,?,?,?,?,?,?,?)",
+                    (source, run_test, label, layout, size, mtime, time.time(), json.dumps(run_param, sort_keys=True)))
+                run_id = cur.lastrowid
+                con.executemany(
+                    "INSERT INTO traces (run_id, part, rows, deny_index, deny_k, deny_at, final_s, final_m, last_status)"
+                    " VALUES (?,?,?,?,?,?,?,?,?)",
+                    [(run_id, part, st["rows"], st["deny_index"], st["deny_k"], st["deny_at"], st["final_s"],
+                      st["final_m"], st["last_status"]) for part, st in sorted(stats.items())])
+                con.executemany("INSERT INTO params (run_id, name, num, text) VALUES (?,?,?,?)",
+                                _param_rows(run_id, run_param))
+                done += 1
+                if verbose:
+                    print("ingested", source)
+    return done, skipped, ignored
+
+def _a7_eps(opener):
+    kind, head, handle = diff.open_trace(opener)
+    try:
+        if kind == "csv" and "eps_scale" in head:
+            row = next(handle[0], None)
+            if row is not None:
+                return {"eps_scale": float(row[head.index("eps_scale")])}
+        elif kind == "bin" and head.get("extras"):
+            return {"eps_scale": head["extras"][0]}
+    finally:
+        diff._close(handle)
+    return {}
+
+def record(con, argv):
+    # runs the engine with argv and ingests its traces with the full parameter tuple
+    args = engine.build_parser().parse_args(argv)
+    os.makedirs(args.out_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summaries = engine.TESTS[args.test](args)
+    params = run_params(args)
+    params["test"] = args.test
+    suffix = engine.EVT_SUFFIX if args.trace_mode == "events" else ".csv"
+    paths = sorted({os.path.join(args.out_dir, os.path.splitext(sm["trace"])[0] + suffix) for sm in summaries})
+    deny_at = {}
+    for sm in summaries:
+        parts = deny_at.setdefault(os.path.splitext(sm["trace"])[0], {})
+        parts[sm["label"]] = (sm["rows"], sm["first_deny"])
+    for parts in deny_at.values():
+        if len(parts) == 1:
+            parts[""] = parts.popitem()[1]
+    ingest(con, paths, force=True, params=params, test=args.test, deny_at=deny_at)
+    return summaries
+
+# ---------------------------------------------------------------------------
+# queries
+
+OPS = ("<=", ">=", "!=", "=", "<", ">")
+
+def parse_param_filter(text):
+    for op in OPS:
+        name, sep, value = text.partition(op)
+        if sep:
+            name = name.strip()
+            value = value.strip()
+            try:
+                return name, op, float(value), "num"
+            except ValueError:
+                return name, op, value, "text"
+    raise ValueError("--param expects name<op>value with op in {}".format(", ".join(OPS)))
+
+def build_query(args):
+    sql = ["SELECT r.test, r.label, t.part, t.rows, t.deny_index, t.deny_k, t.deny_at, t.final_s, t.final_m,"
+           " t.last_status, r.params, r.source FROM traces t JOIN runs r ON r.run_id = t.run_id"]
+    where = []
+    binds = []
+    for i, text in enumerate(args.param):
+        name, op, value, col = parse_param_filter(text)
+        sql.append("JOIN params p{0} ON p{0}.run_id = r.run_id AND p{0}.name = ? AND p{0}.{1} {2} ?".format(i, col, op))
+        binds += [name, value]
+    if args.test:
+        where.append("r.test = ?")
+        binds.append(args.test)
+    if args.label:
+        where.append("r.label = ?")
+        binds.append(args.label)
+    if args.part is not None:
+        where.append("t.part = ?")
+        binds.append(args.part)
+    if args.status:
+        where.append("t.last_status = ?")
+        binds.append(args.status)
+    if args.deny_above is not None:
+        where.append("t.deny_at > ?")
+        binds.append(args.deny_above)
+    if args.deny_below is not None:
+        where.append("t.deny_at < ?")
+        binds.append(args.deny_below)
+    if args.no_deny:
+        where.append("t.deny_index IS NULL")
+    if args.s_above is not None:
+        where.append("t.final_s > ?")
+        binds.append(args.s_above)
+    if where:
+        sql.append("WHERE " + " AND ".join(where))
+    sql.append("ORDER BY {} {}".format({"deny_at": "t.deny_at", "final_s": "t.final_s", "rows": "t.rows",
+                                        "source": "r.source"}[args.order], "DESC" if args.desc else "ASC"))
+    if args.limit:
+        sql.append("LIMIT ?")
+        binds.append(args.limit)
+    return " ".join(sql), binds
+
+QUERY_HEADER = ["test", "label", "part", "rows", "deny_index", "deny_k", "deny_at", "final_s", "final_m",
+                "last_status", "params", "source"]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=DEFAULT_DB, help="catalog file (env SSOM_CATALOG)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="add trace files, output directories, zip bundles or cache dirs")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--force", action="store_true", help="re-read sources whose size and mtime are unchanged")
+    p.add_argument("--test", default="", help="test name for traces the catalog cannot identify")
+    p.add_argument("--verbose", action="store_true")
+
+    p = sub.add_parser("record", help="run ssom_fast_engine.py with the given arguments and ingest its traces")
+    p.add_argument("engine_args", nargs=argparse.REMAINDER)
+
+    p = sub.add_parser("query", help="filter traces by test, parameters and horizon")
+    p.add_argument("--test", default="")
+    p.add_argument("--label", default="")
+    p.add_argument("--part", default=None)
+    p.add_argument("--status", choices=engine.STATUS_NAMES, default="")
+    p.add_argument("--param", action="append", default=[], help="e.g. 'r_safe>=0.1' (repeatable)")
+    p.add_argument("--deny_above", type=float, default=None, help="first DENY at h/x above this value")
+    p.add_argument("--deny_below", type=float, default=None, help="first DENY at h/x below this value")
+    p.add_argument("--no_deny", action="store_true", help="traces without any DENY")
+    p.add_argument("--s_above", type=float, default=None, help="final strain above this value")
+    p.add_argument("--order", choices=("deny_at", "final_s", "rows", "source"), default="source")
+    p.add_argument("--desc", action="store_true")
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--count", action="store_true", help="print the number of matches only")
+
+    p = sub.add_parser("sql", help="run a read-only SQL statement")
+    p.add_argument("statement")
+
+    sub.add_parser("stats", help="catalog size per test")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "ingest":
+        con = connect(args.db)
+        t0 = time.perf_counter()
+        done, skipped, ignored = ingest(con, args.paths, args.force, test=args.test or None, verbose=args.verbose)
+        print("Ingested {} trace file(s), {} unchanged, {} not traces ({:.2f} s)".format(
+            done, skipped, ignored, time.perf_counter() - t0))
+    elif args.cmd == "record":
+        con = connect(args.db)
+        for sm in record(con, args.engine_args):
+            print("Recorded {} ({})".format(sm["label"], sm["trace"]))
+    elif args.cmd == "query":
+        con = connect(args.db, readonly=True)
+        sql, binds = build_query(args)
+        t0 = time.perf_counter()
+        rows = con.execute(sql, binds).fetchall()
+        dt = time.perf_counter() - t0
+        if args.count:
+            print(len(rows))
+        else:
+            w = csv.writer(sys.stdout)
+            w.writerow(QUERY_HEADER)
+            w.writerows(rows)
+        print("{} match(es) in {:.1f} ms".format(len(rows), dt * 1000.0), file=sys.stderr)
+    elif args.cmd == "sql":
+        con = connect(args.db, readonly=True)
+        cur = con.execute(args.statement)
+        w = csv.writer(sys.stdout)
+        if cur.description:
+            w.writerow([d[0] for d in cur.description])
+        w.writerows(cur)
+    else:
+        con = connect(args.db, readonly=True)
+        for test, runs, traces, denied in con.execute(
+                "SELECT r.test, COUNT(DISTINCT r.run_id), COUNT(*), SUM(t.deny_index IS NOT NULL)"
+                " FROM runs r JOIN traces t ON t.run_id = r.run_id GROUP BY r.test ORDER BY r.test"):
+            print("{:<6} runs={:<8} traces={:<8} with DENY={}".format(test or "?", runs, traces, denied))
+    con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+# ssom_series_posture.py
+# Convergence posture for infinite series. The terms a_n are evaluated in one vectorized call,
+# the partial sums S_N come from one cumulative sum, and the accelerated sequences (Aitken's
+# delta-squared, Richardson for S_N = S + c / N^p, Shanks e_k via Wynn's epsilon algorithm) are
+# built from S_N by array slicing. The posture_step logic (log-ratio, flip, strain, with the A.3
+# zero tolerance) runs over the increments of every sequence in one batched pass, or over the
+# terms themselves. The last ALLOW is the structural convergence horizon: the number of terms
+# up to which the sequence still converges regularly. A regular posture over increments is no
+# convergence test (the harmonic increments decay smoothly), so every sequence also gets a drift
+# check: the spread over its last half against the spread over the quarter before. A limit is
+# only claimed while that spread shrinks as N doubles, with a geometric bound on the tail.
+import argparse
+import csv
+import math
+import os
+from array import array
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+
+# name -> (term expression in n, first n, parameter defaults, exact sum(params) or None, doc)
+SERIES = {
+    "basel": ("1.0 / (n * n)", 1, {}, lambda p: math.pi ** 2 / 6.0, "sum 1/n^2 = pi^2/6"),
+    "harmonic": ("1.0 / n", 1, {}, None, "sum 1/n (diverges like log N)"),
+    "alt_harmonic": ("(-1.0) ** (n + 1) / n", 1, {}, lambda p: math.log(2.0), "sum (-1)^(n+1)/n = log 2"),
+    "leibniz": ("4.0 * (-1.0) ** n / (2.0 * n + 1.0)", 0, {}, lambda p: math.pi, "sum 4 (-1)^n/(2n+1) = pi"),
+    "geometric": ("r ** n", 0, {"r": 0.9}, lambda p: 1.0 / (1.0 - p["r"]), "sum r^n = 1/(1-r), |r| < 1"),
+    "zeta": ("1.0 / n ** p", 1, {"p": 3.0}, None, "sum 1/n^p (Riemann zeta(p), p > 1)"),
+    "grandi": ("(-1.0) ** n", 0, {}, None, "sum (-1)^n (does not converge)"),
+}
+
+METHODS = ("partial", "aitken", "richardson", "shanks")
+OBSERVE = ("increments", "magnitudes", "terms")
+
+def method_lag(method, shanks_order):
+    # the first index at which the method's sequence is defined
+    return {"partial": 0, "aitken": 2, "richardson": 1, "shanks": 2 * shanks_order}[method]
+
+def _div(a, b):
+    # float division with IEEE results for b == 0, as NumPy gives them
+    if b == 0.0:
+        if a == 0.0 or a != a:
+            return float("nan")
+        return math.copysign(float("inf"), a) * math.copysign(1.0, b)
+    return a / b
+
+def sequences_numpy(terms, methods, p, shanks_order):
+    # method -> array aligned with S (index i uses terms 0..i); nan where undefined
+    s = np.cumsum(terms)
+    n = len(s)
+    out = {}
+    with np.errstate(all="ignore"):
+        for method in methods:
+            t = np.full(n, np.nan)
+            if method == "partial":
+                t = s
+            elif method == "aitken":
+                d1 = s[2:] - s[1:-1]
+                d0 = s[1:-1] - s[:-2]
+                t[2:] = s[2:] - (d1 * d1) / (d1 - d0)
+            elif method == "richardson":
+                c = np.arange(2, n + 1, dtype=float) ** p
+                c0 = np.arange(1, n, dtype=float) ** p
+                t[1:] = (c * s[1:] - c0 * s[:-1]) / (c - c0)
+            else:
+                prev = np.zeros(n)
+                cur = s
+                for _ in range(2 * shanks_order):
+                    prev, cur = cur, prev[1:len(cur)] + 1.0 / (cur[1:] - cur[:-1])
+                t[2 * shanks_order:] = cur
+            out[method] = t
+    return out
+
+def sequences_python(terms, methods, p, shanks_order):
+    s = array("d")
+    acc = 0.0
+    for a in terms:
+        acc += a
+        s.append(acc)
+    n = len(s)
+    nan = float("nan")
+    out = {}
+    for method in methods:
+        if method == "partial":
+            out[method] = s
+        elif method == "aitken":
+            t = array("d", [nan, nan])
+            for i in range(2, n):
+                d1 = s[i] - s[i - 1]
+                d0 = s[i - 1] - s[i - 2]
+                t.append(s[i] - _div(d1 * d1, d1 - d0))
+            out[method] = t
+        elif method == "richardson":
+            t = array("d", [nan])
+            for i in range(1, n):
+                c = float(i + 1) ** p
+                c0 = float(i) ** p
+                t.append(_div(c * s[i] - c0 * s[i - 1], c - c0))
+            out[method] = t
+        else:
+            prev = [0.0] * n
+            cur = list(s)
+            for _ in range(2 * shanks_order):
+                nxt = [prev[i + 1] + _div(1.0, cur[i + 1] - cur[i]) for i in range(len(cur) - 1)]
+                prev, cur = cur, nxt
+            out[method] = array("d", [nan] * (2 * shanks_order) + cur)
+    return out
+
+def drift(t, lo, hi):
+    # max |T_i - T_hi| over lo <= i <= hi, ignoring undefined entries; nan when T_hi is undefined
+    end = float(t[hi])
+    if not math.isfinite(end):
+        return float("nan")
+    if np is not None and isinstance(t, np.ndarray):
+        seg = np.abs(t[lo:hi + 1] - end)
+        seg = seg[np.isfinite(seg)]
+        return float(seg.max()) if len(seg) else float("nan")
+    return max((abs(float(v) - end) for v in t[lo:hi + 1] if math.isfinite(float(v) - end)), default=float("nan"))
+
+def limit_check(t, first, last, ratio_max, rtol):
+    # (ratio of the spread over (mid, last] to the one over (quarter, mid], tail bound, verdict);
+    # the check ends at the last defined value, since accelerations turn 0/0 once converged
+    while last > first and not math.isfinite(float(t[last])):
+        last -= 1
+    if last - first < 4:
+        return float("nan"), None, "undefined"
+    mid = (first + last) // 2
+    quarter = (first + mid) // 2
+    d1 = drift(t, quarter, mid)
+    d2 = drift(t, mid, last)
+    if not (math.isfinite(d1) and math.isfinite(d2)):
+        return float("nan"), None, "undefined"
+    if d2 <= rtol * abs(float(t[last])):
+        # settled to working precision: what is left of the spread is round-off
+        return (d2 / d1 if d1 > 0.0 else 0.0), d2, "yes"
+    q = d2 / d1 if d1 > 0.0 else float("inf")
+    if q >= ratio_max:
+        return q, None, "no"
+    return q, d2 * q / (1.0 - q), "yes"
+
+def eval_terms(fn, n0, count, use_numpy):
+    if use_numpy and fn.vector is not None:
+        return fn.vector(np.arange(n0, n0 + count, dtype=float))
+    return array("d", (fn.scalar(float(n)) for n in range(n0, n0 + count)))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--series", default="basel",
+                    help="registered series (" + ", ".join(sorted(SERIES)) + ") or a term expression in n")
+    ap.add_argument("--param", action="append", default=[], help="name=value bound into the term (repeatable)")
+    ap.add_argument("--n0", type=int, default=None, help="first n (default: the series', 1 for expressions)")
+    ap.add_argument("--exact", type=float, default=None, help="known sum, for the error columns")
+    ap.add_argument("--terms", type=int, default=10000, help="number of terms N")
+    ap.add_argument("--method", default=",".join(METHODS), help="comma-separated: " + ",".join(METHODS))
+    ap.add_argument("--richardson_p", type=float, default=1.0, help="assumed error model S_N = S + c / N^p")
+    ap.add_argument("--shanks_order", type=int, default=2, help="k of the Shanks transform e_k")
+    ap.add_argument("--observe", choices=OBSERVE, default="increments",
+                    help="posture over the increments of every sequence, their magnitudes (no flips, for "
+                         "alternating series), or the terms a_n")
+    ap.add_argument("--warmup", type=int, default=10, help="leading terms summed before the posture starts")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    ap.add_argument("--zero_tol", type=float, default=1e-15, help="|increment| treated as 0 (posture_step)")
+    ap.add_argument("--drift_ratio", type=float, default=0.95,
+                    help="spread ratio per doubling of N at or above which no limit is claimed")
+    ap.add_argument("--limit_rtol", type=float, default=1e-10,
+                    help="spread, relative to the last value, below which a sequence counts as settled")
+    engine.strain_flags(ap)
+    ap.add_argument("--scalar", action="store_true", help="evaluate and sum with math.* instead of NumPy")
+    ap.add_argument("--trace", action="store_true", help="also write the full per-term trace")
+    ap.add_argument("--out_dir", default="out_ssom_series_posture")
+    args = ap.parse_args()
+
+    methods = [m for m in args.method.split(",") if m]
+    for m in methods:
+        if m not in METHODS:
+            raise ValueError("unknown method {!r} (choose from {})".format(m, ", ".join(METHODS)))
+    if args.shanks_order < 1:
+        raise ValueError("Require --shanks_order >= 1")
+    if args.richardson_p <= 0.0:
+        raise ValueError("Require --richardson_p > 0")
+    if not 0.0 < args.drift_ratio <= 1.0:
+        raise ValueError("Require 0 < --drift_ratio <= 1")
+    if args.limit_rtol < 0.0:
+        raise ValueError("Require --limit_rtol >= 0")
+    params = functions.parse_params(args.param)
+    if args.series in SERIES:
+        expr, n0, defaults, exact_fn, doc = SERIES[args.series]
+        merged = dict(defaults)
+        merged.update((k, v) for k, v in params.items() if k in defaults)
+        exact = exact_fn(merged) if exact_fn is not None else None
+        fn = functions.compile_expr(expr, merged, args.series, variables=("n",))
+    else:
+        n0, exact, doc = 1, None, args.series
+        fn = functions.compile_expr(args.series, params, variables=("n",))
+    if args.n0 is not None:
+        n0 = args.n0
+    if args.exact is not None:
+        exact = args.exact
+    start = max(max(method_lag(m, args.shanks_order) for m in methods) + 1, args.warmup)
+    if args.terms < start + 5:
+        raise ValueError("Require --terms >= {} for these methods".format(start + 5))
+
+    use_numpy = np is not None and not args.scalar
+    terms = eval_terms(fn, n0, args.terms, use_numpy)
+    seqs = (sequences_numpy if use_numpy else sequences_python)(terms, methods, args.richardson_p, args.shanks_order)
+
+    # rows cover indices start..N-1, where every chosen sequence has a defined increment
+    if args.observe == "terms":
+        labels = ["terms"]
+        m_rows = [[float(v) for v in terms[start:]]] if not use_numpy else terms[None, start:]
+    else:
+        labels = methods
+        if use_numpy:
+            with np.errstate(all="ignore"):
+                m_rows = np.stack([seqs[m][start:] - seqs[m][start - 1:-1] for m in methods])
+            if args.observe == "magnitudes":
+                m_rows = np.abs(m_rows)
+        else:
+            m_rows = [array("d", (seqs[m][i] - seqs[m][i - 1] for i in range(start, args.terms))) for m in methods]
+            if args.observe == "magnitudes":
+                m_rows = [array("d", map(abs, row)) for row in m_rows]
+    knobs = dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_ZERO_TOL,
+                 zero_tol=args.zero_tol, abstain=engine.ABSTAIN_NONFINITE, **engine.strain_kw(args))
+    res = batch.batch_posture(m_rows, args.a_min, args.s_max, args.r_safe, use_numpy=use_numpy, **knobs)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    def count(i):
+        # number of terms summed at sequence index i
+        return i + 1
+
+    # the horizon of the terms observable applies to every sequence
+    rows = []
+    last_index = args.terms - 1
+    for method in methods:
+        r = 0 if args.observe == "terms" else labels.index(method)
+        stop = int(res.stop[r])
+        last = start + stop - 1 if stop >= 0 else last_index
+        t = seqs[method]
+        est = float(t[last])
+        final = float(t[last_index])
+        ratio, tail, limit = limit_check(t, start, last_index, args.drift_ratio, args.limit_rtol)
+        rows.append({
+            "method": method,
+            "stop_n": count(start + stop) if stop >= 0 else None,
+            "stop_status": res.stop_status(r),
+            "horizon_n": count(last),
+            "estimate": est,
+            "final": final,
+            "err_horizon": abs(est - exact) if exact is not None else None,
+            "err_final": abs(final - exact) if exact is not None else None,
+            "drift_ratio": ratio,
+            "tail_bound": tail,
+            "limit": limit,
+        })
+
+    def fmt(v, spec="{:.16e}"):
+        return "" if v is None else spec.format(v)
+
+    out_csv = os.path.join(args.out_dir, "series_horizons_ssom.csv")
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["series", "method", "observe", "terms", "stop_n", "stop_status", "horizon_n",
+                    "estimate_at_horizon", "abs_error_at_horizon", "estimate_at_N", "abs_error_at_N",
+                    "limit", "drift_ratio", "tail_bound"])
+        for r in rows:
+            w.writerow([args.series, r["method"], args.observe, args.terms, fmt(r["stop_n"], "{}"), r["stop_status"],
+                        r["horizon_n"], fmt(r["estimate"]), fmt(r["err_horizon"], "{:.6e}"), fmt(r["final"]),
+                        fmt(r["err_final"], "{:.6e}"), r["limit"], fmt(r["drift_ratio"], "{:.4f}"),
+                        fmt(r["tail_bound"], "{:.3e}")])
+    if args.trace:
+        trace_csv = os.path.join(args.out_dir, "series_trace_ssom.csv")
+        with open(trace_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["sequence", "n_terms", "value", "m", "a", "s", "lr", "flip", "status"])
+            for r, label in enumerate(labels):
+                values = seqs[label] if label != "terms" else terms
+                for j in range(args.terms - start):
+                    status = int(res.status[r][j])
+                    if status == batch.NOT_REACHED:
+                        break
+                    w.writerow([label, count(start + j), "{:.16e}".format(float(values[start + j])),
+                                "{:.16e}".format(float(m_rows[r][j])), "{:.8f}".format(float(res.a[r][j])),
+                                "{:.8f}".format(float(res.s[r][j])), "{:.8f}".format(float(res.lr[r][j])),
+                                int(res.flip[r][j]), batch.STATUS_NAMES[status]])
+
+    print("SSOM series posture complete: {} ({}), N = {}, observe = {}".format(args.series, doc, args.terms,
+                                                                               args.observe))
+    print("Backend:", "numpy" if use_numpy else "stdlib")
+    print("Output:", out_csv)
+    if exact is not None:
+        print("Exact sum: {:.16e}".format(exact))
+    for r in rows:
+        stop = "no DENY" if r["stop_n"] is None else "first {} at N = {}".format(r["stop_status"], r["stop_n"])
+        err = "" if r["err_horizon"] is None else ", error {:.3e}".format(r["err_horizon"])
+        if r["limit"] == "yes":
+            limit = "tail bound {:.3e}".format(r["tail_bound"])
+        elif r["limit"] == "no":
+            limit = "NO LIMIT: the spread does not shrink as N doubles (ratio {:.3f})".format(r["drift_ratio"])
+        else:
+            limit = "limit undefined (too few finite values)"
+        print("  {}: {}; horizon N = {}, estimate {:.16e}{}; {}".format(r["method"], stop, r["horizon_n"],
+                                                                       r["estimate"], err, limit))
+
+if __name__ == "__main__":
+    main()
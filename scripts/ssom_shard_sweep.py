@@ -0,0 +1,378 @@
+# ssom_shard_sweep.py
+# Sharded sweep over engine parameter grids (threshold tuples, function families) through a
+# shared directory that works as a job queue, so any number of workers on any number of
+# nodes can drain it. `init` splits the Cartesian grid into deterministic shards (one job file
+# each under todo/); workers claim a shard by renaming it into running/ (atomic on a POSIX
+# filesystem), run its jobs in memory and publish the result directory into done/ with one
+# more rename. `merge` concatenates the shard results in shard order, so the combined summary
+# and traces are byte-identical to a single-process run whatever the number of workers.
+# A failed shard goes back to todo/ until --attempts is used up; completed shards are never redone.
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+import ssom_fast_engine as engine
+from ssom_run_cache import version_hash
+
+SPEC_FILE = "sweep.json"
+SPEC_FORMAT = 1
+QUEUE_DIRS = ("todo", "running", "done", "failed")
+SUMMARY_FILE = "summary.csv"
+SHARD_FILE = "shard.json"
+SUMMARY_HEADER = ["job", "params", "label", "trace", "rows", "last_status", "first_deny", "final_m"]
+
+def parse_grid(items):
+    # ["a_min=0.6,0.7", "s_max=1,2"] -> [("a_min", ["0.6", "0.7"]), ("s_max", ["1", "2"])]
+    # values stay strings, so every job sees exactly the flag text it would get on a command line
+    grid = []
+    for item in items:
+        name, _, values = item.partition("=")
+        vals = [v.strip() for v in values.split(",") if v.strip()]
+        if not name.isidentifier() or not vals:
+            raise ValueError("--grid expects name=v1,v2,..., got {!r}".format(item))
+        grid.append((name, vals))
+    return grid
+
+def iter_jobs(grid):
+    # Cartesian product in --grid order, last name varying fastest
+    names = [name for name, _ in grid]
+    for values in itertools.product(*(vals for _, vals in grid)):
+        yield list(zip(names, values))
+
+def job_argv(spec, params):
+    argv = list(spec["argv"])
+    for name, value in params:
+        argv += ["--" + name, value]
+    return argv
+
+def shard_name(i):
+    return "shard_{:06d}".format(i)
+
+def _write_json(path, data):
+    # write-then-rename, so readers never see a torn file
+    folder = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def load_spec(queue):
+    with open(os.path.join(queue, SPEC_FILE), "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if spec.get("format") != SPEC_FORMAT:
+        raise ValueError("{}: unsupported sweep format {!r}".format(queue, spec.get("format")))
+    return spec
+
+def init_queue(queue, argv, grid, shard_size, attempts, traces):
+    if os.path.exists(os.path.join(queue, SPEC_FILE)):
+        raise ValueError("{} already holds a sweep; use a new --queue directory".format(queue))
+    args = engine.build_parser().parse_args(list(argv))
+    jobs = list(iter_jobs(grid))
+    # fail early on a bad flag or value: every grid value is parsed once, on top of the base argv
+    for name, vals in grid:
+        for value in vals:
+            engine.build_parser().parse_args(job_argv({"argv": argv}, [(name, value)]))
+    for d in QUEUE_DIRS:
+        os.makedirs(os.path.join(queue, d), exist_ok=True)
+    spec = {
+        "format": SPEC_FORMAT,
+        "test": args.test,
+        "argv": list(argv),
+        "grid": grid,
+        "jobs": len(jobs),
+        "shard_size": shard_size,
+        "shards": (len(jobs) + shard_size - 1) // shard_size,
+        "attempts": attempts,
+        "traces": traces,
+        "version": version_hash(args.test, args.func),
+        "created": time.time(),
+    }
+    for i in range(spec["shards"]):
+        _write_json(os.path.join(queue, "todo", shard_name(i) + ".json"),
+                    {"shard": i, "first_job": i * shard_size, "jobs": jobs[i * shard_size:(i + 1) * shard_size],
+                     "attempt": 0, "errors": []})
+    _write_json(os.path.join(queue, SPEC_FILE), spec)
+    return spec
+
+def run_job(spec, job, params):
+    # (summary rows, {trace stem: (layout, [CSV lines prefixed with the job number])})
+    argv = job_argv(spec, params)
+    try:
+        args = engine.build_parser().parse_args(argv)
+    except SystemExit:
+        # argparse exits on a bad value; make it a job error the retry path handles
+        raise ValueError("engine rejected arguments: {}".format(" ".join(argv)))
+    args.trace_mode = "capture"
+    args.captured = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        summaries = engine.TESTS[args.test](args)
+    tag = " ".join("{}={}".format(n, v) for n, v in params)
+    rows = []
+    for sm in summaries:
+        rows.append([job, tag, sm["label"], sm["trace"], sm["rows"], sm["last_status"],
+                     "" if sm["first_deny"] is None else "{:.16e}".format(sm["first_deny"]),
+                     "{:.16e}".format(sm["final_m"])])
+    traces = {}
+    if spec["traces"]:
+        prefix = "{},".format(job)
+        for stem, (layout, parts) in sorted(args.captured.items()):
+            _, fields, fmt, k0 = engine.LAYOUTS[layout]
+            lines = []
+            for part in parts:
+                cols, extra = part if isinstance(part, tuple) else (part, None)
+                lines.extend(prefix + line for line in engine.iter_rows(cols, fields, fmt, k0, extra))
+            traces[stem] = (layout, lines)
+    return rows, traces
+
+def run_shard(queue, spec, shard, worker, claim_path=None):
+    # computes one shard into a private directory and publishes it into done/ with a rename;
+    # the claim's mtime is refreshed after every job so `requeue --stale` leaves it alone
+    tmp = tempfile.mkdtemp(prefix=".tmp_{}_".format(shard_name(shard["shard"])), dir=os.path.join(queue, "done"))
+    try:
+        with open(os.path.join(tmp, SUMMARY_FILE), "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            handles = {}
+            layouts = {}
+            try:
+                for j, params in enumerate(shard["jobs"]):
+                    if claim_path is not None:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.utime(claim_path, None)
+                    rows, traces = run_job(spec, shard["first_job"] + j, params)
+                    w.writerows(rows)
+                    for stem, (layout, lines) in traces.items():
+                        if stem not in handles:
+                            layouts[stem] = layout
+                            handles[stem] = open(os.path.join(tmp, stem + ".csv"), "w", newline="", encoding="utf-8")
+                        handles[stem].writelines(lines)
+            finally:
+                for h in handles.values():
+                    h.close()
+        _write_json(os.path.join(tmp, SHARD_FILE), {"shard": shard["shard"], "worker": worker, "layouts": layouts,
+                                                    "attempt": shard["attempt"], "finished": time.time()})
+        try:
+            os.rename(tmp, os.path.join(queue, "done", shard_name(shard["shard"])))
+        except OSError:
+            # a requeued duplicate finished first; its result is identical
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def claim(queue, worker):
+    # (shard dict, path of the claim) or None when todo/ is empty
+    todo = os.path.join(queue, "todo")
+    for name in sorted(os.listdir(todo)):
+        if not name.endswith(".json") or name.startswith("."):
+            continue
+        mine = os.path.join(queue, "running", "{}.{}".format(name, worker))
+        try:
+            os.rename(os.path.join(todo, name), mine)
+        except FileNotFoundError:
+            continue  # another worker was faster
+        os.utime(mine, None)
+        with open(mine, "r", encoding="utf-8") as f:
+            return json.load(f), mine
+    return None
+
+def work(queue, worker=None, max_shards=0, verbose=True):
+    # drains todo/; returns (shards done, shards failed) by this worker
+    worker = worker or "{}-{}".format(socket.gethostname(), os.getpid())
+    spec = load_spec(queue)
+    base = engine.build_parser().parse_args(spec["argv"])
+    if version_hash(spec["test"], base.func) != spec["version"]:
+        raise RuntimeError("scripts differ from the ones the sweep was created with (version hash mismatch)")
+    done = failed = 0
+    while not max_shards or done + failed < max_shards:
+        got = claim(queue, worker)
+        if got is None:
+            break
+        shard, mine = got
+        name = shard_name(shard["shard"])
+        if os.path.isdir(os.path.join(queue, "done", name)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(mine)  # requeued after it had already completed
+            continue
+        t0 = time.perf_counter()
+        try:
+            run_shard(queue, spec, shard, worker, mine)
+        except Exception as exc:
+            shard["attempt"] += 1
+            shard["errors"].append("{} attempt {}: {}: {}".format(worker, shard["attempt"], type(exc).__name__, exc))
+            target = "todo" if shard["attempt"] < spec["attempts"] else "failed"
+            _write_json(os.path.join(queue, target, name + ".json"), shard)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(mine)  # a stale requeue may have moved it back to todo/ already
+            failed += 1
+            if verbose:
+                print("{}: {} failed ({}), moved to {}/".format(worker, name, shard["errors"][-1], target))
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(mine)
+        done += 1
+        if verbose:
+            print("{}: {} done ({} jobs, {:.2f} s)".format(worker, name, len(shard["jobs"]), time.perf_counter() - t0))
+    return done, failed
+
+def requeue(queue, failed=False, stale=None):
+    # failed shards (attempts reset) and claims older than `stale` seconds go back to todo/
+    moved = []
+    now = time.time()
+    if stale is not None:
+        running = os.path.join(queue, "running")
+        for name in sorted(os.listdir(running)):
+            path = os.path.join(running, name)
+            if now - os.path.getmtime(path) < stale:
+                continue
+            base = name.split(".json", 1)[0] + ".json"
+            try:
+                os.rename(path, os.path.join(queue, "todo", base))
+                moved.append(base)
+            except FileNotFoundError:
+                pass
+    if failed:
+        folder = os.path.join(queue, "failed")
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                shard = json.load(f)
+            shard["attempt"] = 0
+            _write_json(os.path.join(queue, "todo", name), shard)
+            os.remove(os.path.join(folder, name))
+            moved.append(name)
+    return moved
+
+def status(queue):
+    spec = load_spec(queue)
+    counts = {}
+    for d in QUEUE_DIRS:
+        names = [n for n in os.listdir(os.path.join(queue, d)) if not n.startswith(".")]
+        counts[d] = len(names)
+    return spec, counts
+
+def merge(queue, out_dir):
+    # concatenates every shard in order; refuses while any shard is missing
+    spec, counts = status(queue)
+    missing = [shard_name(i) for i in range(spec["shards"])
+               if not os.path.isdir(os.path.join(queue, "done", shard_name(i)))]
+    if missing:
+        raise RuntimeError("{} of {} shard(s) not done yet (first: {})".format(len(missing), spec["shards"], missing[0]))
+    os.makedirs(out_dir, exist_ok=True)
+    summary_csv = os.path.join(out_dir, "sweep_summary_ssom.csv")
+    with open(summary_csv, "w", newline="", encoding="utf-8") as out:
+        csv.writer(out).writerow(SUMMARY_HEADER)
+        for i in range(spec["shards"]):
+            with open(os.path.join(queue, "done", shard_name(i), SUMMARY_FILE), "r", newline="", encoding="utf-8") as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+    outputs = [summary_csv]
+    if spec["traces"]:
+        layouts = {}
+        for i in range(spec["shards"]):
+            with open(os.path.join(queue, "done", shard_name(i), SHARD_FILE), "r", encoding="utf-8") as f:
+                layouts.update(json.load(f)["layouts"])
+        for stem, layout in sorted(layouts.items()):
+            header, _, _, _ = engine.LAYOUTS[layout]
+            path = os.path.join(out_dir, "sweep_" + stem + ".csv")
+            with open(path, "wb") as out:
+                out.write((",".join(["job"] + list(header)) + "\r\n").encode("utf-8"))
+                for i in range(spec["shards"]):
+                    part = os.path.join(queue, "done", shard_name(i), stem + ".csv")
+                    if os.path.isfile(part):
+                        with open(part, "rb") as f:
+                            shutil.copyfileobj(f, out, 1 << 20)
+            outputs.append(path)
+    return spec, outputs
+
+def _worker_main(queue, worker):
+    work(queue, worker, verbose=False)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queue", default="ssom_sweep_queue", help="shared queue directory")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("init", help="init [--grid name=v1,v2 ...] <test> [engine flags]")
+    p.add_argument("--grid", action="append", default=[], help="engine flag and its values (repeatable)")
+    p.add_argument("--shard_size", type=int, default=16, help="jobs per shard")
+    p.add_argument("--attempts", type=int, default=3, help="tries per shard before it is parked in failed/")
+    p.add_argument("--no_traces", action="store_true", help="summaries only")
+    p.add_argument("engine_args", nargs=argparse.REMAINDER)
+
+    p = sub.add_parser("work", help="claim and run shards until the queue is empty")
+    p.add_argument("--worker", default="", help="worker name (default: host-pid)")
+    p.add_argument("--max_shards", type=int, default=0, help="stop after this many shards (0 = no limit)")
+
+    p = sub.add_parser("local", help="run --workers local worker processes, then merge")
+    p.add_argument("--workers", type=int, default=0, help="processes (0 = all cores)")
+    p.add_argument("--out_dir", default="out_ssom_shard_sweep")
+
+    p = sub.add_parser("requeue", help="send failed and/or stale shards back to todo/")
+    p.add_argument("--failed", action="store_true")
+    p.add_argument("--stale", type=float, default=None, help="claims not refreshed (once per job) for this many seconds")
+
+    p = sub.add_parser("merge")
+    p.add_argument("--out_dir", default="out_ssom_shard_sweep")
+
+    sub.add_parser("status")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "init":
+        if not args.engine_args:
+            raise ValueError("init needs a test name, e.g. init --grid a_min=0.6,0.7 a6 --steps 400")
+        if args.shard_size < 1 or args.attempts < 1:
+            raise ValueError("Require --shard_size >= 1 and --attempts >= 1")
+        spec = init_queue(args.queue, args.engine_args, parse_grid(args.grid), args.shard_size, args.attempts,
+                          not args.no_traces)
+        print("Sweep queue {}: test {}, {} job(s) in {} shard(s)".format(args.queue, spec["test"], spec["jobs"],
+                                                                        spec["shards"]))
+    elif args.cmd == "work":
+        done, failed = work(args.queue, args.worker or None, args.max_shards)
+        print("Worker finished: {} shard(s) done, {} failed".format(done, failed))
+    elif args.cmd == "local":
+        workers = args.workers or os.cpu_count() or 1
+        t0 = time.perf_counter()
+        procs = [Process(target=_worker_main, args=(args.queue, "{}-local{}".format(socket.gethostname(), i)))
+                 for i in range(workers)]
+        for pr in procs:
+            pr.start()
+        for pr in procs:
+            pr.join()
+        spec, counts = status(args.queue)
+        print("Workers: {} | {:.2f} s | {}".format(workers, time.perf_counter() - t0,
+                                                   ", ".join("{} {}".format(d, counts[d]) for d in QUEUE_DIRS)))
+        if counts["done"] < spec["shards"]:
+            print("Not merged: {} shard(s) not done ({} failed, {} still claimed); see status, then requeue".format(
+                spec["shards"] - counts["done"], counts["failed"], counts["running"]))
+            sys.exit(1)
+        _, outputs = merge(args.queue, args.out_dir)
+        for path in outputs:
+            print("Output:", path)
+    elif args.cmd == "requeue":
+        moved = requeue(args.queue, args.failed, args.stale)
+        print("Requeued {} shard(s){}".format(len(moved), ": " + ", ".join(moved) if moved else ""))
+    elif args.cmd == "merge":
+        _, outputs = merge(args.queue, args.out_dir)
+        for path in outputs:
+            print("Output:", path)
+    else:
+        spec, counts = status(args.queue)
+        print("Sweep {}: test {} ({}), {} job(s), {} shard(s)".format(
+            args.queue, spec["test"], " ".join(spec["argv"][1:]), spec["jobs"], spec["shards"]))
+        print("  " + ", ".join("{} {}".format(d, counts[d]) for d in QUEUE_DIRS))
+        for name in sorted(os.listdir(os.path.join(args.queue, "failed"))):
+            with open(os.path.join(args.queue, "failed", name), "r", encoding="utf-8") as f:
+                print("  failed {}: {}".format(name, json.load(f)["errors"][-1]))
+
+if __name__ == "__main__":
+    main()
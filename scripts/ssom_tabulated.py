@@ -0,0 +1,309 @@
+# ssom_tabulated.py
+# Tabulated measurements as SSOM functions. The samples (CSV / whitespace text, or a 2-D .npy)
+# are sorted once into an index: sorted x, y, and the slope of every interval, with repeated
+# x averaged. f(x) is linear interpolation, exact at the samples and nan outside their range.
+#   scalar: a cursor remembers the last interval, so monotone ladders and approach paths cost
+#           amortized O(1) per query; any other query is a bisection, O(log n);
+#   vector: one searchsorted over the whole batch.
+# Indexes are cached in-process and on disk (<SSOM_CACHE_DIR>/tables, keyed on the file's path,
+# size, mtime and columns), so every test and worker process on the same dataset reuses one.
+# ssom_functions.resolve("table:PATH[#XCOL,YCOL]") returns the same adapter, so any tool that
+# takes --func runs on tabulated data; table_digest hashes the file's contents for run caches.
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import ssom_batch_posture as batch
+import ssom_fast_engine as engine
+import ssom_functions as functions
+from ssom_batch_posture import np
+from ssom_mmap_input import MappedSequence
+from ssom_run_cache import DEFAULT_CACHE_DIR
+
+INDEX_FORMAT = 1
+INDEX_HEADER = struct.Struct("<8sQ")
+INDEX_MAGIC = b"SSOMTAB1"
+KINDS = ("derivative", "limit")
+SIDES = ("forward", "backward")
+_INDEXES = {}
+
+class TableIndex:
+    # sorted, de-duplicated samples; slopes[i] is the slope on [xs[i], xs[i+1]] (0 for the last)
+    __slots__ = ("xs", "ys", "slopes", "merged", "_np")
+
+    def __init__(self, xs, ys, merged=0):
+        if len(xs) < 2:
+            raise ValueError("a table needs at least 2 distinct x values")
+        self.xs = xs
+        self.ys = ys
+        self.slopes = array("d", ((ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i]) for i in range(len(xs) - 1)))
+        self.slopes.append(0.0)
+        self.merged = merged
+        self._np = None
+
+    def __len__(self):
+        return len(self.xs)
+
+    def arrays(self):
+        if self._np is None:
+            self._np = tuple(np.frombuffer(a, dtype=float) for a in (self.xs, self.ys, self.slopes))
+        return self._np
+
+    def gaps(self, x0):
+        # distance from x0 to the nearest sample strictly on each side (inf if none)
+        xs = self.xs
+        i = bisect.bisect_right(xs, x0)
+        j = bisect.bisect_left(xs, x0)
+        right = xs[i] - x0 if i < len(xs) else math.inf
+        left = x0 - xs[j - 1] if j > 0 else math.inf
+        return right, left
+
+def build_index(xs, ys):
+    # sort by x, drop rows without a finite x, average the y of repeated x
+    pairs = sorted((x, y) for x, y in zip(xs, ys) if math.isfinite(x))
+    out_x = array("d")
+    out_y = array("d")
+    merged = 0
+    i = 0
+    while i < len(pairs):
+        j = i + 1
+        while j < len(pairs) and pairs[j][0] == pairs[i][0]:
+            j += 1
+        out_x.append(pairs[i][0])
+        out_y.append(math.fsum(p[1] for p in pairs[i:j]) / (j - i) if j - i > 1 else pairs[i][1])
+        merged += j - i - 1
+        i = j
+    return TableIndex(out_x, out_y, merged)
+
+def _column(header, col):
+    if col.lstrip("-").isdigit():
+        return int(col)
+    if header is None or col not in header:
+        raise ValueError("no column {!r} in the table header".format(col))
+    return header.index(col)
+
+def read_samples(path, x_col="0", y_col="1"):
+    # (xs, ys) as array('d'); text tables may have one header row
+    if path.endswith(".npy"):
+        cols = [MappedSequence(path, column=_column(None, c)) for c in (x_col, y_col)]
+        try:
+            return tuple(array("d", seq.window(0, len(seq))) for seq in cols)
+        finally:
+            for seq in cols:
+                seq.close()
+    xs = array("d")
+    ys = array("d")
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = "," if "," in sample else None
+        rows = csv.reader(f) if delimiter else (line.split() for line in f)
+        header = None
+        for row in rows:
+            if not row or row[0].startswith("#"):
+                continue
+            if header is None and not xs:
+                try:
+                    float(row[0])
+                except ValueError:
+                    header = [c.strip() for c in row]
+                    continue
+            ix, iy = _column(header, x_col), _column(header, y_col)
+            xs.append(float(row[ix]))
+            ys.append(float(row[iy]))
+    return xs, ys
+
+def index_key(path, x_col="0", y_col="1") -> str:
+    st = os.stat(path)
+    blob = json.dumps({"format": INDEX_FORMAT, "path": os.path.realpath(path), "size": st.st_size,
+                       "mtime_ns": st.st_mtime_ns, "columns": [x_col, y_col], "byteorder": sys.byteorder},
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def table_digest(spec) -> str:
+    # sha256 of the table file's bytes and the columns read from it: everything a run on
+    # table:SPEC depends on (index_key only fingerprints the path, size and mtime)
+    path, x_col, y_col = parse_spec(spec)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    h.update(json.dumps([x_col, y_col]).encode("utf-8"))
+    return h.hexdigest()
+
+def _load_cached(path):
+    with open(path, "rb") as f:
+        magic, n = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC:
+            return None
+        xs = array("d")
+        ys = array("d")
+        merged = array("q")
+        xs.fromfile(f, n)
+        ys.fromfile(f, n)
+        merged.fromfile(f, 1)
+    return TableIndex(xs, ys, merged[0])
+
+def _save_cached(path, index):
+    # write-then-rename: a concurrent reader sees either no index or a whole one
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_table_", dir=folder)
+    with os.fdopen(fd, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(index)))
+        index.xs.tofile(f)
+        index.ys.tofile(f)
+        array("q", [index.merged]).tofile(f)
+    os.replace(tmp, path)
+
+def load_index(path, x_col="0", y_col="1", cache_dir=DEFAULT_CACHE_DIR):
+    # (index, where it came from: "memory", "disk" or "built")
+    key = index_key(path, x_col, y_col)
+    index = _INDEXES.get(key)
+    if index is not None:
+        return index, "memory"
+    cached = os.path.join(cache_dir, "tables", key + ".idx") if cache_dir else ""
+    source = "disk"
+    index = _load_cached(cached) if cached and os.path.isfile(cached) else None
+    if index is None:
+        index = build_index(*read_samples(path, x_col, y_col))
+        source = "built"
+        if cached:
+            _save_cached(cached, index)
+    _INDEXES[key] = index
+    return index, source
+
+def interpolator(index, name="table"):
+    # SSOMFunction over the index; scalar and vector forms round identically
+    xs, ys, slopes = index.xs, index.ys, index.slopes
+    lo, hi = xs[0], xs[-1]
+    last = len(xs) - 1
+    cursor = [0]
+
+    def scalar(x):
+        if not lo <= x < hi:
+            return ys[last] if x == hi else float("nan")
+        i = cursor[0]
+        if not xs[i] <= x < xs[i + 1]:
+            # neighbouring intervals first: ladders move one interval at a time
+            if x >= xs[i + 1] and x < xs[i + 2]:
+                i += 1
+            elif x < xs[i] and x >= xs[i - 1]:
+                i -= 1
+            else:
+                i = bisect.bisect_right(xs, x) - 1
+            cursor[0] = i
+        return ys[i] + slopes[i] * (x - xs[i])
+
+    vector = None
+    if np is not None:
+        def vector(x):
+            vx, vy, vs = index.arrays()
+            x = np.asarray(x, dtype=float)
+            i = np.clip(np.searchsorted(vx, x, side="right") - 1, 0, last)
+            with np.errstate(all="ignore"):
+                out = vy[i] + vs[i] * (x - vx[i])
+            out[~((x >= lo) & (x <= hi))] = np.nan
+            return out
+
+    return functions.SSOMFunction(name, name, {}, scalar, vector)
+
+def parse_spec(spec):
+    # "PATH" or "PATH#XCOL,YCOL" -> (path, x_col, y_col)
+    path, _, cols = spec.partition("#")
+    x_col, y_col = (cols.split(",") + ["1"])[:2] if cols else ("0", "1")
+    return path, x_col.strip(), y_col.strip()
+
+def table_function(spec):
+    path, x_col, y_col = parse_spec(spec)
+    index, _ = load_index(path, x_col, y_col)
+    return interpolator(index, functions.TABLE_PREFIX + spec)
+
+def ladder_rows(fn, x0, hs, kind, use_numpy):
+    # one row per side: difference quotients (derivative) or f along x0 +- h (limit)
+    rows = []
+    for side in SIDES:
+        sign = 1.0 if side == "forward" else -1.0
+        xs = array("d", (x0 + sign * h for h in hs))
+        fx = fn.evaluate(xs, use_numpy)
+        if kind == "limit":
+            rows.append(fx)
+            continue
+        f0 = fn.scalar(x0)
+        if use_numpy and fn.vector is not None:
+            with np.errstate(all="ignore"):
+                rows.append(sign * (fx - f0) / np.asarray(hs, dtype=float))
+        else:
+            rows.append(array("d", (sign * (v - f0) / h for v, h in zip(fx, hs))))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("table", help="CSV / whitespace text with x and y columns, or a 2-D .npy")
+    ap.add_argument("--x_col", default="0", help="x column: index or header name")
+    ap.add_argument("--y_col", default="1", help="y column: index or header name")
+    ap.add_argument("--kind", choices=KINDS, default="derivative")
+    ap.add_argument("--x0", type=float, default=None, help="base point (default: the first sample)")
+    ap.add_argument("--steps", type=int, default=200)
+    ap.add_argument("--h_max", type=float, default=None, help="default: a tenth of the table's x range")
+    ap.add_argument("--h_min", type=float, default=None, help="default: h_max * 1e-6")
+    ap.add_argument("--a_min", type=float, default=0.70)
+    ap.add_argument("--s_max", type=float, default=1.00)
+    ap.add_argument("--r_safe", type=float, default=0.10)
+    ap.add_argument("--beta_flip", type=float, default=0.50)
+    ap.add_argument("--gamma_flip", type=float, default=0.20)
+    engine.strain_flags(ap)
+    ap.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="index cache ('' = in-process only)")
+    ap.add_argument("--scalar", action="store_true", help="interpolate with the bisect/cursor path instead of NumPy")
+    ap.add_argument("--out_dir", default="out_ssom_tabulated")
+    args = ap.parse_args(argv)
+
+    index, source = load_index(args.table, args.x_col, args.y_col, args.cache_dir)
+    fn = interpolator(index, args.table)
+    span = index.xs[-1] - index.xs[0]
+    x0 = index.xs[0] if args.x0 is None else args.x0
+    args.h_max = span / 10.0 if args.h_max is None else args.h_max
+    args.h_min = args.h_max * 1e-6 if args.h_min is None else args.h_min
+    engine._check_ladder(args, 5)
+    use_numpy = np is not None and not args.scalar
+    knobs = dict(beta_flip=args.beta_flip, gamma_flip=args.gamma_flip, lr_mode=engine.LR_EPS,
+                 abstain=engine.ABSTAIN_NONFINITE, **engine.strain_kw(args))
+
+    hs = engine.log_ladder(args.h_max, args.h_min, args.steps)
+    rows = ladder_rows(fn, x0, hs, args.kind, use_numpy)
+    res = batch.batch_posture(rows, args.a_min, args.s_max, args.r_safe,
+                              use_numpy=use_numpy, **knobs)
+    gaps = index.gaps(x0)
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_csv = os.path.join(args.out_dir, "tabulated_posture_ssom.csv")
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        # resolved = 1 while a sample lies strictly between x0 and x0 +- h; below that the
+        # ladder only sees the interpolant
+        w.writerow(["side", "k", "h", "x", "m", "a", "s", "log_ratio_abs", "sign_flip", "status", "resolved"])
+        for r, side in enumerate(SIDES):
+            sign = 1.0 if side == "forward" else -1.0
+            for k, h in enumerate(hs):
+                w.writerow([side, k, "{:.3e}".format(h), "{:.16e}".format(x0 + sign * h), "{:.16e}".format(rows[r][k]),
+                            "{:.8f}".format(res.a[r][k]), "{:.8f}".format(res.s[r][k]), "{:.8f}".format(res.lr[r][k]),
+                            int(res.flip[r][k]), batch.STATUS_NAMES[int(res.status[r][k])], int(h > gaps[r])])
+
+    print("SSOM tabulated posture complete: {} ({} samples, {} repeats averaged, index {}), {} at x0 = {}".format(
+        args.table, len(index), index.merged, source, args.kind, x0))
+    print("Output:", out_csv)
+    for r, side in enumerate(SIDES):
+        k = int(res.stop[r])
+        where = "no DENY" if k < 0 else "{} at h ~= {:.3e}".format(res.stop_status(r), hs[k])
+        floor = "no samples" if math.isinf(gaps[r]) else "resolved down to h ~= {:.3e}".format(gaps[r])
+        print("  {}: {} ({})".format(side, where, floor))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# ssom_trace_diff.py
+# Streaming comparison of SSOM traces (CSV or .ssomb binary) in constant memory.
+# Accepts single files, output directories or zip bundles such as evidence/evidence.zip.
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import struct
+import sys
+import zipfile
+
+import ssom_fast_engine as engine
+
+TRACE_SUFFIXES = (".csv", engine.BIN_SUFFIX)
+
+# columns compared as exact text, never as floats
+EXACT_COLUMNS = {"k", "n", "step", "part", "geometry", "sign_flip", "flip", "status"}
+
+def ordered_bits(x: float) -> int:
+    # maps doubles onto integers so that adjacent doubles differ by 1
+    i = struct.unpack("<q", struct.pack("<d", x))[0]
+    return i if i >= 0 else -(i & 0x7FFFFFFFFFFFFFFF)
+
+def ulp_distance(x: float, y: float) -> float:
+    if x == y:
+        return 0
+    if math.isnan(x) or math.isnan(y):
+        return 0 if (math.isnan(x) and math.isnan(y)) else math.inf
+    return abs(ordered_bits(x) - ordered_bits(y))
+
+def parse_col_ulps(text: str) -> dict:
+    out = {}
+    if not text:
+        return out
+    for item in text.split(","):
+        name, _, val = item.partition("=")
+        if not val:
+            raise ValueError("--col_ulps expects name=ulps pairs, got {!r}".format(item))
+        out[name.strip()] = int(val)
+    return out
+
+# ---------------------------------------------------------------------------
+# trace sources
+
+def list_traces(path: str) -> dict:
+    # stem -> (opener, display name); CSV wins when both forms of a trace exist
+    found = {}
+
+    def add(name, opener, display):
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if ext not in TRACE_SUFFIXES:
+            return
+        if stem in found and ext != ".csv":
+            return
+        found[stem] = (opener, display)
+
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                add(name, file_opener(full), full)
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = sorted(zf.namelist())
+        for name in names:
+            if not name.endswith("/"):
+                add(name, zip_opener(path, name), "{}::{}".format(path, name))
+    else:
+        add(path, file_opener(path), path)
+    return found
+
+def file_opener(path):
+    return lambda: open(path, "rb")
+
+def zip_opener(archive, member):
+    def opener():
+        zf = zipfile.ZipFile(archive)
+        f = zf.open(member)
+        f._ssom_archive = zf
+        return f
+    return opener
+
+def open_trace(opener):
+    # returns (kind, header, handle); binary handles sit just past the metadata
+    raw = opener()
+    if raw.read(len(engine.BIN_MAGIC)) == engine.BIN_MAGIC:
+        meta = json.loads(raw.readline().decode("utf-8"))
+        return "bin", meta, raw
+    raw.seek(0)
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    reader = csv.reader(text)
+    header = next(reader, [])
+    return "csv", header, (reader, text, raw)
+
+def _close(handle):
+    raw = handle[2] if isinstance(handle, tuple) else handle
+    raw.close()
+    archive = getattr(raw, "_ssom_archive", None)
+    if archive is not None:
+        archive.close()
+
+# ---------------------------------------------------------------------------
+# comparison
+
+def compare_traces(opener_a, opener_b, ulps=0, col_ulps=None, stop_early=False):
+    # Walks both traces in lock-step. Returns a dict with rows compared,
+    # divergent row count and the first divergence (or None).
+    col_ulps = col_ulps or {}
+    kind_a, head_a, h_a = open_trace(opener_a)
+    kind_b, head_b, h_b = open_trace(opener_b)
+    try:
+        if kind_a == "bin" and kind_b == "bin":
+            if head_a["layout"] != head_b["layout"] or head_a["extras"] != head_b["extras"]:
+                return _result(0, 1, {"row": 0, "column": "meta", "a": head_a, "b": head_b, "ulps": None})
+            names = list(engine.BIN_FIELDS)
+            rows_a = engine.iter_binary_records(h_a)
+            rows_b = engine.iter_binary_records(h_b)
+        else:
+            names_a, rows_a = _as_csv(kind_a, head_a, h_a)
+            names_b, rows_b = _as_csv(kind_b, head_b, h_b)
+            if names_a != names_b:
+                return _result(0, 1, {"row": 0, "column": "header", "a": names_a, "b": names_b, "ulps": None})
+            names = names_a
+        return _walk(names, rows_a, rows_b, ulps, col_ulps, stop_early)
+    finally:
+        _close(h_a)
+        _close(h_b)
+
+def _as_csv(kind, head, handle):
+    if kind == "csv":
+        return head, handle[0]
+    return list(engine.LAYOUTS[head["layout"]][0]), engine.iter_binary_csv_rows(handle, head)
+
+def _walk(names, rows_a, rows_b, ulps, col_ulps, stop_early):
+    tol = [col_ulps.get(name, ulps) for name in names]
+    exact = [name in EXACT_COLUMNS for name in names]
+    sentinel = object()
+    first = None
+    bad = 0
+    n = 0
+    while True:
+        ra = next(rows_a, sentinel)
+        rb = next(rows_b, sentinel)
+        if ra is sentinel and rb is sentinel:
+            break
+        n += 1
+        if ra is sentinel or rb is sentinel:
+            bad += 1
+            if first is None:
+                first = {"row": n, "column": "row", "a": None if ra is sentinel else list(ra),
+                         "b": None if rb is sentinel else list(rb), "ulps": None}
+            if stop_early:
+                break
+            continue
+        if ra == rb:
+            continue
+        diff = _row_diff(names, ra, rb, tol, exact)
+        if diff is None:
+            continue
+        bad += 1
+        if first is None:
+            col, va, vb, d = diff
+            first = {"row": n, "column": col, "a": va, "b": vb, "ulps": d}
+        if stop_early:
+            break
+    return _result(n, bad, first)
+
+def _row_diff(names, ra, rb, tol, exact):
+    if len(ra) != len(rb):
+        return ("width", len(ra), len(rb), None)
+    for i, (va, vb) in enumerate(zip(ra, rb)):
+        if va == vb:
+            continue
+        if exact[i]:
+            return (names[i], va, vb, None)
+        try:
+            fa = float(va)
+            fb = float(vb)
+        except (TypeError, ValueError):
+            return (names[i], va, vb, None)
+        d = ulp_distance(fa, fb)
+        if d > tol[i]:
+            return (names[i], va, vb, d)
+    return None
+
+def _result(rows, bad, first):
+    return {"rows": rows, "divergent_rows": bad, "first": first}
+
+def compare_paths(path_a, path_b, ulps=0, col_ulps=None, stop_early=False):
+    # Pairs traces by file stem; yields (stem, display_a, display_b, result or status string).
+    traces_a = list_traces(path_a)
+    traces_b = list_traces(path_b)
+    for stem in sorted(set(traces_a) | set(traces_b)):
+        if stem not in traces_b:
+            yield stem, traces_a[stem][1], None, "MISSING_IN_B"
+            continue
+        if stem not in traces_a:
+            yield stem, None, traces_b[stem][1], "MISSING_IN_A"
+            continue
+        res = compare_traces(traces_a[stem][0], traces_b[stem][0], ulps, col_ulps, stop_early)
+        yield stem, traces_a[stem][1], traces_b[stem][1], res
+        if stop_early and res["divergent_rows"]:
+            return
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("a", help="trace file, output directory or zip bundle")
+    ap.add_argument("b", help="trace file, output directory or zip bundle")
+    ap.add_argument("--ulps", type=int, default=0, help="float tolerance in units in the last place")
+    ap.add_argument("--col_ulps", default="", help="per-column overrides, e.g. a=4,s=16")
+    ap.add_argument("--stop_early", action="store_true", help="stop at the first divergence")
+    ap.add_argument("--only_common", action="store_true", help="ignore traces present on one side only")
+    ap.add_argument("--out_csv", default="")
+    args = ap.parse_args()
+
+    col_ulps = parse_col_ulps(args.col_ulps)
+    report = []
+    failed = False
+    for stem, da, db, res in compare_paths(args.a, args.b, args.ulps, col_ulps, args.stop_early):
+        if isinstance(res, str):
+            if not args.only_common:
+                failed = True
+                print("{}: {}".format(stem, res))
+                report.append([stem, da or "", db or "", res, "", "", "", "", "", ""])
+            continue
+        first = res["first"]
+        if first is None:
+            print("{}: MATCH ({} rows)".format(stem, res["rows"]))
+            report.append([stem, da, db, "MATCH", res["rows"], 0, "", "", "", ""])
+            continue
+        failed = True
+        print("{}: DIVERGE ({} of {} rows); first at row {} column {}: {!r} vs {!r}{}".format(
+            stem, res["divergent_rows"], res["rows"], first["row"], first["column"], first["a"], first["b"],
+            "" if first["ulps"] is None else " ({} ulps)".format(first["ulps"])))
+        report.append([stem, da, db, "DIVERGE", res["rows"], res["divergent_rows"],
+                       first["row"], first["column"], first["a"], first["b"]])
+
+    if args.out_csv:
+        with open(args.out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["trace", "a", "b", "result", "rows", "divergent_rows",
+                        "first_row", "first_column", "first_a", "first_b"])
+            for r in report:
+                w.writerow(r)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()